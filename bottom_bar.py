@@ -8,7 +8,7 @@ from PyQt5.QtWidgets import (
 from PyQt5.QtGui import QPainter, QColor, QPixmap, QFont, QIcon
 
 from util import format_time, trim_text, resource_path
-from helper import round_pix_form_path
+from cover_cache import set_cover
 
 
 class SeekBar(QWidget):
@@ -395,7 +395,7 @@ class BottomBar(QWidget):
         self._update_time() 
 
         # set cover image
-        self.cover.setPixmap(round_pix_form_path(cover_path, 80, 80, 6))
+        set_cover(self.cover, cover_path, 80, 80, 6)
 
         # update - like-dislike
         self.set_like_dislike(value=liked, is_emmit=False)
@@ -0,0 +1,124 @@
+import os
+from typing import List
+from PyQt5.QtCore import Qt, QObject
+from PyQt5.QtGui import QImage, QPainter
+from cover_cache import COVERS
+from cover_store import cover_exists
+from image_loader import IMAGES, fill_crop
+from util import COVER_DIR_PATH, gen_unique_id, variant_name
+
+# Playlist covers, a 2x2 collage of the covers of the first four songs.
+#
+# playlist_<song ids>.jpg -> the name is the signature of the first four songs,
+# same songs -> same file, nothing to draw.
+# Tiles are the 356px variants of the song covers (cover_cache.py), decoded once
+# for every playlist the song is in.
+COLLAGE_SIZE = 712
+TILE_SIZE = COLLAGE_SIZE // 2
+
+# drawn with the collage, so the picker menu (56) and the playlist window (290)
+# never scale the 712px image
+PREVIEW_SIZES = [(80, 80), (356, 356)]
+
+
+def collage_name(song_ids: List[int]) -> str:
+    return "playlist_" + "".join(str(song_id) for song_id in song_ids[:4]) + ".jpg"
+
+
+def render_collage(cover_paths: List[str], output_path: str, size: int = COLLAGE_SIZE) -> str | None:
+    """ Collage of the covers (first four) -> output_path, any thread """
+    cover_paths = [path for path in cover_paths[:4] if cover_exists(path)]
+
+    if len(cover_paths) == 1:
+        # only one image, it's the cover
+        collage = COVERS.load_variant(cover_paths[0], size, size)
+        if collage.isNull():
+            return
+        collage = fill_crop(collage, size, size)
+
+    else:
+        half = size // 2
+        tiles = []
+        for path in cover_paths:
+            tile = COVERS.load_variant(path, half, half)
+            if not tile.isNull():
+                tiles.append(fill_crop(tile, half, half))
+
+        if not tiles:
+            return
+
+        if len(tiles) < 4:
+            tiles.insert(2, tiles[1] if len(tiles) > 1 else tiles[0])
+            tiles.insert(3, tiles[0])
+
+        collage = QImage(size, size, QImage.Format_RGB32)
+        collage.fill(Qt.black)
+
+        # 2x2 grid
+        painter = QPainter(collage)
+        painter.drawImage(0, 0, tiles[0])
+        painter.drawImage(half, 0, tiles[1])
+        painter.drawImage(0, half, tiles[2])
+        painter.drawImage(half, half, tiles[3])
+        painter.end()
+
+    # write + rename, the ui never reads a half written cover
+    temp_path = os.path.join(os.path.dirname(output_path), f"collage.{gen_unique_id(8)}.tmp.jpg")
+    if not collage.save(temp_path, "JPEG", quality=90):
+        print(f"Error[Collage] can't save : {output_path}")
+        return
+    os.replace(temp_path, output_path)
+
+    # smaller sizes in the same pass, from the image already in memory
+    if os.path.dirname(os.path.abspath(output_path)) == os.path.abspath(COVER_DIR_PATH):
+        name = os.path.basename(output_path)
+        for width, height in PREVIEW_SIZES:
+            COVERS.save_variant(
+                fill_crop(collage, width, height),
+                os.path.join(COVER_DIR_PATH, variant_name(name, width, height))
+            )
+
+    return output_path
+
+
+class CollageService(QObject):
+    """
+    Playlist collages, drawn in the image pool (image_loader.py).
+        request(cover_paths, output_path, callback) -> callback(path or None) on the GUI thread
+    A collage that already exists is not drawn again, requests for a collage being
+    drawn wait for it.
+    """
+    def __init__(self, parent = None):
+        super().__init__(parent)
+
+        self._pending = {} # output path -> callbacks
+        self.rendered = 0
+        self.skipped = 0
+
+    def request(self, cover_paths: List[str], output_path: str, callback = None):
+        if cover_exists(output_path):
+            # same first four songs as before
+            self.skipped += 1
+            if callback:
+                callback(output_path)
+            return
+
+        if output_path in self._pending:
+            self._pending[output_path].append(callback)
+            return
+
+        self._pending[output_path] = [callback]
+        IMAGES.submit(
+            render_collage, list(cover_paths), output_path,
+            callback=lambda path: self._on_rendered(output_path, path)
+        )
+
+    def _on_rendered(self, output_path: str, path: str | None):
+        if path:
+            self.rendered += 1
+            # file was missing, pixmaps of an older one with that name are stale
+            COVERS.forget(output_path)
+
+        for callback in self._pending.pop(output_path, []):
+            if callback:
+                callback(path)
@@ -1,11 +1,11 @@
-from PyQt5.QtCore import Qt, QSize, pyqtSignal
+from PyQt5.QtCore import Qt, QSize, QTimer, pyqtSignal
 from PyQt5.QtWidgets import (
     QWidget, QHBoxLayout, QVBoxLayout, QFrame, 
     QLabel, QPushButton, QScrollArea, QListWidgetItem, 
     QListWidget, QListView, QSizePolicy, 
 )
-from PyQt5.QtGui import QFont, QFontMetrics, QIcon
-from helper import round_pix_form_path
+from PyQt5.QtGui import QFont, QFontMetrics, QIcon, QPixmap
+from cover_cache import set_cover
 from util import resource_path
 
 class HoverButton(QPushButton):
@@ -157,12 +157,22 @@ class ClickableOverlay(QWidget):
         super().mouseReleaseEvent(event)
 
 
+_ICONS = {}
+
+def _icon(path: str) -> QIcon:
+    # one QIcon per file for all the cards (needs the QApplication)
+    icon = _ICONS.get(path)
+    if icon is None:
+        icon = _ICONS[path] = QIcon(resource_path(path))
+    return icon
+
+
 class SongCard(QWidget):
     playRequested = pyqtSignal(int, int)
     playToggleRequested = pyqtSignal()
     showMenuRequested = pyqtSignal(int)
 
-    def __init__(self, song_indx: int, song_id: int, title: str, subtitle: str, path: str, cover_path: str, parent=None):
+    def __init__(self, song_indx: int, song_id: int, title: str, subtitle: str, path: str, cover_path: str, thumb: QPixmap = None, parent=None):
         super().__init__(parent)
         # song id
         self.song_id = song_id
@@ -185,7 +195,6 @@ class SongCard(QWidget):
 
         self.setAttribute(Qt.WA_StyledBackground, True)
         self.setFixedSize(self._width, self._height)
-        self.setStyleSheet("border: none;  background: green; margin: 20px;")
 
         main = QVBoxLayout(self)
         main.setContentsMargins(0, 0, 0, 0)
@@ -196,14 +205,6 @@ class SongCard(QWidget):
         self.thumb_container.setFrameShape(QFrame.NoFrame)
         self.thumb_container.setAttribute(Qt.WA_StyledBackground, True) #333333
 
-        self.thumb_container.setStyleSheet("""
-            QFrame {
-                border: none;
-                background-color: blue;
-                border-radius: 14px;
-            }
-        """)
-
         self.thumb_container.setStyleSheet("border: none; background: green;")
 
         thumb_layout = QVBoxLayout(self.thumb_container)
@@ -214,9 +215,13 @@ class SongCard(QWidget):
         self.thumb_label = QLabel()
         self.thumb_label.setFixedSize(self.thumb_width, self.thumb_height)
         self.thumb_label.setAlignment(Qt.AlignCenter)
-        self.thumb_label.setPixmap(
-            round_pix_form_path(cover_path, self.thumb_width, self.thumb_height, 8)
-        )
+        # thumb -> already scaled and rounded (startup snapshot)
+        # has_thumb -> the label shows the cover, not the placeholder
+        self.has_thumb = thumb is not None
+        if thumb is not None:
+            self.thumb_label.setPixmap(thumb)
+        else:
+            set_cover(self.thumb_label, cover_path, self.thumb_width, self.thumb_height, 8, on_ready=self._thumb_ready)
 
 
         self.thumb_label.setStyleSheet(f"""
@@ -231,72 +236,9 @@ class SongCard(QWidget):
         thumb_layout.addWidget(self.thumb_label)
 
 
-        # Overlay
-        self.overlay = ClickableOverlay(self.thumb_container)
-        self.overlay.setGeometry(0, 0, self.thumb_width, self.thumb_height)
-        self.overlay.setAttribute(Qt.WA_StyledBackground, True)
-        self.overlay.setCursor(Qt.PointingHandCursor)
-        self.overlay.clicked.connect(self._on_clicked)
-        self.overlay.setStyleSheet("""
-            QWidget {
-                border: none;
-                background-color: rgba(0, 0, 0, 0.30);
-                border-radius: 14px;
-            }
-        """)
-
-        # self.overlay.setStyleSheet("background-color: yellow;")
-
-        ov = QVBoxLayout(self.overlay)
-        ov.setContentsMargins(8, 8, 8, 8)
-        ov.setSpacing(0)
-
-        # top-right 3-dots
-        top_row = QHBoxLayout()
-        top_row.setContentsMargins(0, 0, 0, 0)
-        top_row.setSpacing(0)
-        top_row.addStretch(1)
-
-
-        self.menu_btn = QPushButton(self.overlay)
-        self.menu_btn.setCursor(Qt.PointingHandCursor)
-        self.menu_btn.setIcon(QIcon(resource_path("res/three-dot-menu.png")))  
-        self.menu_btn.setFixedSize(46, 46)
-        self.menu_btn.setIconSize(QSize(26, 26))
-
-        self.menu_btn.setStyleSheet("""
-            QPushButton {
-                background: transparent;
-                border: none;
-                border-radius: 23px;
-            }
-                                    
-            QPushButton:hover {
-                background-color: rgba(255, 255, 255, 0.40);
-            }
-            QPushButton:pressed {
-                background-color: rgba(255, 255, 255, 0.50);
-            }
-        """)
-        self.menu_btn.clicked.connect(self._on_menu_clicked)
-        top_row.addWidget(self.menu_btn, 0, Qt.AlignRight)
-        ov.addLayout(top_row)
-
-        ov.addStretch(1)
-
-        # center play
-        self.play_icon = QIcon(resource_path("res/play-card.png"))
-        self.pause_icon = QIcon(resource_path("res/pause.png"))
-        
-        self.play_btn = HoverButton(parent=self.overlay, size=76, icon_size=38, transform_scale=6)
-        self.play_btn.setCursor(Qt.PointingHandCursor)
-        self.play_btn.setIcon(self.play_icon)  # or use your icon
-
-        self.play_btn.clicked.connect(self._on_play_clicked)
-        ov.addWidget(self.play_btn, 0, Qt.AlignHCenter)
-        ov.addStretch(2)
-
-        self.overlay.hide()
+        # hover overlay (menu + play buttons) is built on the first hover / play,
+        # most cards never need it
+        self.overlay: ClickableOverlay = None
 
         main.addWidget(self.thumb_container, 0, Qt.AlignTop)
 
@@ -365,10 +307,93 @@ class SongCard(QWidget):
             }
         """)
     
+    def _build_overlay(self):
+        self.overlay = ClickableOverlay(self.thumb_container)
+        self.overlay.setGeometry(0, 0, self.thumb_width, self.thumb_height)
+        self.overlay.setAttribute(Qt.WA_StyledBackground, True)
+        self.overlay.setCursor(Qt.PointingHandCursor)
+        self.overlay.clicked.connect(self._on_clicked)
+        self.overlay.setStyleSheet("""
+            QWidget {
+                border: none;
+                background-color: rgba(0, 0, 0, 0.30);
+                border-radius: 14px;
+            }
+        """)
+
+        ov = QVBoxLayout(self.overlay)
+        ov.setContentsMargins(8, 8, 8, 8)
+        ov.setSpacing(0)
+
+        # top-right 3-dots
+        top_row = QHBoxLayout()
+        top_row.setContentsMargins(0, 0, 0, 0)
+        top_row.setSpacing(0)
+        top_row.addStretch(1)
+
+
+        self.menu_btn = QPushButton(self.overlay)
+        self.menu_btn.setCursor(Qt.PointingHandCursor)
+        self.menu_btn.setIcon(_icon("res/three-dot-menu.png"))
+        self.menu_btn.setFixedSize(46, 46)
+        self.menu_btn.setIconSize(QSize(26, 26))
+
+        self.menu_btn.setStyleSheet("""
+            QPushButton {
+                background: transparent;
+                border: none;
+                border-radius: 23px;
+            }
+                                    
+            QPushButton:hover {
+                background-color: rgba(255, 255, 255, 0.40);
+            }
+            QPushButton:pressed {
+                background-color: rgba(255, 255, 255, 0.50);
+            }
+        """)
+        self.menu_btn.clicked.connect(self._on_menu_clicked)
+        top_row.addWidget(self.menu_btn, 0, Qt.AlignRight)
+        ov.addLayout(top_row)
+
+        ov.addStretch(1)
+
+        # center play
+        self.play_btn = HoverButton(parent=self.overlay, size=76, icon_size=38, transform_scale=6)
+        self.play_btn.setCursor(Qt.PointingHandCursor)
+        self.play_btn.setIcon(_icon("res/play-card.png"))
+
+        self.play_btn.clicked.connect(self._on_play_clicked)
+        ov.addWidget(self.play_btn, 0, Qt.AlignHCenter)
+        ov.addStretch(2)
+
+        self.overlay.hide()
+
     def _on_menu_clicked(self):
         self.showMenuRequested.emit(self.song_id)
 
+    def set_info(self, title: str, subtitle: str, path: str, cover_path: str):
+        self.title_text = title
+        self.subtitle_text = subtitle
+        self.mp3_path = path
+
+        self.title_lbl.setText(title)
+        self.subtitle_lbl.setText(subtitle)
+
+        if cover_path != self.cover_path:
+            self.cover_path = cover_path
+            self.has_thumb = False
+            set_cover(self.thumb_label, cover_path, self.thumb_width, self.thumb_height, 8, on_ready=self._thumb_ready)
+
+    def _thumb_ready(self, pixmap: QPixmap):
+        self.has_thumb = True
+
     def set_active(self, active: bool):
+        if self.overlay is None:
+            if not active:
+                return
+            self._build_overlay()
+
         if active:
             self.play_btn.clicked.disconnect()
             self.play_btn.clicked.connect(self.playToggleRequested.emit)
@@ -384,20 +409,25 @@ class SongCard(QWidget):
 
 
     def set_play(self, value: bool):
+        if self.overlay is None:
+            self._build_overlay()
+
         if value:
-            self.play_btn.setIcon(self.pause_icon)
+            self.play_btn.setIcon(_icon("res/pause.png"))
             self.play_btn.set_padding(0)
 
         else:
-            self.play_btn.setIcon(self.play_icon)
+            self.play_btn.setIcon(_icon("res/play-card.png"))
             self.play_btn.set_padding(0)
 
     def on_enter(self):
+        if self.overlay is None:
+            self._build_overlay()
         if not self._active:
             self.overlay.show()
 
     def on_leave(self):
-        if not self._active:
+        if self.overlay is not None and not self._active:
             self.overlay.hide()
 
     def _on_play_clicked(self):
@@ -417,6 +447,8 @@ class PlaylistSection(QWidget):
         super().__init__(parent)
 
         self.items: dict[str, SongCard] = {}
+        # height is updated once for cards added in the same event loop pass
+        self._height_pending = False
 
         self.setAttribute(Qt.WA_StyledBackground, True)
 
@@ -498,14 +530,14 @@ class PlaylistSection(QWidget):
     def request_play(self, song_id: int, song_indx: int):
         self.playRequested.emit(song_id, song_indx)
 
-    def add_song(self, song_indx: int, song_id: int, title: str, subtitle: str, path: str, cover_path: str, play = False):
+    def add_song(self, song_indx: int, song_id: int, title: str, subtitle: str, path: str, cover_path: str, play = False, thumb: QPixmap = None):
         """
         Add a PlaylistCard title to this section.
         If top=True, inserts at top; otherwise appends at the end.
         """
         item = QListWidgetItem()
 
-        song_card = SongCard(song_indx, song_id, title, subtitle, path, cover_path)
+        song_card = SongCard(song_indx, song_id, title, subtitle, path, cover_path, thumb=thumb)
         song_card.playRequested.connect(self.request_play)
         song_card.playToggleRequested.connect(self.playToggleRequested.emit)
         song_card.showMenuRequested.connect(self._on_show_menu_requested)
@@ -522,8 +554,26 @@ class PlaylistSection(QWidget):
             self._list.addItem(item)
 
         self._list.setItemWidget(item, song_card)
-        self._update_height_for_content()
 
+        if not self._height_pending:
+            self._height_pending = True
+            QTimer.singleShot(0, self._update_height_for_content)
+
+
+    def update_song(self, song_id: int, title: str, subtitle: str, path: str, cover_path: str):
+        card_obj = self.items.get(song_id)
+        if card_obj:
+            card_obj.set_info(title, subtitle, path, cover_path)
+
+    def update_song_path(self, song_id: int, path: str):
+        # file renamed / moved, same song
+        card_obj = self.items.get(song_id)
+        if card_obj:
+            card_obj.mp3_path = path
+
+    def cards(self) -> list:
+        # song cards in screen order
+        return [self._list.itemWidget(self._list.item(i)) for i in range(self._list.count())]
 
     def resizeEvent(self, event):
         super().resizeEvent(event)
@@ -534,6 +584,7 @@ class PlaylistSection(QWidget):
         Resize the internal QListWidget vertically so all rows are visible.
         The outer page scroll area will then scroll the whole section.
         """
+        self._height_pending = False
         count = self._list.count()
         if count == 0:
             self._list.setFixedHeight(0)
@@ -609,9 +660,18 @@ class ContentArea(QFrame):
         self.playRequested.emit(song_id, song_indx)
 
 
-    def add_item(self, song_indx: int, song_id: int, title: str, subtitle: str, path: str, cover_path: str, play=False):
+    def add_item(self, song_indx: int, song_id: int, title: str, subtitle: str, path: str, cover_path: str, play=False, thumb=None):
         # is play then add on top
-        self.section_library.add_song(song_indx, song_id, title, subtitle, path, cover_path, play=play)
+        self.section_library.add_song(song_indx, song_id, title, subtitle, path, cover_path, play=play, thumb=thumb)
+
+    def update_item(self, song_id: int, title: str, subtitle: str, path: str, cover_path: str):
+        self.section_library.update_song(song_id, title, subtitle, path, cover_path)
+
+    def update_item_path(self, song_id: int, path: str):
+        self.section_library.update_song_path(song_id, path)
+
+    def cards(self) -> list:
+        return self.section_library.cards()
 
     def remove_song(self, song_id: int):
         self.section_library.remove_song(song_id)
@@ -0,0 +1,236 @@
+import os
+from collections import OrderedDict
+from PyQt5.QtGui import QImage, QImageReader, QPixmap, QColor
+from image_loader import IMAGES, decode_image, round_image
+from cover_store import STORE
+from util import COVER_DIR_PATH, gen_unique_id, variant_name
+
+# Sizes of the covers on the screen:
+#   80  -> bottom bar (and 78 / 56 rows and menus)
+#   86  -> small thumbs
+#   240x243 -> home screen cards
+#   356 -> playlist collage tiles (and the 290 big cover)
+#   712 -> playlist covers
+# Each cover is scaled once per size of this ladder and saved next to the original
+# as "<name>@<w>x<h><ext>", any other size is scaled from the next bigger variant.
+VARIANT_SIZES = [(80, 80), (86, 86), (240, 243), (356, 356), (712, 712)]
+
+
+def _decode(path: str, width: int = 0, height: int = 0) -> QImage:
+    # packed covers (cover_store.py) are decoded from the pack, no file to open
+    if STORE.enabled and os.path.basename(path) in STORE:
+        data = STORE.read(os.path.basename(path))
+        if data is not None:
+            return decode_image(data, width, height)
+    return decode_image(path, width, height)
+
+
+def _image_size(path: str) -> tuple:
+    if STORE.enabled:
+        info = STORE.info(os.path.basename(path))
+        if info is not None:
+            return (info[2], info[3])
+
+    size = QImageReader(path).size()
+    return (size.width(), size.height())
+
+
+def _variant_size(width: int, height: int) -> tuple | None:
+    for size in VARIANT_SIZES:
+        if size[0] >= width and size[1] >= height:
+            return size
+    return None
+
+
+class CoverCache():
+    """
+    Rounded cover pixmaps for the widgets, keyed by (cover path, width, height, radius).
+
+    Memory -> LRU of QPixmaps, at most `budget_bytes` of pixels.
+    Disk   -> scaled variants of the covers of COVER_DIR_PATH (VARIANT_SIZES), so a cover
+              is decoded at full size only once, ever.
+    get()     -> pixmap now (decoded on the calling thread if it's not in memory)
+    request() -> pixmap if it's in memory, else None and callback(pixmap) later, the
+                 decoding runs in the image pool (image_loader.py)
+    Used from the GUI thread (QPixmap), load_variant() / save_variant() run in the workers.
+    """
+    def __init__(self, budget_bytes: int = 64 * 1024 * 1024):
+        self.budget_bytes = budget_bytes
+        self._pixmaps: "OrderedDict[tuple, QPixmap]" = OrderedDict()
+        self._bytes = 0
+        self._pending = {} # key -> callbacks waiting for the pool
+        self._placeholders = {}
+
+        self.hits = 0
+        self.misses = 0
+        self.variants_made = 0
+
+    def get(self, path: str, width: int, height: int, radius: int = 8) -> QPixmap:
+        key = (path, width, height, radius)
+        pixmap = self._pixmaps.get(key)
+        if pixmap is not None:
+            self._pixmaps.move_to_end(key)
+            self.hits += 1
+            return pixmap
+
+        self.misses += 1
+        return self._loaded(key, self._load_rounded(path, width, height, radius))
+
+    def request(self, path: str, width: int, height: int, radius: int, callback) -> QPixmap | None:
+        key = (path, width, height, radius)
+        pixmap = self._pixmaps.get(key)
+        if pixmap is not None:
+            self._pixmaps.move_to_end(key)
+            self.hits += 1
+            return pixmap
+
+        if key in self._pending:
+            # same cover asked twice (many cards of one album), decoded once
+            self._pending[key].append(callback)
+            return
+
+        self.misses += 1
+        self._pending[key] = [callback]
+        IMAGES.submit(self._load_rounded, path, width, height, radius, callback=lambda image: self._on_loaded(key, image))
+
+    def _on_loaded(self, key: tuple, image: QImage | None):
+        pixmap = self._loaded(key, image)
+        for callback in self._pending.pop(key, []):
+            try:
+                callback(pixmap)
+            except RuntimeError:
+                # widget deleted while its cover was loading
+                pass
+
+    def _loaded(self, key: tuple, image: QImage | None) -> QPixmap:
+        if image is None or image.isNull():
+            # not cached, the file can show up later (cover extracted by the loader)
+            return QPixmap()
+
+        pixmap = QPixmap.fromImage(image)
+        self._put(key, pixmap)
+        return pixmap
+
+    def _load_rounded(self, path: str, width: int, height: int, radius: int) -> QImage:
+        # any thread
+        return round_image(self.load_variant(path, width, height), width, height, radius)
+
+    def placeholder(self, width: int, height: int, radius: int = 8) -> QPixmap:
+        # shown until the cover is loaded
+        key = (width, height, radius)
+        if key not in self._placeholders:
+            image = QImage(width, height, QImage.Format_ARGB32_Premultiplied)
+            image.fill(QColor("#2a2a2a"))
+            self._placeholders[key] = QPixmap.fromImage(round_image(image, width, height, radius))
+
+        return self._placeholders[key]
+
+    def _put(self, key: tuple, pixmap: QPixmap):
+        old = self._pixmaps.pop(key, None)
+        if old is not None:
+            # get() while a request() of the same cover was in the pool
+            self._bytes -= self._cost(old)
+
+        self._pixmaps[key] = pixmap
+        self._bytes += self._cost(pixmap)
+
+        while self._bytes > self.budget_bytes and len(self._pixmaps) > 1:
+            _, old = self._pixmaps.popitem(last=False)
+            self._bytes -= self._cost(old)
+
+    def _cost(self, pixmap: QPixmap) -> int:
+        return pixmap.width() * pixmap.height() * max(pixmap.depth(), 8) // 8
+
+    def load_variant(self, path: str, width: int, height: int) -> QImage:
+        # image of at least width x height (the variant size), any thread
+        size = _variant_size(width, height)
+        in_cover_dir = os.path.dirname(os.path.abspath(path)) == os.path.abspath(COVER_DIR_PATH)
+
+        if not in_cover_dir:
+            # resource images
+            return decode_image(path, width, height)
+
+        if size is None:
+            # bigger than every variant -> from the original
+            return _decode(path, width, height)
+
+        variant_path = os.path.join(COVER_DIR_PATH, variant_name(os.path.basename(path), *size))
+        image = _decode(variant_path)
+        if not image.isNull():
+            return image
+
+        if _image_size(path) == size:
+            # already this size (collages), a copy would be the same file
+            return _decode(path, width, height)
+
+        image = _decode(path, *size)
+        if not image.isNull():
+            self.save_variant(image, variant_path)
+        return image
+
+    def save_variant(self, image: QImage, variant_path: str):
+        # write + rename, never a half written variant
+        # (no "@" in the temp name, a left over one is an orphan for the library gc)
+        ext = os.path.splitext(variant_path)[1]
+        temp_path = os.path.join(COVER_DIR_PATH, f"variant.{gen_unique_id(8)}.tmp{ext}")
+        if image.save(temp_path, quality=90):
+            os.replace(temp_path, variant_path)
+            self.variants_made += 1
+        else:
+            print(f"Error[CoverCache] can't save : {variant_path}")
+
+    def forget(self, path: str):
+        # drop the pixmaps of a cover from memory (the disk variants stay)
+        for key in [key for key in self._pixmaps if key[0] == path]:
+            self._bytes -= self._cost(self._pixmaps.pop(key))
+
+    def invalidate(self, path: str):
+        # cover file was written again, drop every size of it
+        self.forget(path)
+
+        name = os.path.basename(path)
+        for size in VARIANT_SIZES:
+            try:
+                os.remove(os.path.join(COVER_DIR_PATH, variant_name(name, *size)))
+            except FileNotFoundError:
+                pass
+            except OSError as e:
+                print(f"Error[CoverCache] {e}")
+
+        if STORE.enabled:
+            STORE.remove([variant_name(name, *size) for size in VARIANT_SIZES])
+
+    def stats(self) -> dict:
+        return {
+            "pixmaps": len(self._pixmaps), "bytes": self._bytes,
+            "hits": self.hits, "misses": self.misses, "variants_made": self.variants_made,
+        }
+
+
+COVERS = CoverCache()
+
+
+def cover_pixmap(path: str, width: int, height: int, radius: int = 8) -> QPixmap:
+    return COVERS.get(path, width, height, radius)
+
+
+def set_cover(label, path: str, width: int, height: int, radius: int = 8, on_ready = None):
+    """
+    Cover on a QLabel without blocking: cached pixmap now, else a placeholder and the
+    cover when it's decoded (skipped if the label shows an other cover by then).
+    on_ready(pixmap) -> called when the real cover is set
+    """
+    label._cover_key = key = (path, width, height, radius)
+
+    def ready(pixmap: QPixmap):
+        if getattr(label, "_cover_key", None) != key:
+            return
+        label.setPixmap(pixmap if not pixmap.isNull() else COVERS.placeholder(width, height, radius))
+        if on_ready is not None and not pixmap.isNull():
+            on_ready(pixmap)
+
+    pixmap = COVERS.request(path, width, height, radius, ready)
+    if pixmap is None:
+        label.setPixmap(COVERS.placeholder(width, height, radius))
+    else:
+        ready(pixmap)
@@ -0,0 +1,384 @@
+import os
+import sys
+import mmap
+import time
+import struct
+import threading
+from typing import Dict, List
+from PyQt5.QtCore import QBuffer, QByteArray, QIODevice
+from PyQt5.QtGui import QImageReader
+from util import AURIX_DIR_PATH, COVER_DIR_PATH
+
+# Optional packed layout of the cover dir, for libraries with tens of thousands of covers
+# (one open() per thumbnail and a huge directory otherwise).
+#
+# covers.pack -> append-only, one record per cover:
+#                header (magic, flags, len of name, len of data, width, height, mtime) + name + data
+#                a removed cover is a record with the TOMBSTONE flag, compact() drops them
+# covers.idx  -> index table, name -> (offset, length, width, height, mtime), written after
+#                every change with the size of the pack it covers. Records after that size
+#                (crash before the idx was written) are read from the pack on open.
+#
+# The store is on when covers.pack exists (`python cover_store.py --migrate`), names are the
+# file names of the cover dir, so cover paths in the db and the ui stay the same.
+PACK_PATH = os.path.join(AURIX_DIR_PATH, "covers.pack")
+INDEX_PATH = os.path.join(AURIX_DIR_PATH, "covers.idx")
+
+_RECORD = struct.Struct("<4sBHIHHd") # magic, flags, len of name, len of data, width, height, mtime
+_RECORD_MAGIC = b"CVRR"
+TOMBSTONE = 1
+
+_INDEX_HEADER = struct.Struct("<4sHQI") # magic, version, pack size, count
+_INDEX_ENTRY = struct.Struct("<HQIHHd") # len of name, offset, length, width, height, mtime
+_INDEX_MAGIC = b"AXCI"
+_INDEX_VERSION = 1
+
+
+def _image_size(data: bytes) -> tuple:
+    # header only, the image is not decoded
+    buffer = QBuffer()
+    buffer.setData(QByteArray(data))
+    buffer.open(QIODevice.ReadOnly)
+    size = QImageReader(buffer).size()
+    return (size.width(), size.height()) if size.isValid() else (0, 0)
+
+
+class CoverStore():
+    """
+    name -> cover bytes, read with mmap (no open() per cover, only the pages of the record
+    are read from the disk).
+    Thread safe, one process only (the app).
+    """
+    def __init__(self, pack_path: str = PACK_PATH, index_path: str = INDEX_PATH):
+        self.pack_path = pack_path
+        self.index_path = index_path
+
+        self.index: Dict[str, tuple] = {} # name -> (offset, length, width, height, mtime)
+        self.dead_bytes = 0
+
+        self._file = None
+        self._map: mmap.mmap = None
+        self._size = 0
+        self._lock = threading.RLock()
+
+    @property
+    def size(self) -> int:
+        return self._size
+
+    @property
+    def enabled(self) -> bool:
+        return self._file is not None or os.path.isfile(self.pack_path)
+
+    def open(self) -> bool:
+        with self._lock:
+            if self._file is not None:
+                return True
+            if not os.path.isfile(self.pack_path):
+                return False
+
+            try:
+                self._file = open(self.pack_path, "r+b")
+                self._size = os.fstat(self._file.fileno()).st_size
+                self._remap()
+
+                indexed = self._read_index()
+                if indexed < self._size:
+                    # pack is bigger than the idx -> records written after it
+                    self._scan(indexed)
+                    self._write_index()
+
+            except OSError as e:
+                print(f"Error[CoverStore] {self.pack_path} : {e}")
+                self.close()
+                return False
+
+            return True
+
+    def _unmap(self):
+        if self._map is None:
+            return
+        try:
+            self._map.close()
+        except BufferError:
+            # a view from read() is still used (decoding in an other thread),
+            # the old map is closed when the last view is released
+            pass
+        self._map = None
+
+    def _remap(self):
+        self._unmap()
+
+        if self._size:
+            self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+
+    def _read_index(self) -> int:
+        # -> size of the pack covered by the idx (0 -> no usable idx)
+        self.index.clear()
+        self.dead_bytes = 0
+        try:
+            with open(self.index_path, "rb") as f:
+                data = f.read()
+
+            magic, version, pack_size, count = _INDEX_HEADER.unpack_from(data, 0)
+            if magic != _INDEX_MAGIC or version != _INDEX_VERSION or pack_size > self._size:
+                return 0
+
+            offset = _INDEX_HEADER.size
+            for _ in range(count):
+                name_len, *entry = _INDEX_ENTRY.unpack_from(data, offset)
+                offset += _INDEX_ENTRY.size
+                name = data[offset : offset + name_len].decode("utf-8")
+                offset += name_len
+                self.index[name] = tuple(entry)
+
+        except (OSError, struct.error, UnicodeDecodeError):
+            self.index.clear()
+            return 0
+
+        live = sum(_RECORD.size + len(name.encode("utf-8")) + entry[1] for name, entry in self.index.items())
+        self.dead_bytes = max(0, pack_size - live)
+        return pack_size
+
+    def _scan(self, offset: int):
+        while offset + _RECORD.size <= self._size:
+            magic, flags, name_len, length, width, height, mtime = _RECORD.unpack_from(self._map, offset)
+            end = offset + _RECORD.size + name_len + length
+            if magic != _RECORD_MAGIC or end > self._size:
+                # half written record at the end (crash), cut it
+                print(f"[CoverStore] Broken record at {offset}, pack cut to it")
+                self._unmap()
+                self._file.truncate(offset)
+                self._size = offset
+                self._remap()
+                return
+
+            name = self._map[offset + _RECORD.size : offset + _RECORD.size + name_len].decode("utf-8")
+            if name in self.index:
+                # replaced / removed
+                self.dead_bytes += _RECORD.size + name_len + self.index.pop(name)[1]
+
+            if flags & TOMBSTONE:
+                self.dead_bytes += _RECORD.size + name_len
+            else:
+                self.index[name] = (offset + _RECORD.size + name_len, length, width, height, mtime)
+
+            offset = end
+
+    def _write_index(self):
+        entries = [_INDEX_HEADER.pack(_INDEX_MAGIC, _INDEX_VERSION, self._size, len(self.index))]
+        for name, entry in self.index.items():
+            name = name.encode("utf-8")
+            entries.append(_INDEX_ENTRY.pack(len(name), *entry))
+            entries.append(name)
+
+        temp_path = self.index_path + ".tmp"
+        with open(temp_path, "wb") as f:
+            f.write(b"".join(entries))
+        os.replace(temp_path, self.index_path)
+
+    def _append(self, name: str, data: bytes, flags: int = 0, mtime: float = None) -> tuple:
+        width, height = _image_size(data) if data else (0, 0)
+        mtime = mtime or time.time()
+        name_bytes = name.encode("utf-8")
+
+        self._file.seek(self._size)
+        self._file.write(_RECORD.pack(_RECORD_MAGIC, flags, len(name_bytes), len(data), width, height, mtime))
+        self._file.write(name_bytes)
+        self._file.write(data)
+        self._file.flush()
+
+        offset = self._size + _RECORD.size + len(name_bytes)
+        self._size = offset + len(data)
+        return (offset, len(data), width, height, mtime)
+
+    def __contains__(self, name: str) -> bool:
+        return self.open() and name in self.index
+
+    def info(self, name: str) -> tuple | None:
+        # (offset, length, width, height, mtime)
+        if not self.open():
+            return
+        return self.index.get(name)
+
+    def read(self, name: str) -> memoryview | None:
+        # view of the mapped record, no copy (decode it, don't keep it)
+        if not self.open():
+            return
+
+        with self._lock:
+            entry = self.index.get(name)
+            if entry is None:
+                return
+
+            offset, length = entry[0], entry[1]
+            if self._map is None or offset + length > len(self._map):
+                self._remap()
+            return memoryview(self._map)[offset : offset + length]
+
+    def put(self, name: str, data: bytes, mtime: float = None, save_index: bool = True) -> bool:
+        if not self.open():
+            return False
+
+        with self._lock:
+            if name in self.index:
+                # names are content hashes, same name -> same image
+                return False
+
+            self.index[name] = self._append(name, data, mtime=mtime)
+            if save_index:
+                self._write_index()
+            return True
+
+    def remove(self, names: List[str]) -> int:
+        # -> bytes freed by compact()
+        if not self.open():
+            return 0
+
+        freed = 0
+        with self._lock:
+            for name in names:
+                entry = self.index.pop(name, None)
+                if entry is None:
+                    continue
+
+                self._append(name, b"", flags=TOMBSTONE)
+                freed += _RECORD.size + len(name.encode("utf-8")) + entry[1]
+
+            if freed:
+                self.dead_bytes += freed
+                self._write_index()
+        return freed
+
+    def compact(self) -> int:
+        """ Rewrites the pack with the live covers only -> bytes reclaimed """
+        if not self.open():
+            return 0
+
+        with self._lock:
+            old_size = self._size
+            temp_path = self.pack_path + ".tmp"
+            index = {}
+
+            with open(temp_path, "wb") as f:
+                size = 0
+                for name, (offset, length, width, height, mtime) in self.index.items():
+                    name_bytes = name.encode("utf-8")
+                    f.write(_RECORD.pack(_RECORD_MAGIC, 0, len(name_bytes), length, width, height, mtime))
+                    f.write(name_bytes)
+                    f.write(memoryview(self._map)[offset : offset + length])
+
+                    size += _RECORD.size + len(name_bytes)
+                    index[name] = (size, length, width, height, mtime)
+                    size += length
+
+            # a mapped file can't be replaced on windows
+            self.close()
+            os.replace(temp_path, self.pack_path)
+
+            self.index = index
+            self._file = open(self.pack_path, "r+b")
+            self._size = size
+            self.dead_bytes = 0
+            self._remap()
+            self._write_index()
+
+        print(f"[CoverStore] Compacted : {(old_size - size) / (1024 * 1024):.1f} MB reclaimed")
+        return old_size - size
+
+    def close(self):
+        with self._lock:
+            self._unmap()
+
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+
+STORE = CoverStore()
+
+
+def _in_cover_dir(path: str) -> bool:
+    return os.path.dirname(os.path.abspath(path)) == os.path.abspath(COVER_DIR_PATH)
+
+
+def cover_exists(path: str) -> bool:
+    # loose file or packed cover
+    if os.path.isfile(path):
+        return True
+    return _in_cover_dir(path) and STORE.enabled and os.path.basename(path) in STORE
+
+
+def read_cover(path: str) -> bytes | memoryview | None:
+    """ bytes of a cover, from the pack first (mmap view, no open() and no copy), else the loose file """
+    if STORE.enabled and _in_cover_dir(path):
+        data = STORE.read(os.path.basename(path))
+        if data is not None:
+            return data
+
+    try:
+        with open(path, "rb") as f:
+            return f.read()
+    except OSError:
+        return
+
+
+def migrate_loose_covers(store: CoverStore = STORE, names: List[str] = None, min_age: float = 0) -> int:
+    """
+    Moves covers of the cover dir into the pack (all of them, or `names`) -> count.
+    The pack is created if needed. Temp files and covers newer than `min_age` sec stay loose.
+    """
+    if not store.enabled:
+        open(store.pack_path, "ab").close()
+    if not store.open():
+        return 0
+
+    if names is None:
+        names = [entry.name for entry in os.scandir(COVER_DIR_PATH) if entry.is_file(follow_symlinks=False)]
+
+    deadline = time.time() - min_age
+    moved = []
+    for name in names:
+        if ".tmp" in name:
+            continue
+
+        path = os.path.join(COVER_DIR_PATH, name)
+        try:
+            mtime = os.path.getmtime(path)
+            if mtime > deadline:
+                continue
+            with open(path, "rb") as f:
+                data = f.read()
+        except OSError:
+            continue
+
+        store.put(name, data, mtime=mtime, save_index=False)
+        moved.append(path)
+
+    with store._lock:
+        store._write_index()
+
+    # files are removed after the idx is on the disk, a crash never loses a cover
+    for path in moved:
+        try:
+            os.remove(path)
+        except OSError as e:
+            print(f"Error[CoverStore] {e}")
+
+    if moved:
+        print(f"[CoverStore] {len(moved)} covers packed")
+    return len(moved)
+
+
+if __name__ == "__main__":
+    # python cover_store.py --migrate | --compact | --stats
+    arg = sys.argv[1] if len(sys.argv) > 1 else "--stats"
+
+    if arg == "--migrate":
+        migrate_loose_covers()
+    elif arg == "--compact":
+        STORE.compact()
+
+    if STORE.open():
+        print(f"[CoverStore] {len(STORE.index)} covers, {STORE.size / (1024 * 1024):.1f} MB, {STORE.dead_bytes / (1024 * 1024):.1f} MB dead")
+    else:
+        print(f"[CoverStore] No pack, covers are loose files in {COVER_DIR_PATH}")
@@ -1,31 +1,294 @@
+import re
+import sys
 import sqlite3
+import threading
+from collections import OrderedDict
 from typing import List, Dict
+from urllib.request import pathname2url
 from util import DATABASE_PATH, dict_format, MUSIC_DIR_PATH
 import os
 
+
+class Record():
+    """
+    Read-only row of the cache, works like sqlite3.Row (row["title"], row[0], dict(row)).
+    Column names are shared by every record of the same query, so a record is only a tuple.
+    """
+    __slots__ = ("_index", "_values")
+
+    _indexes: Dict[tuple, Dict[str, int]] = {}
+
+    def __init__(self, keys: tuple, values: tuple):
+        index = self._indexes.get(keys)
+        if index is None:
+            index = self._indexes.setdefault(keys, {key: i for i, key in enumerate(keys)})
+
+        self._index = index
+        self._values = values
+
+    @classmethod
+    def from_row(cls, row: sqlite3.Row) -> "Record":
+        return cls(tuple(row.keys()), tuple(row))
+
+    def __getitem__(self, key: str | int):
+        if isinstance(key, str):
+            return self._values[self._index[key]]
+        return self._values[key]
+
+    def get(self, key: str, default = None):
+        if key in self._index:
+            return self._values[self._index[key]]
+        return default
+
+    def keys(self) -> list:
+        return list(self._index)
+
+    def __iter__(self):
+        return iter(self._values)
+
+    def __len__(self):
+        return len(self._values)
+
+    def __repr__(self):
+        return f"Record({dict(zip(self._index, self._values))})"
+
+
+class RowCache():
+    """ Bounded LRU of id -> Record. maxsize = 0 disables it. """
+
+    def __init__(self, maxsize: int):
+        self.maxsize = maxsize
+        self._rows: "OrderedDict[int, Record]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, row_id: int) -> Record | None:
+        record = self._rows.get(row_id)
+        if record is None:
+            self.misses += 1
+            return
+
+        self._rows.move_to_end(row_id)
+        self.hits += 1
+        return record
+
+    def put(self, row_id: int, row: sqlite3.Row | None) -> Record | None:
+        if row is None or not self.maxsize:
+            return row
+
+        record = Record.from_row(row)
+        self._rows[row_id] = record
+        self._rows.move_to_end(row_id)
+
+        if len(self._rows) > self.maxsize:
+            self._rows.popitem(last=False)
+
+        return record
+
+    def invalidate(self, row_id: int):
+        self._rows.pop(row_id, None)
+
+    def clear(self):
+        self._rows.clear()
+
+    def stats(self) -> dict:
+        return {"size": len(self._rows), "hits": self.hits, "misses": self.misses}
+
+
+class ConnectionManager():
+    """
+    Hands out the connections for one database file.
+
+    writer() -> the only connection allowed to write (used by DataBaseWorker)
+    reader() -> read-only connection, one per thread
+
+    The db runs in WAL mode, so readers never wait for the writer
+    and the writer never waits for readers.
+    """
+    _managers: Dict[str, "ConnectionManager"] = {}
+    _managers_lock = threading.Lock()
+
+    # pragmas for every connection
+    busy_timeout = 5000 # ms
+    cache_size = -16000 # negative -> KiB, so 16 MB page cache
+    mmap_size = 256 * 1024 * 1024 # 256 MB
+
+    @classmethod
+    def get(cls, path: str) -> "ConnectionManager":
+        path = os.path.abspath(path)
+
+        with cls._managers_lock:
+            manager = cls._managers.get(path)
+            if manager is None:
+                manager = cls(path)
+                cls._managers[path] = manager
+
+            return manager
+
+    def __init__(self, path: str):
+        self.path = path
+
+        self._writer: sqlite3.Connection = None
+        self._writer_lock = threading.Lock()
+        self._local = threading.local()
+
+    def writer(self) -> sqlite3.Connection:
+        with self._writer_lock:
+            if self._writer is None:
+                # can be opened from any thread, but only one thread should write with it
+                self._writer = self._connect(read_only=False)
+
+            return self._writer
+
+    def reader(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is not None:
+            return conn
+
+        if not os.path.exists(self.path):
+            # read-only connection can't create the db file
+            self.writer()
+
+        conn = self._connect(read_only=True)
+        self._local.conn = conn
+        return conn
+
+    def close_writer(self):
+        with self._writer_lock:
+            if self._writer is not None:
+                self._writer.close()
+                self._writer = None
+
+    def close_reader(self):
+        # close the read-only connection of the calling thread
+        conn = getattr(self._local, "conn", None)
+        if conn is not None:
+            conn.close()
+            self._local.conn = None
+
+    def _connect(self, read_only: bool) -> sqlite3.Connection:
+        if read_only:
+            uri = f"file:{pathname2url(self.path)}?mode=ro"
+            conn = sqlite3.connect(uri, uri=True, timeout=self.busy_timeout / 1000)
+        else:
+            conn = sqlite3.connect(self.path, timeout=self.busy_timeout / 1000, check_same_thread=False)
+
+        # row_factory to get dict-like rows
+        conn.row_factory = sqlite3.Row
+
+        if not read_only:
+            # persistent, stored in the db file
+            conn.execute("PRAGMA journal_mode = WAL")
+
+        # safe with WAL, only the last commits can be lost on power failure
+        conn.execute("PRAGMA synchronous = NORMAL")
+        conn.execute(f"PRAGMA busy_timeout = {self.busy_timeout}")
+        conn.execute(f"PRAGMA cache_size = {self.cache_size}")
+        conn.execute(f"PRAGMA mmap_size = {self.mmap_size}")
+        conn.execute("PRAGMA temp_store = MEMORY")
+
+        return conn
+
+
+def update_query(table: str, columns) -> str:
+    return f'UPDATE {table} SET {", ".join(f"{key} = ?" for key in columns)} WHERE id = ?'
+
+
 class DataBase():
-    def __init__(self, path:str = None):
+    # space between two playlist_song positions, so a song can be inserted/moved
+    # between two others without renumbering the playlist
+    POSITION_GAP = 1024
+
+    # number of rows kept by the get_song/get_playlist cache
+    song_cache_size = 2000
+    playlist_cache_size = 200
+
+    # queries that run on every play/open, shared with HOT_QUERIES (check_query_plans)
+    SQL_GET_SONG = "SELECT * FROM songs WHERE id=?"
+    SQL_GET_SONG_ID = "SELECT id FROM songs WHERE path=?"
+    SQL_GET_SONG_ID_BY_VID = "SELECT id FROM songs WHERE vid=?"
+    SQL_GET_LIKED_SONG_ID = "SELECT id FROM songs WHERE liked = 1 ORDER BY id ASC"
+    SQL_GET_SONG_PAGE = "SELECT * FROM songs WHERE id < ? ORDER BY id DESC LIMIT ?"
+    SQL_DELETE_SONG = "DELETE FROM songs WHERE id = ?"
+    SQL_GET_PLAYLIST = "SELECT * FROM playlist WHERE id=?"
+    SQL_GET_PLAYLIST_ID_BY_TITLE = "SELECT id FROM playlist WHERE title=?"
+    SQL_GET_PLAYLIST_SONG = "SELECT s_id FROM playlist_song WHERE p_id=? ORDER BY position ASC LIMIT ?"
+    SQL_GET_PLAYLIST_SONG_DETAILED = """
+        SELECT s.*
+        FROM songs s
+        JOIN playlist_song ps ON ps.s_id = s.id
+        WHERE ps.p_id = ?
+        ORDER BY ps.position
+        LIMIT ?
+    """
+    SQL_GET_PLAYLIST_SONG_FIRST_PAGE = """
+        SELECT s.*, ps.position AS position
+        FROM playlist_song ps
+        JOIN songs s ON s.id = ps.s_id
+        WHERE ps.p_id = ?
+        ORDER BY ps.position
+        LIMIT ?
+    """
+    SQL_GET_PLAYLIST_SONG_PAGE = """
+        SELECT s.*, ps.position AS position
+        FROM playlist_song ps
+        JOIN songs s ON s.id = ps.s_id
+        WHERE ps.p_id = ? AND ps.position > ?
+        ORDER BY ps.position
+        LIMIT ?
+    """
+    SQL_NEXT_PLAYLIST_SONG_POSITION = "SELECT COALESCE(MAX(position), 0) + ? FROM playlist_song WHERE p_id = ?"
+    SQL_POSITION_BEFORE = "SELECT MAX(position) FROM playlist_song WHERE p_id = ? AND position < ? AND s_id != ?"
+    SQL_REMOVE_PLAYLIST_SONG = "DELETE FROM playlist_song WHERE p_id = ? AND s_id = ?"
+
+    def __init__(self, path:str = None, read_only: bool = False):
         if path is None:
             path = DATABASE_PATH
 
-        self.conn = sqlite3.connect(path)
-        
-        # row_factory to get dict-like rows
-        self.conn.row_factory = sqlite3.Row
+        self.read_only = read_only
+        self.manager = ConnectionManager.get(path)
+
+        if read_only:
+            # for background threads (loaders, downloads, scans)
+            self.conn = self.manager.reader()
+        else:
+            self.conn = self.manager.writer()
+
         self.cursor = self.conn.cursor()
 
-        if self.is_not_init():
-            print(f"Initializing DataBase")
-            self._db_init()
-            self._init_basic_data()
-            self._init_playlist()
+        # only the writer sees every write, a read-only cache would go stale
+        self.song_cache = RowCache(0 if read_only else self.song_cache_size)
+        self.playlist_cache = RowCache(0 if read_only else self.playlist_cache_size)
+
+        if not read_only:
+            self._migrate()
 
     def commit(self):
         self.conn.commit()
 
-    def add_basic(self, key: str, value: str| int):
-        self.cursor.execute('UPDATE basic SET value = ? WHERE key = ?', (str(value), key))
-        self.conn.commit()
+    def rollback(self):
+        self.conn.rollback()
+        # cache may have rows of the rolled back writes
+        self.song_cache.clear()
+        self.playlist_cache.clear()
+
+    def cache_stats(self) -> dict:
+        return {"songs": self.song_cache.stats(), "playlist": self.playlist_cache.stats()}
+
+    def close(self):
+        if self.read_only:
+            self.manager.close_reader()
+        else:
+            self.manager.close_writer()
+
+    def add_basic(self, key: str, value: str| int, commit = True):
+        self.cursor.execute(
+            "INSERT INTO basic (key, value) VALUES (?, ?) ON CONFLICT(key) DO UPDATE SET value = excluded.value",
+            (key, str(value))
+        )
+
+        if commit:
+            self.commit()
 
     def get_basic(self, key: str | None = None):
         if key is not None:
@@ -42,6 +305,345 @@ class DataBase():
         self.cursor.execute("SELECT name FROM sqlite_master WHERE type='table'")
         return self.cursor.fetchall() == []
 
+    # PRAGMA user_version of the db file = number of migrations applied.
+    # Only add new migrations at the end, never edit an old one.
+    def _migrations(self) -> list:
+        return [
+            self._migration_1_init,
+            self._migration_2_hot_indexes,
+            self._migration_3_songs_fts,
+            self._migration_4_counters,
+            self._migration_5_play_history,
+            self._migration_6_position_gaps,
+            self._migration_7_scan_index,
+            self._migration_8_library_roots,
+            self._migration_9_stream_info,
+            self._migration_10_content_hashes,
+            self._migration_11_cover_palette,
+        ]
+
+    def _migrate(self):
+        self.cursor.execute("PRAGMA user_version")
+        version = self.cursor.fetchone()[0]
+
+        migrations = self._migrations()
+        for new_version, migration in enumerate(migrations[version:], start=version + 1):
+            print(f"Migrating DataBase : v{new_version - 1} -> v{new_version}")
+
+            # every migration runs in it's own transaction
+            self.cursor.execute("BEGIN")
+            try:
+                migration()
+                self.cursor.execute(f"PRAGMA user_version = {new_version}")
+                self.commit()
+
+            except Exception:
+                self.rollback()
+                raise
+
+    def _migration_1_init(self):
+        # also runs on db files created before migrations (user_version = 0)
+        if self.is_not_init():
+            print(f"Initializing DataBase")
+
+        self._db_init()
+        self._init_basic_data()
+        self._init_playlist()
+
+    def _migration_2_hot_indexes(self):
+        # get_playlist_song, _get_next_playlist_song_position -> covering, no sort
+        self.cursor.execute("""
+            CREATE INDEX IF NOT EXISTS idx_playlist_song_position
+            ON playlist_song (p_id, position, s_id)
+        """)
+
+        # get_liked_song_id -> only liked songs are in the index
+        self.cursor.execute("""
+            CREATE INDEX IF NOT EXISTS idx_songs_liked
+            ON songs (id) WHERE liked = 1
+        """)
+
+    def _migration_3_songs_fts(self):
+        # full text index over the songs table (external content, no copy of the text)
+        # prefix -> "ab*" style queries are served directly from the index
+        self.cursor.execute("""
+            CREATE VIRTUAL TABLE IF NOT EXISTS songs_fts USING fts5(
+                title, subtitle, artist,
+                content = 'songs',
+                content_rowid = 'id',
+                tokenize = 'unicode61 remove_diacritics 2',
+                prefix = '1 2 3'
+            )
+        """)
+
+        # keep songs_fts in sync with songs
+        self.cursor.execute("""
+            CREATE TRIGGER IF NOT EXISTS songs_fts_insert AFTER INSERT ON songs BEGIN
+                INSERT INTO songs_fts (rowid, title, subtitle, artist)
+                VALUES (new.id, new.title, new.subtitle, new.artist);
+            END
+        """)
+
+        self.cursor.execute("""
+            CREATE TRIGGER IF NOT EXISTS songs_fts_delete AFTER DELETE ON songs BEGIN
+                INSERT INTO songs_fts (songs_fts, rowid, title, subtitle, artist)
+                VALUES ('delete', old.id, old.title, old.subtitle, old.artist);
+            END
+        """)
+
+        self.cursor.execute("""
+            CREATE TRIGGER IF NOT EXISTS songs_fts_update AFTER UPDATE OF title, subtitle, artist ON songs BEGIN
+                INSERT INTO songs_fts (songs_fts, rowid, title, subtitle, artist)
+                VALUES ('delete', old.id, old.title, old.subtitle, old.artist);
+                INSERT INTO songs_fts (rowid, title, subtitle, artist)
+                VALUES (new.id, new.title, new.subtitle, new.artist);
+            END
+        """)
+
+        # index the songs already in the db
+        self.cursor.execute("INSERT INTO songs_fts (songs_fts) VALUES ('rebuild')")
+
+    def _migration_4_counters(self):
+        # playlist rows of a song (used by the triggers below)
+        self.cursor.execute("""
+            CREATE INDEX IF NOT EXISTS idx_playlist_song_song
+            ON playlist_song (s_id)
+        """)
+
+        # playlist count/duration follow playlist_song
+        self.cursor.execute("""
+            CREATE TRIGGER IF NOT EXISTS playlist_song_added AFTER INSERT ON playlist_song BEGIN
+                UPDATE playlist
+                SET 
+                    count = count + 1,
+                    duration = duration + COALESCE((SELECT duration FROM songs WHERE id = new.s_id), 0)
+                WHERE id = new.p_id;
+            END
+        """)
+
+        self.cursor.execute("""
+            CREATE TRIGGER IF NOT EXISTS playlist_song_removed AFTER DELETE ON playlist_song BEGIN
+                UPDATE playlist
+                SET 
+                    count = count - 1,
+                    duration = duration - COALESCE((SELECT duration FROM songs WHERE id = old.s_id), 0)
+                WHERE id = old.p_id;
+            END
+        """)
+
+        # BEFORE -> song row still exists, so playlist_song_removed gets it's duration
+        self.cursor.execute("""
+            CREATE TRIGGER IF NOT EXISTS song_deleted BEFORE DELETE ON songs BEGIN
+                DELETE FROM playlist_song WHERE s_id = old.id;
+            END
+        """)
+
+        self.cursor.execute("""
+            CREATE TRIGGER IF NOT EXISTS song_duration_changed AFTER UPDATE OF duration ON songs
+            WHEN new.duration IS NOT old.duration BEGIN
+                UPDATE playlist
+                SET duration = duration - COALESCE(old.duration, 0) + COALESCE(new.duration, 0)
+                WHERE id IN (SELECT p_id FROM playlist_song WHERE s_id = new.id);
+            END
+        """)
+
+        # fix the values written before the triggers
+        self.rebuild_playlist_aggregates(commit=False)
+
+    def _migration_5_play_history(self):
+        # append-only, one row per listen (finished or skipped)
+        self.cursor.execute("""
+            CREATE TABLE IF NOT EXISTS play_events (
+                id INTEGER PRIMARY KEY,
+                s_id INTEGER NOT NULL,
+                started_at INTEGER NOT NULL,
+                listened_ms INTEGER NOT NULL,
+                skipped INTEGER NOT NULL DEFAULT 0
+            )
+        """)
+
+        # rollups, day/week are local-time numbers (days since epoch, weeks start on monday)
+        for table, bucket in (("play_daily", "day"), ("play_weekly", "week")):
+            self.cursor.execute(f"""
+                CREATE TABLE IF NOT EXISTS {table} (
+                    {bucket} INTEGER NOT NULL,
+                    s_id INTEGER NOT NULL,
+                    plays INTEGER NOT NULL DEFAULT 0,
+                    skips INTEGER NOT NULL DEFAULT 0,
+                    listened_ms INTEGER NOT NULL DEFAULT 0,
+                    PRIMARY KEY ({bucket}, s_id)
+                ) WITHOUT ROWID
+            """)
+
+        day = "(CAST(strftime('%s', new.started_at, 'unixepoch', 'localtime') AS INTEGER) / 86400)"
+        # 1970-01-01 was a thursday
+        week = f"(({day} + 3) / 7)"
+
+        # keep rollups incremental, no query has to scan play_events
+        self.cursor.execute(f"""
+            CREATE TRIGGER IF NOT EXISTS play_event_added AFTER INSERT ON play_events BEGIN
+                INSERT INTO play_daily (day, s_id, plays, skips, listened_ms)
+                VALUES ({day}, new.s_id, new.skipped = 0, new.skipped != 0, new.listened_ms)
+                ON CONFLICT (day, s_id) DO UPDATE SET
+                    plays = plays + excluded.plays,
+                    skips = skips + excluded.skips,
+                    listened_ms = listened_ms + excluded.listened_ms;
+
+                INSERT INTO play_weekly (week, s_id, plays, skips, listened_ms)
+                VALUES ({week}, new.s_id, new.skipped = 0, new.skipped != 0, new.listened_ms)
+                ON CONFLICT (week, s_id) DO UPDATE SET
+                    plays = plays + excluded.plays,
+                    skips = skips + excluded.skips,
+                    listened_ms = listened_ms + excluded.listened_ms;
+            END
+        """)
+
+    def _migration_6_position_gaps(self):
+        # dense 0, 1, 2.. -> GAP, 2*GAP, 3*GAP..
+        self.cursor.execute("""
+            WITH ranked AS (
+                SELECT rowid, ROW_NUMBER() OVER (PARTITION BY p_id ORDER BY position, rowid) AS n
+                FROM playlist_song
+            )
+            UPDATE playlist_song
+            SET position = ranked.n * ?
+            FROM ranked
+            WHERE ranked.rowid = playlist_song.rowid
+        """, (self.POSITION_GAP,))
+
+    def _migration_7_scan_index(self):
+        # fingerprint of every music file seen by the scanner
+        # s_id is NULL for files that are not valid songs (so they are not parsed again)
+        self.cursor.execute("""
+            CREATE TABLE IF NOT EXISTS scan_index (
+                path TEXT PRIMARY KEY,
+                size INTEGER NOT NULL,
+                mtime_ns INTEGER NOT NULL,
+                inode INTEGER NOT NULL,
+                s_id INTEGER
+            ) WITHOUT ROWID
+        """)
+
+    def _migration_8_library_roots(self):
+        # folders scanned (recursively) for music
+        # excludes -> glob patterns separated by ";", matched with the name or the path inside the root
+        self.cursor.execute("""
+            CREATE TABLE IF NOT EXISTS library_roots (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                path TEXT UNIQUE NOT NULL,
+                excludes TEXT NOT NULL DEFAULT ''
+            )
+        """)
+
+        self.cursor.execute(
+            "INSERT INTO library_roots (path) VALUES (?) ON CONFLICT(path) DO NOTHING", (MUSIC_DIR_PATH,)
+        )
+
+    def _migration_9_stream_info(self):
+        # stream info of the file, so playing a song doesn't parse it again
+        # NULL -> not known yet (filled by the player on first play)
+        for column in ("sample_rate", "channels", "bitrate"):
+            self.cursor.execute(f"ALTER TABLE songs ADD COLUMN {column} INTEGER")
+
+    def _migration_10_content_hashes(self):
+        # hash of the audio data (tags excluded), same recording -> same hash
+        self.cursor.execute("ALTER TABLE songs ADD COLUMN audio_hash TEXT")
+        self.cursor.execute("CREATE INDEX IF NOT EXISTS idx_songs_audio_hash ON songs (audio_hash)")
+
+        # covers are named by the hash of the image (util.save_cover), one file shared by many songs
+        # refs -> songs using the file, the file can be removed at 0
+        self.cursor.execute("""
+            CREATE TABLE IF NOT EXISTS covers (
+                name TEXT PRIMARY KEY,
+                refs INTEGER NOT NULL
+            ) WITHOUT ROWID
+        """)
+
+        self.cursor.execute("""
+            CREATE TRIGGER IF NOT EXISTS cover_ref_added AFTER INSERT ON songs
+            WHEN COALESCE(new.cover_path, '') != '' BEGIN
+                INSERT INTO covers (name, refs) VALUES (new.cover_path, 1)
+                ON CONFLICT(name) DO UPDATE SET refs = refs + 1;
+            END
+        """)
+
+        self.cursor.execute("""
+            CREATE TRIGGER IF NOT EXISTS cover_ref_removed AFTER DELETE ON songs
+            WHEN COALESCE(old.cover_path, '') != '' BEGIN
+                UPDATE covers SET refs = refs - 1 WHERE name = old.cover_path;
+                DELETE FROM covers WHERE name = old.cover_path AND refs <= 0;
+            END
+        """)
+
+        self.cursor.execute("""
+            CREATE TRIGGER IF NOT EXISTS cover_ref_changed AFTER UPDATE OF cover_path ON songs
+            WHEN new.cover_path IS NOT old.cover_path BEGIN
+                UPDATE covers SET refs = refs - 1 WHERE name = old.cover_path;
+                DELETE FROM covers WHERE name = old.cover_path AND refs <= 0;
+                INSERT INTO covers (name, refs)
+                SELECT new.cover_path, 1 WHERE COALESCE(new.cover_path, '') != ''
+                ON CONFLICT(name) DO UPDATE SET refs = refs + 1;
+            END
+        """)
+
+        # downloaded songs had the full path of the cover, the rest only the filename
+        self.cursor.execute("SELECT id, cover_path FROM songs WHERE cover_path LIKE '%/%' OR cover_path LIKE '%\\%'")
+        for row in self.cursor.fetchall():
+            self.cursor.execute(
+                "UPDATE songs SET cover_path = ? WHERE id = ?", (os.path.basename(row["cover_path"]), row["id"])
+            )
+
+        self.cursor.execute("""
+            INSERT INTO covers (name, refs)
+            SELECT cover_path, COUNT(*) FROM songs
+            WHERE COALESCE(cover_path, '') != ''
+            GROUP BY cover_path
+            ON CONFLICT(name) DO UPDATE SET refs = excluded.refs
+        """)
+
+    def _migration_11_cover_palette(self):
+        # colours of the cover (0xRRGGBB), computed once by palette.py, NULL -> not yet
+        self.cursor.execute("ALTER TABLE covers ADD COLUMN dominant INTEGER")
+        self.cursor.execute("ALTER TABLE covers ADD COLUMN accent INTEGER")
+
+    # (name, query, params) of the queries that run on every play/open, checked by
+    # check_query_plans() (tests/test_query_plans.py, `python databse.py`)
+    HOT_QUERIES = [
+        ("get_song", SQL_GET_SONG, (1,)),
+        ("get_song_id", SQL_GET_SONG_ID, ("",)),
+        ("get_songid_by_vid", SQL_GET_SONG_ID_BY_VID, ("",)),
+        ("get_liked_song_id", SQL_GET_LIKED_SONG_ID, ()),
+        ("get_playlist", SQL_GET_PLAYLIST, (1,)),
+        ("get_playlist_id_by_title", SQL_GET_PLAYLIST_ID_BY_TITLE, ("",)),
+        ("get_playlist_song", SQL_GET_PLAYLIST_SONG, (1, -1)),
+        ("get_playlist_song[detailed]", SQL_GET_PLAYLIST_SONG_DETAILED, (1, -1)),
+        ("get_playlist_song_page[first]", SQL_GET_PLAYLIST_SONG_FIRST_PAGE, (1, 100)),
+        ("get_playlist_song_page", SQL_GET_PLAYLIST_SONG_PAGE, (1, 0, 100)),
+        ("get_song_page", SQL_GET_SONG_PAGE, (100, 100)),
+        ("_get_next_playlist_song_position", SQL_NEXT_PLAYLIST_SONG_POSITION, (1024, 1)),
+        ("_positions_before", SQL_POSITION_BEFORE, (1, 1024, 1)),
+        ("remove_playlist_song", SQL_REMOVE_PLAYLIST_SONG, (1, 1)),
+        ("_update_column", update_query("songs", ["plays"]), (0, 1)),
+        ("delete_song", SQL_DELETE_SONG, (1,)),
+    ]
+
+    def check_query_plans(self) -> List[tuple]:
+        """ Returns (name, plan) for every hot query that does a full table scan or a temp sort """
+        bad_plans = []
+
+        for name, query, params in self.HOT_QUERIES:
+            self.cursor.execute(f"EXPLAIN QUERY PLAN {query}", params)
+
+            for row in self.cursor.fetchall():
+                detail = row["detail"]
+                is_table_scan = detail.startswith("SCAN") and " INDEX " not in detail
+                is_temp_sort = detail.startswith("USE TEMP B-TREE")
+
+                if is_table_scan or is_temp_sort:
+                    bad_plans.append((name, detail))
+
+        return bad_plans
+
 
     def _init_basic_data(self):
         data = {
@@ -55,9 +657,7 @@ class DataBase():
         for key, value in data.items():
             self.cursor.execute(
                 """INSERT INTO basic (key, value) VALUES (?, ?) 
-                ON CONFLICT(key) DO UPDATE SET value = excluded.value;""", (key, value))
-            
-        self.conn.commit()
+                ON CONFLICT(key) DO NOTHING;""", (key, value))
 
     def _init_playlist(self):
         # add like playlist on start...
@@ -69,6 +669,7 @@ class DataBase():
             duration=0,
             plays=0,
             cover_path="like_song_cover.png",
+            commit=False,
         )
 
     def add_playlist(
@@ -95,7 +696,7 @@ class DataBase():
 
     
     def get_playlist_id_by_title(self, title: str):
-        self.cursor.execute("SELECT id FROM playlist WHERE title=?", (title,))
+        self.cursor.execute(self.SQL_GET_PLAYLIST_ID_BY_TITLE, (title,))
         row = self.cursor.fetchone()
         if row is None:
             return
@@ -105,38 +706,32 @@ class DataBase():
     
     def get_playlist(self, playlist_id: int = None):
         if playlist_id is not None:
-              self.cursor.execute("SELECT * FROM playlist WHERE id=?", (playlist_id,))
-              return self.cursor.fetchone()
+              record = self.playlist_cache.get(playlist_id)
+              if record is not None:
+                  return record
+
+              self.cursor.execute(self.SQL_GET_PLAYLIST, (playlist_id,))
+              return self.playlist_cache.put(playlist_id, self.cursor.fetchone())
         
         self.cursor.execute("SELECT * FROM playlist")
         return self.cursor.fetchall()
     
-    def update_playlist(self, playlist_id: int, **update):
-        self._update_column("playlist", playlist_id, **update)
+    def update_playlist(self, playlist_id: int, commit = True, **update):
+        self._update_column("playlist", playlist_id, commit=commit, **update)
 
     def remove_playlist_song(self, playlist_id: int, song_id: int, commit = True):
-        self.cursor.execute("DELETE FROM playlist_song WHERE p_id = ? AND s_id = ?", (playlist_id, song_id))
+        self.cursor.execute(self.SQL_REMOVE_PLAYLIST_SONG, (playlist_id, song_id))
+        self.playlist_cache.invalidate(playlist_id)
 
         if self.cursor.rowcount == 0:
             print(f"[From DB] No song in playlist : {playlist_id} with this id : {song_id}")
             return False
         
-        # update playlist accordingly
-        self.cursor.execute(
-                """
-                UPDATE playlist
-                SET 
-                    duration = duration - (
-                        SELECT duration FROM songs WHERE id = ?
-                    ),
-                    count = count - 1
-                WHERE id = ?
-                """,
-                (song_id, playlist_id)
-        )
-        
+        # playlist count/duration is updated by trigger
         print(f"[From DB] Song deleted from playlist : {playlist_id} with id : {song_id}")
-        self.conn.commit()
+        if commit:
+            self.commit()
+
         return True
 
 
@@ -148,25 +743,13 @@ class DataBase():
             self.cursor.execute(
                     "INSERT INTO playlist_song (p_id, s_id, position) VALUES (?, ?, ?)", (playlist_id, song_id, position)
                     )
+            self.playlist_cache.invalidate(playlist_id)
             
 
             # Check if a row was actually inserted
+            # playlist count/duration is updated by trigger
             if self.cursor.rowcount != 1:
-                # Only update duration if song was newly added
                 return False
-                
-            self.cursor.execute(
-                """
-                UPDATE playlist
-                SET 
-                    duration = duration + (
-                        SELECT duration FROM songs WHERE id = ?
-                    ),
-                    count = count + 1
-                WHERE id = ?
-                """,
-                (song_id, playlist_id)
-            )
         
         except sqlite3.IntegrityError:
             # handle duplicate
@@ -178,31 +761,207 @@ class DataBase():
 
         return True
     
-    def _get_next_playlist_song_position(self, playlist_id: int) -> int:
+    def rebuild_playlist_aggregates(self, commit = True) -> List[int]:
+        """
+        Consistency check for playlist count/duration.
+        Recomputes all playlists in one pass and returns the ids that were wrong.
+        """
+        # rows of songs deleted before the song_deleted trigger
+        self.cursor.execute("DELETE FROM playlist_song WHERE s_id NOT IN (SELECT id FROM songs)")
+        if self.cursor.rowcount > 0:
+            print(f"[From DB] Removed {self.cursor.rowcount} dangling playlist songs")
+
         self.cursor.execute("""
-            SELECT COALESCE(MAX(position), -1) + 1
-            FROM playlist_song
-            WHERE p_id = ?
-        """, (playlist_id,))
+            WITH agg AS (
+                SELECT p.id, COUNT(ps.s_id) AS count, COALESCE(SUM(s.duration), 0) AS duration
+                FROM playlist p
+                LEFT JOIN playlist_song ps ON ps.p_id = p.id
+                LEFT JOIN songs s ON s.id = ps.s_id
+                GROUP BY p.id
+            )
+            UPDATE playlist
+            SET count = agg.count, duration = agg.duration
+            FROM agg
+            WHERE agg.id = playlist.id
+              AND (playlist.count IS NOT agg.count OR playlist.duration IS NOT agg.duration)
+            RETURNING playlist.id
+        """)
+        fixed = [row["id"] for row in self.cursor.fetchall()]
+        self.playlist_cache.clear()
+
+        if fixed:
+            print(f"[From DB] Fixed count/duration of playlists : {fixed}")
+
+        if commit:
+            self.commit()
+
+        return fixed
+
+    def _get_next_playlist_song_position(self, playlist_id: int) -> int:
+        self.cursor.execute(self.SQL_NEXT_PLAYLIST_SONG_POSITION, (self.POSITION_GAP, playlist_id))
         return self.cursor.fetchone()[0]
 
+    def _get_playlist_song_position(self, playlist_id: int, song_id: int) -> int | None:
+        self.cursor.execute("SELECT position FROM playlist_song WHERE p_id = ? AND s_id = ?", (playlist_id, song_id))
+        row = self.cursor.fetchone()
+        if row is None:
+            return
+        
+        return row["position"]
+
+    def _positions_before(self, playlist_id: int, before_id: int | None, count: int, exclude_id: int = -1) -> List[int] | None:
+        """
+        `count` free positions just before the song `before_id` (None -> at the end).
+        Returns None if `before_id` is not in the playlist.
+        """
+        if before_id is None:
+            start = self._get_next_playlist_song_position(playlist_id) - self.POSITION_GAP
+            return [start + self.POSITION_GAP * (i + 1) for i in range(count)]
+
+        for rebalanced in (False, True):
+            hi = self._get_playlist_song_position(playlist_id, before_id)
+            if hi is None:
+                return
+
+            self.cursor.execute(self.SQL_POSITION_BEFORE, (playlist_id, hi, exclude_id))
+            lo = self.cursor.fetchone()[0]
+
+            if lo is None:
+                # at the front, room is unlimited
+                lo = hi - self.POSITION_GAP * (count + 1)
+
+            step = (hi - lo) // (count + 1)
+            if step >= 1 or rebalanced:
+                break
+
+            # no room left between the neighbours -> full gaps, and `count` more of them
+            # before `before_id` (a single gap is too small for a block of POSITION_GAP songs)
+            self.rebalance_playlist(playlist_id, room_before=(before_id, count), commit=False)
+
+        return [lo + step * (i + 1) for i in range(count)]
+
+    def rebalance_playlist(self, playlist_id: int, room_before: tuple = None, commit = True):
+        """
+        Rewrites the positions of a playlist with full gaps. Only needed once a gap is used up.
+        room_before -> (song_id, slots), the gap before `song_id` gets `slots` more gaps
+        """
+        room_id, slots = room_before or (-1, 0)
+        self.cursor.execute("""
+            WITH ranked AS (
+                SELECT s_id, ROW_NUMBER() OVER (ORDER BY position, rowid) AS n
+                FROM playlist_song
+                WHERE p_id = ?
+            )
+            UPDATE playlist_song
+            SET position = ranked.n * ? + CASE
+                WHEN ranked.n >= (SELECT n FROM ranked WHERE s_id = ?) THEN ? ELSE 0
+            END
+            FROM ranked
+            WHERE playlist_song.p_id = ? AND playlist_song.s_id = ranked.s_id
+        """, (playlist_id, self.POSITION_GAP, room_id, slots * self.POSITION_GAP, playlist_id))
+        print(f"[From DB] Rebalanced playlist : {playlist_id}")
+
+        if commit:
+            self.commit()
+
+    def move_playlist_song(self, playlist_id: int, song_id: int, before_id: int = None, commit = True) -> bool:
+        """ Moves `song_id` just before `before_id` (None -> to the end). Only the moved row is written. """
+        if song_id == before_id:
+            return True
+
+        if self._get_playlist_song_position(playlist_id, song_id) is None:
+            print(f"[From DB] No song in playlist : {playlist_id} with this id : {song_id}")
+            return False
+
+        positions = self._positions_before(playlist_id, before_id, 1, exclude_id=song_id)
+        if positions is None:
+            print(f"[From DB] No song in playlist : {playlist_id} with this id : {before_id}")
+            return False
+
+        self.cursor.execute(
+            "UPDATE playlist_song SET position = ? WHERE p_id = ? AND s_id = ?",
+            (positions[0], playlist_id, song_id)
+        )
+
+        if commit:
+            self.commit()
+
+        return True
+
+    def add_playlist_songs_at(self, playlist_id: int, song_ids: List[int], before_id: int = None, commit = True) -> int:
+        """
+        Inserts `song_ids` (in order) just before `before_id` (None -> at the end).
+        Songs already in the playlist are skipped. Returns number of songs added.
+        """
+        song_ids = list(song_ids)
+        existing = set()
+        for start in range(0, len(song_ids), 500):
+            part = song_ids[start : start + 500]
+            self.cursor.execute(
+                f"SELECT s_id FROM playlist_song WHERE p_id = ? AND s_id IN ({', '.join('?' * len(part))})",
+                (playlist_id, *part)
+            )
+            existing.update(row["s_id"] for row in self.cursor.fetchall())
+
+        new_ids = []
+        for song_id in song_ids:
+            if song_id not in existing:
+                existing.add(song_id)
+                new_ids.append(song_id)
+
+        if not new_ids:
+            return 0
+
+        positions = self._positions_before(playlist_id, before_id, len(new_ids))
+        if positions is None:
+            print(f"[From DB] No song in playlist : {playlist_id} with this id : {before_id}")
+            return 0
+
+        # playlist count/duration is updated by trigger
+        self.cursor.executemany(
+            "INSERT INTO playlist_song (p_id, s_id, position) VALUES (?, ?, ?)",
+            [(playlist_id, song_id, position) for song_id, position in zip(new_ids, positions)]
+        )
+        self.playlist_cache.invalidate(playlist_id)
+
+        if commit:
+            self.commit()
+
+        return len(new_ids)
+
     
 
-    def get_playlist_song(self, playlist_id: int, detailed = False):
+    def get_playlist_song(self, playlist_id: int, detailed = False, limit: int = -1):
         if not detailed:
-              self.cursor.execute("SELECT s_id FROM playlist_song WHERE p_id=? ORDER BY position ASC", (playlist_id,))
+              self.cursor.execute(self.SQL_GET_PLAYLIST_SONG, (playlist_id, limit))
               return [song['s_id'] for song in self.cursor.fetchall()]
         
-        self.cursor.execute("""
-            SELECT s.*
-            FROM songs s
-            JOIN playlist_song ps ON ps.s_id = s.id
-            WHERE ps.p_id = ?
-            ORDER BY ps.position;
-            """, (playlist_id,))
+        self.cursor.execute(self.SQL_GET_PLAYLIST_SONG_DETAILED, (playlist_id, limit))
         return self.cursor.fetchall()
     
 
+    def get_playlist_song_page(self, playlist_id: int, after_position: int = None, limit: int = 100) -> list:
+        """
+        Next `limit` songs of the playlist after `after_position` (None -> from the start).
+        Rows have an extra `position` column, pass the last one to get the next page.
+        """
+        if after_position is None:
+            self.cursor.execute(self.SQL_GET_PLAYLIST_SONG_FIRST_PAGE, (playlist_id, limit))
+        else:
+            self.cursor.execute(self.SQL_GET_PLAYLIST_SONG_PAGE, (playlist_id, after_position, limit))
+        return self.cursor.fetchall()
+
+    def iter_playlist_songs(self, playlist_id: int, page_size: int = 500):
+        # only one page in memory at a time
+        after_position = None
+        while True:
+            page = self.get_playlist_song_page(playlist_id, after_position, page_size)
+            yield from page
+
+            if len(page) < page_size:
+                return
+            after_position = page[-1]["position"]
+
     def _db_init(self):
         self.cursor.execute("""
             CREATE TABLE IF NOT EXISTS basic (
@@ -252,8 +1011,6 @@ class DataBase():
         )
         """)
 
-        self.conn.commit()
-
     def add_song(self, title, subtitle, artist, vid, duration, plays, liked, skip, path, cover_path, commit = True):
         try:
             self.cursor.execute(
@@ -267,27 +1024,190 @@ class DataBase():
             print(f"Song with path : {path} already exists.")
             return False
 
+        self.song_cache.invalidate(self.cursor.lastrowid)
+
         if commit:
             self.commit()
 
         return True
-    
-    def increament_play_count(self, song_id: int):
-        song_info = self.get_song(song_id=song_id)
-        if not song_info:
+
+    def add_songs_bulk(self, songs, chunk_size: int = 1000, commit = True) -> List[int]:
+        """
+        Add (or update) many songs in one transaction.
+
+        songs: iterable of dicts with the same keys as add_song,
+               plays, liked and skip are optional (default 0),
+               sample_rate, channels, bitrate and audio_hash are optional (default NULL).
+               It's consumed lazily, so a generator can stream the rows.
+
+        A song with an existing path or vid updates that row instead
+        (plays, liked, skip are kept). Returns the song ids in input order.
+        """
+        song_ids = []
+        chunk = []
+
+        for song in songs:
+            chunk.append({
+                "title": song["title"],
+                "subtitle": song["subtitle"],
+                "artist": song["artist"],
+                "vid": song["vid"],
+                "duration": song["duration"],
+                "plays": song.get("plays", 0),
+                "liked": song.get("liked", 0),
+                "skip": song.get("skip", 0),
+                "path": song["path"],
+                "cover_path": song["cover_path"],
+                "sample_rate": song.get("sample_rate"),
+                "channels": song.get("channels"),
+                "bitrate": song.get("bitrate"),
+                "audio_hash": song.get("audio_hash"),
+            })
+
+            if len(chunk) >= chunk_size:
+                song_ids.extend(self._add_songs_chunk(chunk))
+                chunk = []
+
+        if chunk:
+            song_ids.extend(self._add_songs_chunk(chunk))
+
+        for song_id in song_ids:
+            self.song_cache.invalidate(song_id)
+        self.playlist_cache.clear()
+
+        if commit:
+            self.commit()
+
+        print(f"[From DB] Bulk added/updated songs : {len(song_ids)}")
+        return song_ids
+
+    def _add_songs_chunk(self, chunk: List[dict]) -> List[int]:
+        self.cursor.executemany(
+            """INSERT INTO songs (
+                title, subtitle, artist, vid, duration, plays, liked, skip, path, cover_path,
+                sample_rate, channels, bitrate, audio_hash
+            )
+            VALUES (
+                :title, :subtitle, :artist, :vid, :duration, :plays, :liked, :skip, :path, :cover_path,
+                :sample_rate, :channels, :bitrate, :audio_hash
+            )
+            ON CONFLICT(path) DO UPDATE SET
+                title = excluded.title,
+                subtitle = excluded.subtitle,
+                artist = excluded.artist,
+                duration = excluded.duration,
+                cover_path = COALESCE(NULLIF(excluded.cover_path, ''), songs.cover_path),
+                sample_rate = COALESCE(excluded.sample_rate, songs.sample_rate),
+                channels = COALESCE(excluded.channels, songs.channels),
+                bitrate = COALESCE(excluded.bitrate, songs.bitrate),
+                audio_hash = COALESCE(excluded.audio_hash, songs.audio_hash)
+            ON CONFLICT(vid) DO UPDATE SET
+                title = excluded.title,
+                subtitle = excluded.subtitle,
+                artist = excluded.artist,
+                duration = excluded.duration,
+                path = excluded.path,
+                cover_path = COALESCE(NULLIF(excluded.cover_path, ''), songs.cover_path),
+                sample_rate = COALESCE(excluded.sample_rate, songs.sample_rate),
+                channels = COALESCE(excluded.channels, songs.channels),
+                bitrate = COALESCE(excluded.bitrate, songs.bitrate),
+                audio_hash = COALESCE(excluded.audio_hash, songs.audio_hash)
+            """,
+            chunk
+        )
+
+        # both conflict cases end with the row on the new path
+        paths = [song["path"] for song in chunk]
+        id_by_path = {}
+
+        # keep under sqlite's max host parameters
+        for start in range(0, len(paths), 500):
+            part = paths[start : start + 500]
+            self.cursor.execute(
+                f"SELECT id, path FROM songs WHERE path IN ({', '.join('?' * len(part))})", part
+            )
+            id_by_path.update({row["path"]: row["id"] for row in self.cursor.fetchall()})
+
+        return [id_by_path.get(path) for path in paths]
+
+    def increament_play_count(self, song_id: int, commit = True):
+        # single statement -> no lost update if two writers race
+        self.cursor.execute("UPDATE songs SET plays = plays + 1 WHERE id = ? RETURNING plays", (song_id,))
+        row = self.cursor.fetchone()
+        self.song_cache.invalidate(song_id)
+        if row is None:
             print(f"Error[DB] Song not found in the DB")
             return
-        play_count = song_info["plays"] + 1
-        self.update_song(song_id=song_id, plays = play_count)
-        print(f"PlayCount updated : {play_count}")
+
+        if commit:
+            self.commit()
+
+        print(f"PlayCount updated : {row['plays']}")
+        return row["plays"]
+
+    def add_play_event(self, song_id: int, started_at: int, listened_ms: int, skipped: bool, commit = True):
+        self.cursor.execute(
+            "INSERT INTO play_events (s_id, started_at, listened_ms, skipped) VALUES (?, ?, ?, ?)",
+            (song_id, int(started_at), int(listened_ms), int(bool(skipped)))
+        )
+
+        if commit:
+            self.commit()
+
+        return self.cursor.lastrowid
+
+    def _today(self) -> int:
+        # same day number the play_event_added trigger uses
+        self.cursor.execute("SELECT CAST(strftime('%s', 'now', 'localtime') AS INTEGER) / 86400")
+        return self.cursor.fetchone()[0]
+
+    def get_top_songs(self, days: int = 30, limit: int = 10) -> list:
+        """ Most played songs of the last `days` days, from the daily rollup. """
+        self.cursor.execute("""
+            SELECT s.id, s.title, s.subtitle, s.artist, s.cover_path,
+                   d.plays, d.skips, d.listened_ms
+            FROM (
+                SELECT s_id, SUM(plays) AS plays, SUM(skips) AS skips, SUM(listened_ms) AS listened_ms
+                FROM play_daily
+                WHERE day > ?
+                GROUP BY s_id
+            ) d
+            JOIN songs s ON s.id = d.s_id
+            ORDER BY d.plays DESC, d.listened_ms DESC
+            LIMIT ?
+        """, (self._today() - days, limit))
+        return self.cursor.fetchall()
+
+    def get_top_artists(self, days: int = 30, limit: int = 10) -> list:
+        self.cursor.execute("""
+            SELECT s.artist, SUM(d.plays) AS plays, SUM(d.listened_ms) AS listened_ms
+            FROM play_daily d
+            JOIN songs s ON s.id = d.s_id
+            WHERE d.day > ?
+            GROUP BY s.artist
+            ORDER BY plays DESC, listened_ms DESC
+            LIMIT ?
+        """, (self._today() - days, limit))
+        return self.cursor.fetchall()
+
+    def get_weekly_history(self, weeks: int = 12) -> list:
+        """ Total plays/skips/listened time per week, newest first. """
+        self.cursor.execute("""
+            SELECT week, SUM(plays) AS plays, SUM(skips) AS skips, SUM(listened_ms) AS listened_ms
+            FROM play_weekly
+            WHERE week > (? + 3) / 7 - ?
+            GROUP BY week
+            ORDER BY week DESC
+        """, (self._today(), weeks))
+        return self.cursor.fetchall()
 
     
     def get_song_id(self, path: str = None, vid: str = None):
         if path is not None:
-            self.cursor.execute("SELECT id FROM songs WHERE path=?", (path,))
+            self.cursor.execute(self.SQL_GET_SONG_ID, (path,))
 
         elif vid is not None:
-            self.cursor.execute("SELECT id FROM songs WHERE vid=?", (vid,))
+            self.cursor.execute(self.SQL_GET_SONG_ID_BY_VID, (vid,))
 
         else:
             return 
@@ -298,57 +1218,363 @@ class DataBase():
                 
     def get_song(self, song_id: int = None):
         if song_id is not None:
-              self.cursor.execute("SELECT * FROM songs WHERE id=?", (song_id,))
-              row = self.cursor.fetchone()
-              return row
+              record = self.song_cache.get(song_id)
+              if record is not None:
+                  return record
+
+              self.cursor.execute(self.SQL_GET_SONG, (song_id,))
+              return self.song_cache.put(song_id, self.cursor.fetchone())
         
 
         self.cursor.execute("SELECT * FROM songs ORDER BY id DESC")
         return self.cursor.fetchall()
     
+    def get_song_page(self, after_id: int = None, limit: int = 100) -> list:
+        """ Next `limit` songs (newest first) after `after_id` (None -> from the newest). """
+        if after_id is None:
+            self.cursor.execute("SELECT * FROM songs ORDER BY id DESC LIMIT ?", (limit,))
+        else:
+            self.cursor.execute(self.SQL_GET_SONG_PAGE, (after_id, limit))
+        return self.cursor.fetchall()
+
+    def iter_songs(self, after_id: int = None, page_size: int = 500):
+        # only one page in memory at a time
+        while True:
+            page = self.get_song_page(after_id, page_size)
+            yield from page
+
+            if len(page) < page_size:
+                return
+            after_id = page[-1]["id"]
+
     def get_all_song_id(self):
         self.cursor.execute("SELECT id FROM songs ORDER BY id DESC")
         all_song_id = [song['id'] for song in self.cursor.fetchall()]
         return all_song_id
     
     def get_liked_song_id(self):
-        self.cursor.execute("SELECT id FROM songs WHERE liked = 1 ORDER BY id ASC")
+        self.cursor.execute(self.SQL_GET_LIKED_SONG_ID)
         all_song_id = [song['id'] for song in self.cursor.fetchall()]
         return all_song_id
     
+    def search_songs(self, query: str, limit: int = 8, candidates: int = 1000) -> list:
+        """
+        Ranked prefix search over title, subtitle and artist.
+        "kes ha" -> matches songs with words starting with "kes" and "ha".
+
+        Only the newest `candidates` matches are ranked, so a one letter
+        query on a huge library costs the same as a specific one.
+        """
+        # every word is used as a quoted prefix, so user input can't break the fts syntax
+        words = re.findall(r"\w+", query.lower())
+        if not words:
+            return []
+
+        match = " ".join(f'"{word}"*' for word in words)
+
+        self.cursor.execute("""
+            SELECT s.id, s.title, s.subtitle, s.artist, s.cover_path
+            FROM (
+                SELECT rowid, bm25(songs_fts, 10.0, 2.0, 5.0) AS score
+                FROM songs_fts
+                WHERE songs_fts MATCH ?
+                ORDER BY rowid DESC
+                LIMIT ?
+            ) f
+            JOIN songs s ON s.id = f.rowid
+            ORDER BY f.score
+            LIMIT ?
+        """, (match, candidates, limit))
+        return self.cursor.fetchall()
+
+    def get_library_roots(self) -> List[tuple]:
+        # -> [(path, [exclude globs])]
+        self.cursor.execute("SELECT path, excludes FROM library_roots ORDER BY id")
+        return [
+            (row["path"], [glob for glob in row["excludes"].split(";") if glob])
+            for row in self.cursor.fetchall()
+        ]
+
+    def add_library_root(self, path: str, excludes: List[str] = None, commit = True):
+        path = os.path.abspath(path)
+        excludes = ";".join(excludes or [])
+
+        self.cursor.execute("""
+            INSERT INTO library_roots (path, excludes) VALUES (?, ?)
+            ON CONFLICT(path) DO UPDATE SET excludes = excluded.excludes
+        """, (path, excludes))
+
+        if commit:
+            self.commit()
+
+    def remove_library_root(self, path: str, commit = True):
+        # songs already added from this root are kept
+        self.cursor.execute("DELETE FROM library_roots WHERE path = ?", (os.path.abspath(path),))
+
+        if commit:
+            self.commit()
+
+        return self.cursor.rowcount == 1
+
+    def get_scan_index(self) -> Dict[str, tuple]:
+        # path -> (size, mtime_ns, inode, s_id)
+        # plain tuples, sqlite3.Row is slow for 100k rows
+        cursor = self.conn.cursor()
+        cursor.row_factory = None
+        cursor.execute("SELECT path, size, mtime_ns, inode, s_id FROM scan_index")
+        return {row[0]: row[1:] for row in cursor}
+
+    def get_scan_entries(self, paths: List[str]) -> Dict[str, tuple]:
+        """ get_scan_index, but only for `paths` and the files under them (if they are folders) """
+        cursor = self.conn.cursor()
+        cursor.row_factory = None
+        entries = {}
+
+        for path in paths:
+            # range on the primary key -> every path that starts with "folder/"
+            cursor.execute("""
+                SELECT path, size, mtime_ns, inode, s_id FROM scan_index
+                WHERE path = ? OR (path > ? AND path < ?)
+            """, (path, path + os.sep, path + chr(ord(os.sep) + 1)))
+            entries.update({row[0]: row[1:] for row in cursor})
+
+        return entries
+
+    def apply_scan(self, result, commit = True) -> dict:
+        """
+        Writes a `scanner.ScanResult` in one transaction.
+        Returns {"added": [rows of new songs], "modified": [rows of updated songs],
+                 "deleted": [song ids], "moved": [(song id, new path)]}
+        """
+        changes = {"added": [], "modified": [], "deleted": [], "moved": []}
+
+        for old_path, new_path, size, mtime_ns, inode, s_id in result.moved:
+            # a row already at new_path (file moved over an other one) -> the moved song
+            # keeps its plays / likes / playlists, the other row is deleted
+            self.cursor.execute(
+                "SELECT id FROM songs WHERE path = ? AND EXISTS (SELECT 1 FROM songs WHERE path = ?)",
+                (new_path, old_path)
+            )
+            row = self.cursor.fetchone()
+            if row is not None:
+                self.delete_song(row["id"], commit=False)
+                changes["deleted"].append(row["id"])
+
+            self.cursor.execute("UPDATE songs SET path = ? WHERE path = ? RETURNING id", (new_path, old_path))
+            row = self.cursor.fetchone()
+            if row is not None:
+                s_id = row["id"]
+                self.song_cache.invalidate(s_id)
+                changes["moved"].append((s_id, new_path))
+
+            self.cursor.execute("DELETE FROM scan_index WHERE path = ?", (old_path,))
+            self.cursor.execute(
+                "INSERT OR REPLACE INTO scan_index (path, size, mtime_ns, inode, s_id) VALUES (?, ?, ?, ?, ?)",
+                (new_path, size, mtime_ns, inode, s_id)
+            )
+
+        # ids after this are new songs
+        self.cursor.execute("SELECT COALESCE(MAX(id), 0) FROM songs")
+        last_id = self.cursor.fetchone()[0]
+
+        song_ids = self.add_songs_bulk(result.songs, commit=False) if result.songs else []
+        id_by_path = {song["path"]: song_id for song, song_id in zip(result.songs, song_ids)}
+
+        self.cursor.executemany(
+            "INSERT OR REPLACE INTO scan_index (path, size, mtime_ns, inode, s_id) VALUES (?, ?, ?, ?, ?)",
+            [
+                (path, size, mtime_ns, inode, id_by_path.get(path))
+                for path, size, mtime_ns, inode in result.added + result.modified
+            ]
+        )
+
+        new_ids = [song_id for song_id in song_ids if song_id is not None and song_id > last_id]
+        for start in range(0, len(new_ids), 500):
+            part = new_ids[start : start + 500]
+            self.cursor.execute(
+                f"SELECT id, title, subtitle, path, cover_path FROM songs WHERE id IN ({', '.join('?' * len(part))}) ORDER BY id",
+                part
+            )
+            changes["added"].extend(self.cursor.fetchall())
+
+        # (a modified file without a row is a new song, it's in "added")
+        modified_ids = [id_by_path.get(path) for path, *_ in result.modified]
+        modified_ids = [song_id for song_id in modified_ids if song_id is not None and song_id <= last_id]
+        for start in range(0, len(modified_ids), 500):
+            part = modified_ids[start : start + 500]
+            self.cursor.execute(
+                f"SELECT id, title, subtitle, path, cover_path FROM songs WHERE id IN ({', '.join('?' * len(part))}) ORDER BY id",
+                part
+            )
+            changes["modified"].extend(self.cursor.fetchall())
+
+        for path, _ in result.deleted:
+            # s_id of the index can be stale (song re-added), so use the path
+            self.cursor.execute("SELECT id FROM songs WHERE path = ?", (path,))
+            row = self.cursor.fetchone()
+            if row is not None:
+                self.delete_song(row["id"], commit=False)
+                changes["deleted"].append(row["id"])
+
+        self.cursor.executemany("DELETE FROM scan_index WHERE path = ?", [(path,) for path, _ in result.deleted])
+
+        if commit:
+            self.commit()
+
+        print(f"[From DB] Scan applied : {result}")
+        return changes
+
     def get_songid_by_vid(self, vid: str):
-        self.cursor.execute("SELECT id FROM songs WHERE vid=?", (vid,))
+        self.cursor.execute(self.SQL_GET_SONG_ID_BY_VID, (vid,))
         data = self.cursor.fetchone()
         if data is None:
             return
         
         return data["id"]
     
-    def update_song(self, song_id, **update):
-        self._update_column("songs", song_id, **update)
+    def update_song(self, song_id, commit = True, **update):
+        self._update_column("songs", song_id, commit=commit, **update)
 
-    def delete_song(self, song_id: int):
-        self.cursor.execute("DELETE FROM songs WHERE id = ?", (song_id,))
-        self.conn.commit()
+    def delete_song(self, song_id: int, commit = True):
+        self.cursor.execute(self.SQL_DELETE_SONG, (song_id,))
+        self.song_cache.invalidate(song_id)
+        self.playlist_cache.clear()
+
+        if commit:
+            self.commit()
 
         if self.cursor.rowcount == 0:
             print(f"[From DB] No song found with this id : {song_id}")
         else:
             print(f"[From DB] Song deleted with id : {song_id}")
 
+    def get_cover_refs(self, cover_name: str) -> int:
+        # songs using this cover file (0 -> file can be removed)
+        self.cursor.execute("SELECT refs FROM covers WHERE name = ?", (os.path.basename(cover_name),))
+        data = self.cursor.fetchone()
+        return data["refs"] if data else 0
+
+    def get_cover_references(self) -> tuple:
+        # -> (cover files of songs, cover files of playlists)
+        self.cursor.execute("SELECT DISTINCT cover_path FROM songs WHERE COALESCE(cover_path, '') != ''")
+        song_covers = {row[0] for row in self.cursor.fetchall()}
 
-    def _update_column(self, table: str, column_id: int, **kwargs):
-        query = f'UPDATE {table} SET {", ".join(f"{key} = ?" for key in kwargs.keys())} WHERE id = ?'
+        self.cursor.execute("SELECT DISTINCT cover_path FROM playlist WHERE COALESCE(cover_path, '') != ''")
+        playlist_covers = {os.path.basename(row[0]) for row in self.cursor.fetchall()}
+
+        return song_covers, playlist_covers
+
+    def prune_stale_rows(self, missing_covers: List[str], stale_scan_paths: List[str], commit = True) -> dict:
+        """
+        missing_covers   -> cover files that are gone, the songs get cover_path "" (extracted again by the loader)
+        stale_scan_paths -> scan index rows to remove
+        """
+        self.cursor.executemany("UPDATE songs SET cover_path = '' WHERE cover_path = ?", [(name,) for name in missing_covers])
+        songs = self.cursor.rowcount
+
+        self.cursor.executemany("DELETE FROM scan_index WHERE path = ?", [(path,) for path in stale_scan_paths])
+        scan_rows = self.cursor.rowcount
+
+        if songs:
+            self.song_cache.clear()
+            self.playlist_cache.clear()
+
+        if commit:
+            self.commit()
+
+        print(f"[From DB] Pruned : {songs} cover refs, {scan_rows} scan rows")
+        return {"songs": songs, "scan_rows": scan_rows}
+
+    def get_covers_without_palette(self, limit: int = -1) -> List[str]:
+        self.cursor.execute("SELECT name FROM covers WHERE dominant IS NULL LIMIT ?", (limit,))
+        return [row["name"] for row in self.cursor.fetchall()]
+
+    def set_cover_palettes(self, palettes: List[tuple], commit = True):
+        # palettes -> [(cover name, dominant, accent)]
+        self.cursor.executemany(
+            "UPDATE covers SET dominant = ?, accent = ? WHERE name = ?",
+            [(dominant, accent, name) for name, dominant, accent in palettes]
+        )
+
+        if commit:
+            self.commit()
+
+    def get_cover_palettes(self) -> dict:
+        # cover name -> (dominant, accent)
+        # -1 -> cover couldn't be read
+        self.cursor.execute("SELECT name, dominant, accent FROM covers WHERE dominant >= 0")
+        return {row["name"]: (row["dominant"], row["accent"]) for row in self.cursor.fetchall()}
+
+    def get_songs_without_audio_hash(self, limit: int = -1) -> List[tuple]:
+        # -> [(id, path)] of songs added before audio hashing
+        self.cursor.execute("SELECT id, path FROM songs WHERE audio_hash IS NULL LIMIT ?", (limit,))
+        return [(row["id"], row["path"]) for row in self.cursor.fetchall()]
+
+    def set_audio_hashes(self, hashes: List[tuple], commit = True):
+        # hashes -> [(song_id, audio_hash)]
+        self.cursor.executemany("UPDATE songs SET audio_hash = ? WHERE id = ?", [(h, s_id) for s_id, h in hashes])
+        for song_id, _ in hashes:
+            self.song_cache.invalidate(song_id)
+
+        if commit:
+            self.commit()
+
+    def get_duplicate_report(self) -> List[dict]:
+        """
+        Songs with the same audio data (tags ignored).
+        -> [{"audio_hash", "keep": (id, path), "redundant": [(id, path)]}]
+        The most played copy (then the oldest) is the one to keep.
+        """
+        self.cursor.execute("""
+            SELECT id, path, audio_hash FROM songs
+            WHERE audio_hash IN (
+                SELECT audio_hash FROM songs
+                WHERE audio_hash IS NOT NULL
+                GROUP BY audio_hash HAVING COUNT(*) > 1
+            )
+            ORDER BY audio_hash, plays DESC, id ASC
+        """)
+
+        report = []
+        for row in self.cursor.fetchall():
+            if not report or report[-1]["audio_hash"] != row["audio_hash"]:
+                report.append({"audio_hash": row["audio_hash"], "keep": (row["id"], row["path"]), "redundant": []})
+            else:
+                report[-1]["redundant"].append((row["id"], row["path"]))
+
+        return report
+
+
+    def _update_column(self, table: str, column_id: int, commit = True, **kwargs):
+        query = update_query(table, kwargs.keys())
 
         values = list(kwargs.values())
         values.append(column_id) # id at last
 
         self.cursor.execute(query, values)
-        self.conn.commit()
+
+        if table == "songs":
+            self.song_cache.invalidate(column_id)
+            # playlist duration follows the songs (trigger)
+            self.playlist_cache.clear()
+
+        elif table == "playlist":
+            self.playlist_cache.invalidate(column_id)
+
+        if commit:
+            self.commit()
 
 
 
 if __name__ == "__main__":
     db = DataBase()
+
+    # query plan regression check, exits with 1 on a table scan / temp sort
+    bad_plans = db.check_query_plans()
+    for name, plan in bad_plans:
+        print(f"[QueryPlan] {name} => {plan}")
+    if bad_plans:
+        sys.exit(1)
+
     # info = db.get_playlist(playlist_id=1)
     # print(dict_format(info))
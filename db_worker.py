@@ -0,0 +1,198 @@
+import time
+import queue
+from concurrent.futures import Future
+from PyQt5.QtCore import QThread, pyqtSignal
+from databse import DataBase
+import tracing
+
+
+class _Task():
+    __slots__ = ("method", "args", "kwargs", "callback", "is_write", "future")
+
+    def __init__(self, method: str, args: tuple, kwargs: dict, callback, is_write: bool):
+        self.method = method
+        self.args = args
+        self.kwargs = kwargs
+        self.callback = callback
+        self.is_write = is_write
+        self.future = Future()
+
+
+class DataBaseWorker(QThread):
+    """
+    Owns the writer connection of the app and runs every DataBase call on it's own thread.
+    Background threads that only need to read can use `DataBase(read_only=True)`.
+
+    read(...)  -> runs the DataBase method and sends the result back
+    write(...) -> same, but the commit is delayed so writes that come
+                  within `write_window` are grouped into one transaction.
+                  Each write runs in a savepoint, a write that raises is rolled
+                  back alone, the others of the transaction are kept.
+
+    Both returns a `concurrent.futures.Future`. If a callback is given,
+    it is called on the GUI thread with the result (through `resultReady`).
+    Requests are served in the order they are queued, so a read always see
+    the writes queued before it.
+    Results of writes are only sent once their transaction is committed, results
+    of reads queued behind them wait too (callbacks are called in queue order).
+    A failed commit -> the futures of its writes get the exception, their callbacks
+    are not called.
+    """
+    resultReady = pyqtSignal(object, object)
+
+    def __init__(self, path: str = None, parent = None):
+        super().__init__(parent)
+
+        self.path = path
+        self.dataBase: DataBase = None
+
+        # group writes into one transaction for this long (sec)
+        self.write_window = 0.05
+        # or until this many writes are pending
+        self.max_batch = 500
+
+        self._queue: queue.Queue = queue.Queue()
+        self._pending_writes = 0
+        self._commit_deadline = None
+        # (task, result) finished after the last commit, sent by _commit
+        self._held = []
+
+        # callbacks are always called on the thread this object lives in (GUI)
+        self.resultReady.connect(self._deliver)
+
+
+    def read(self, method: str, *args, callback = None, **kwargs) -> Future:
+        return self._submit(method, args, kwargs, callback, is_write=False)
+
+    def write(self, method: str, *args, callback = None, **kwargs) -> Future:
+        return self._submit(method, args, kwargs, callback, is_write=True)
+
+    def _submit(self, method: str, args: tuple, kwargs: dict, callback, is_write: bool) -> Future:
+        if not hasattr(DataBase, method):
+            raise AttributeError(f"DataBase has no method : {method}")
+
+        task = _Task(method, args, kwargs, callback, is_write)
+        self._queue.put(task)
+        return task.future
+
+    def stop(self, wait: bool = True):
+        # flush pending writes and close the connection
+        self._queue.put(None)
+        if wait:
+            self.wait()
+
+
+    def run(self):
+        tracing.set_thread_name("db-worker")
+        with tracing.span("DataBase()"):
+            self.dataBase = DataBase(path=self.path)
+
+        while True:
+            timeout = None
+            if self._pending_writes:
+                timeout = max(0, self._commit_deadline - time.monotonic())
+
+            try:
+                task = self._queue.get(timeout=timeout)
+            except queue.Empty:
+                # write window is over
+                self._commit()
+                continue
+
+            if task is None:
+                break
+
+            self._execute(task)
+
+            if task.is_write:
+                if not self._pending_writes:
+                    self._commit_deadline = time.monotonic() + self.write_window
+
+                self._pending_writes += 1
+                if self._pending_writes >= self.max_batch:
+                    self._commit()
+
+        self._commit()
+        print(f"[DBWorker] Cache : {self.dataBase.cache_stats()}")
+        self.dataBase.close()
+        print("[DBWorker] Stopped")
+
+    def _execute(self, task: _Task):
+        if task.is_write:
+            self._execute_write(task)
+            return
+
+        try:
+            with tracing.span(f"db.{task.method}"):
+                result = getattr(self.dataBase, task.method)(*task.args, **task.kwargs)
+
+        except Exception as e:
+            print(f"Error[DBWorker] {task.method} : {e}")
+            task.future.set_exception(e)
+            return
+
+        if self._held:
+            # writes before it are not committed yet, keep the order
+            self._held.append((task, result))
+            return
+
+        self._send(task, result)
+
+    def _execute_write(self, task: _Task):
+        conn = self.dataBase.conn
+        if not conn.in_transaction:
+            # else the savepoint is the transaction and RELEASE commits it
+            conn.execute("BEGIN")
+        conn.execute("SAVEPOINT task")
+
+        try:
+            with tracing.span(f"db.{task.method}"):
+                # commit is handled by the worker
+                result = getattr(self.dataBase, task.method)(*task.args, **dict(task.kwargs, commit=False))
+
+        except Exception as e:
+            print(f"Error[DBWorker] {task.method} : {e}")
+            # only this write is undone, the transaction goes on
+            conn.execute("ROLLBACK TO task")
+            conn.execute("RELEASE task")
+            task.future.set_exception(e)
+            return
+
+        conn.execute("RELEASE task")
+        self._held.append((task, result))
+
+    def _send(self, task: _Task, result):
+        task.future.set_result(result)
+
+        if task.callback is not None:
+            self.resultReady.emit(task.callback, result)
+
+    def _commit(self):
+        held, self._held = self._held, []
+        if not self._pending_writes:
+            for task, result in held:
+                self._send(task, result)
+            return
+
+        try:
+            self.dataBase.commit()
+
+        except Exception as e:
+            print(f"Error[DBWorker] commit failed, rolling back {self._pending_writes} writes : {e}")
+            self.dataBase.rollback()
+
+            for task, result in held:
+                if task.is_write:
+                    task.future.set_exception(e)
+                else:
+                    self._send(task, result)
+
+        else:
+            for task, result in held:
+                self._send(task, result)
+
+        self._pending_writes = 0
+        self._commit_deadline = None
+
+    def _deliver(self, callback, result):
+        callback(result)
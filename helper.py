@@ -1,107 +1,91 @@
-from mutagen.id3 import ID3, APIC
-from mutagen.mp3 import MP3
-from PyQt5.QtCore import Qt, QTimer, pyqtSignal, QThread, QSize, QObject
-from PyQt5.QtGui import QFont, QPixmap, QColor, QPainter, QPen, QColor, QPainterPath
+from PyQt5.QtCore import Qt, QTimer, pyqtSignal, QThread, QObject, QBuffer, QIODevice
+from PyQt5.QtGui import QFont, QImage, QColor, QPainter, QPen, QColor
 from PyQt5.QtWidgets import QWidget
 import os
-import requests
-from ytmusicapi import YTMusic
-from util import is_mp3
-from databse import DataBase
-from typing import List
-from util import gen_thumbnail_path, COVER_DIR_PATH
-from PIL import Image
+from db_worker import DataBaseWorker
+from util import save_cover, COVER_DIR_PATH
+from metadata import read_track
 from urllib.parse import urlparse, parse_qs
+from lazy import lazy_import, LazyObject
+from cover_store import cover_exists
+import tracing
 
-YT_MUSIC = YTMusic()
+# imported / created on first use, not when the window starts
+ytmusicapi = lazy_import("ytmusicapi")
 
-
-def create_playlist_cover(image_paths, output_path, size=290):
-    # only one image in the list
-    if len(image_paths) == 1:
-        img = Image.open(image_paths[0])
-        img.save(output_path,  "JPEG", quality=100)
-        return output_path
-    
-    images = []
-    for path in image_paths[:4]:
-        if os.path.exists(path):
-            img = Image.open(path).convert("RGB")
-            images.append(img)
-
-    if not images:
-        return
-    
-    if len(images) < 4:
-        images.insert(2, images[1])
-        images.insert(3, images[0])
-
-    # Resize each image to quarter size
-    half = size // 2
-    images = [img.resize((half, half), Image.LANCZOS) for img in images]
-
-    # Create blank canvas
-    collage = Image.new("RGB", (size, size), (0, 0, 0))
-
-    # Paste images (2x2 grid)
-    collage.paste(images[0], (0, 0))
-    collage.paste(images[1], (half, 0))
-    collage.paste(images[2], (0, half))
-    collage.paste(images[3], (half, half))
-
-    collage.save(output_path, "JPEG", quality=100)
-    return output_path
+YT_MUSIC = LazyObject(lambda: ytmusicapi.YTMusic())
 
 
 class LoadFiles(QObject):
+    """
+    Adds the songs of the db to the home screen, one page at a time.
+
+    With `known` (cards already painted from the startup snapshot) it only reconciles:
+    unchanged songs are skipped, changed ones -> updateSong, new ones -> addOneSong,
+    songs that are not in the db anymore -> removeSong.
+    """
     addOneSong = pyqtSignal(int, int, str, str, str, str)
+    updateSong = pyqtSignal(int, str, str, str, str)
+    removeSong = pyqtSignal(int)
     finished = pyqtSignal(bool)
 
-    def __init__(self, dataBase: DataBase = None, parent = None):
+    def __init__(self, dataBase: DataBaseWorker = None, parent = None):
         super().__init__(parent)
 
         self.dataBase = dataBase
 
-        # list of id's of the song wich does not exists anymore
-        # so to remove later add here
-        self._to_delete: List[int] = []
-
         self.sleep_on_count = 10
         self.count = 0
         self.song_index = -1
         self.batch_size = 10
+        self.page_delay = 300 # ms
+
+        self.known: dict = {}
+        self.seen = set()
+        self.held: list = None
+
+    def add_song_batch(self, songs: list):
+        # callback of get_song_page
+        if self.held is not None:
+            # cards are still being built, the page waits for release()
+            # (and the next one is only read after it, one page in memory)
+            self.held.append(songs)
+            return
 
-        self.all_songs = []
+        self._add_songs(songs)
+        self._next_page(songs)
 
-    def add_song_batch(self, start_index: int):
-        end_index = start_index + self.batch_size
+    def release(self):
+        held, self.held = self.held, None
+        if not held:
+            # no page yet, add_song_batch applies them when they come
+            return
 
-        for song in self.all_songs[start_index : end_index]:
-            self.song_index += 1
+        for songs in held:
+            self._add_songs(songs)
+            self._next_page(songs)
 
-            if not os.path.isfile(song['path']):
-                print(f"PathNotFound [{song['id']}] => {song['path']}")
-                # add to delete later
-                self._to_delete.append(song['id'])
-                continue
+    @tracing.traced("LoadFiles.page")
+    def _add_songs(self, songs: list):
+        for song in songs:
+            self.song_index += 1
+            # missing files are removed by the library scan, no stat() here
 
+            known = self.known.get(song['id'])
+            if known is not None:
+                self.seen.add(song['id'])
+                if known == (song['title'], song['subtitle'], song['path'], song['cover_path']):
+                    # already on the screen
+                    continue
 
             cover_path = os.path.join(COVER_DIR_PATH, song['cover_path'])
-            if not os.path.exists(cover_path):
+            # "" -> cover was removed (library gc)
+            if not song['cover_path'] or not cover_exists(cover_path):
                 # if cover path not found...
                 print(f"Cover ===> {song['cover_path']}")
-                if song['cover_path'] == "":
-                    # if cover not in db
-                    # gen new cover_path
-                    cover_path = gen_thumbnail_path()
-                
-                else:
-                    # get filename  from prev path
-                    filename = os.path.basename(song['cover_path'])
-                    cover_path = os.path.join(COVER_DIR_PATH, filename)
 
                 # extract cover from song and save to cover directory
-                cover_path = extract_cover_save(song['path'], cover_path)
+                cover_path = extract_cover_save(song['path'])
 
                 if not cover_path:
                     # this song doesn't have a cover
@@ -112,89 +96,65 @@ class LoadFiles(QObject):
 
                 # save new path to db
                 filename = os.path.basename(cover_path)
-                self.dataBase.update_song(song_id=song['id'], cover_path=filename)
+                self.dataBase.write("update_song", song_id=song['id'], cover_path=filename)
 
 
-            self.addOneSong.emit(self.song_index, song['id'], song['title'], song['subtitle'], song['path'], cover_path)
+            if known is not None:
+                self.updateSong.emit(song['id'], song['title'], song['subtitle'], song['path'], cover_path)
+            else:
+                self.addOneSong.emit(self.song_index, song['id'], song['title'], song['subtitle'], song['path'], cover_path)
 
-        if end_index < len(self.all_songs):
-            QTimer.singleShot(300, lambda idx=end_index: self.add_song_batch(idx))
+    def _next_page(self, songs: list):
+        if len(songs) == self.batch_size:
+            # full page -> maybe more songs after it
+            QTimer.singleShot(self.page_delay, lambda after_id=songs[-1]['id']: self._load_page(after_id))
 
         else:
-            self.finished.emit(True)
-
+            for song_id in self.known.keys() - self.seen:
+                self.removeSong.emit(song_id)
 
-    def run(self):
-        self.all_songs = self.dataBase.get_song()
-        self.add_song_batch(0)
-
-
-def round_pix_form_path(path: str, width:int, height:int, radius: int = 8) -> QPixmap:
-    pix = QPixmap(path)
-    return round_pix(pix, width, height, radius)
-
-def round_pix(pix: QPixmap,  width:int, height:int, radius: int = 8) -> QPixmap:
-    if pix.isNull():
-        return pix
-    
-    rounded = QPixmap(QSize(width, height))
-    rounded.fill(Qt.transparent)
+            self.finished.emit(True)
 
-    painter = QPainter(rounded)
-    painter.setRenderHint(QPainter.Antialiasing)
 
-    path = QPainterPath()
-    path.addRoundedRect(0, 0, width, height, radius, radius)
+    def run(self, known: dict = None, hold: bool = False):
+        # hold -> the first page is kept until release()
+        self.held = [] if hold else None
+        if known:
+            # cards are already painted, only a few rows can change -> big pages, no wait
+            self.known = known
+            self.batch_size = 500
+            self.page_delay = 0
 
-    painter.setClipPath(path)
+        self._load_page(None)
 
-    painter.drawPixmap(0, 0, pix.scaled(width, height, Qt.KeepAspectRatioByExpanding, Qt.SmoothTransformation))
-    painter.end()
-  
-    return rounded
+    def _load_page(self, after_id: int | None):
+        # only one batch of rows is loaded at a time
+        self.dataBase.read("get_song_page", after_id=after_id, limit=self.batch_size, callback=self.add_song_batch)
 
 
-def crop_and_save_img(img_data: bytes, out_path: str, from_left: int = 0, from_right: int = 0) -> str:
-    if not out_path:
-        raise ValueError("Enter a valid out_path..")
-    
-    pix = QPixmap()
-    if not pix.loadFromData(img_data):
+def crop_image(img_data: bytes, from_left: int = 0, from_right: int = 0, image_format: str = "JPEG") -> bytes:
+    # runs in the download thread -> QImage (QPixmap is GUI thread only), nothing written to the disk
+    image = QImage()
+    if not image.loadFromData(img_data):
         raise ValueError("Invalid image data or unsupported format")
-    
-    width = pix.width()
-    
-    width = max(1, width - from_left - from_right)
-    pix = pix.copy(from_left, 0, width, pix.height())
 
-    _, ext = os.path.splitext(out_path)
-    ext = ext[1:].upper() # remove dot(.) and captalize
-    pix.save(out_path, ext)
+    width = max(1, image.width() - from_left - from_right)
+    image = image.copy(from_left, 0, width, image.height())
 
-    return out_path
+    buffer = QBuffer()
+    buffer.open(QIODevice.WriteOnly)
+    if not image.save(buffer, image_format):
+        raise ValueError(f"Can't encode the image as {image_format}")
 
-def extract_cover_save(song_path: str, cover_path: str):
-    tags = ID3(song_path)
-    for frame in tags.values():
-        if isinstance(frame, APIC):
-            with open(cover_path, "wb") as tf:
-                tf.write(frame.data)
-            return cover_path
+    return bytes(buffer.data())
 
+def extract_cover_save(song_path: str):
+    # -> path of the saved cover (named by it's content), None if the song has no cover
+    track = read_track(song_path)
+    if track is None or track["cover_data"] is None:
+        return
 
-def get_mp3_metadata(path: str) -> dict:
-    audio = MP3(path)
-    info = {
-        "duration": int(audio.info.length),
-        "sample_rate": audio.info.sample_rate,
-        "channels": audio.info.channels,
-        "bitrate": audio.info.bitrate,
-        "mode": audio.info.mode,  # Stereo, JointStereo etc.
-        "version": audio.info.version,
-        "layer": audio.info.layer,
-    }
-
-    return info
+    return save_cover(track["cover_data"])
 
 
 class YTSearchThread(QThread):
@@ -303,134 +263,6 @@ class YTSearchThread(QThread):
         return custom_result, custom_result2
     
 
-class ConfigResult(QThread):
-    add_one = pyqtSignal(str, str, list, str, QPixmap)
-    finished = pyqtSignal(bool)
-
-    def __init__(self, result: dict, parent=None):
-        super().__init__(parent)
-        self.result = result
-
-    def run(self):
-
-        for item in self.result:
-            title = item["title"]
-            subtitle = item["subtitle"]
-            artists = item["artists"]
-            vid = item['videoId']
-
-            thumbnail_url = item["thumbnail_url"]
-
-            try:
-                resp = requests.get(thumbnail_url, timeout=10)
-                resp.raise_for_status()
-                pix = QPixmap()
-                pix.loadFromData(resp.content)
-
-                self.add_one.emit(title, subtitle, artists, vid, pix)
-
-            except Exception as e:
-                pix = QPixmap()
-                self.add_one.emit(title, subtitle, artists, vid, pix)
-
-        self.finished.emit(True)
-
-
-
-def get_pixmap(path: str):
-    if not os.path.isfile:
-        return QPixmap()
-    
-    tags = ID3(path)
-    for frame in tags.values():
-        if isinstance(frame, APIC):
-            pix = QPixmap()
-            pix.loadFromData(frame.data)
-            return pix
-        
-    return QPixmap()
-
-
-class LocalFilesLoader(QThread):
-    config_one = pyqtSignal(str, str, str, QPixmap)
-    finished = pyqtSignal(bool)
-
-    def __init__(self, music_dirs: list = None, parent = None):
-        super().__init__(parent)
-        self.music_dirs = self._ensure_list(music_dirs)
-        self.sleep_on_count = 10
-        self.count = 0
-
-    def _ensure_list(self, x):
-        if x is None:
-            return []
-
-        if isinstance(x, (list, tuple)):
-            return list(x)
-        return [x]
-
-    
-    def run(self):
-        for dirctory in self.music_dirs:
-            if os.path.isfile(dirctory):
-                self._add_song(dirctory)
-                continue
-
-            if os.path.isdir(dirctory):
-                self._list_music(dirctory)
-                continue
-
-            print(f"Error => This is not a file nor a dirctory.")
-
-        self.finished.emit(True)
-
-
-    def _list_music(self, directory: str):
-        for file in os.listdir(directory):
-            absolute_path = os.path.join(directory, file)
-
-            if os.path.isfile(absolute_path):
-                self._add_song(absolute_path)
-            # not handling the recursive directory..
-            
-    def _add_song(self, path: str):
-        if not is_mp3(path):
-            return
-        
-        # giving time to lead the window fully then add files...
-        if self.count != -1:
-            self.count += 1
-            
-            if self.count > 8:
-                # return
-                QThread.sleep(2)
-                self.count = -1
-        else:
-            QThread.msleep(15)
-  
-
-        tags = ID3(path)
-
-        def _get_text(tag_id):
-            frame = tags.get(tag_id)
-            if frame and hasattr(frame, "text") and frame.text:
-                return str(frame.text[0])
-            return None
-        
-        title = _get_text("TIT2")
-        publisher = _get_text("TPUB")
-        if not publisher:
-            publisher = _get_text("TIT3")
-
-        for frame in tags.values():
-            if isinstance(frame, APIC):
-                pix = QPixmap()
-                pix.loadFromData(frame.data)
-                self.config_one.emit(title, publisher, path, pix)
-                # song with cover is uselesss... 
-                break
-
-
 class CircularProgress(QWidget):
     def __init__(self, size=60, parent=None):
         super().__init__(parent)
@@ -543,18 +375,3 @@ class LoadingSpinner(QWidget):
         painter.setPen(pen)
         # draw an arc that rotates
         painter.drawArc(rect, self.angle * 16, 120 * 16)
-
-
-
-if __name__ == "__main__":
-    image_list = [
-        "C:\\Users\\dgg\\.aurix\\cvr\\9xer8vedluesck35zaqjhamwzkvc6k.jpg",
-        "C:\\Users\\dgg\\.aurix\\cvr\\0xqss2rnaw6yxoeip2mcfmrmg9cd55.jpg",
-        "C:\\Users\\dgg\\.aurix\\cvr\\0rp0887rq1vyg0kmx9m3wtveosz195.jpg",
-        # "C:\\Users\\dgg\\.aurix\\cvr\\2urof5ipq7tgvfu59j0l0b8ouw3eo8.jpg",
-    ]
-
-    outpath = "C:\\Users\\dgg\\.aurix\\cvr\\playlist_2.jpg"
-
-    path = create_playlist_cover(image_list, outpath, size=712)
-    
\ No newline at end of file
@@ -0,0 +1,186 @@
+import threading
+from collections import deque
+from PyQt5.QtCore import Qt, QObject, QRunnable, QThread, QThreadPool, QBuffer, QByteArray, QIODevice, QSize, pyqtSignal
+from PyQt5.QtGui import QImage, QImageReader, QPainter, QPainterPath
+from lazy import lazy_import, LazyObject
+
+requests = lazy_import("requests")
+
+# Images are decoded off the GUI thread, as QImage only (QPixmap is GUI thread only).
+#
+#   IMAGES.load(path, 86, 86, radius=6, callback=label_set_image)
+#
+# Workers of a QThreadPool decode/scale/round, the finished images are handed to the
+# GUI thread in batches (one queued signal for everything finished since the last one)
+# and the callbacks are called there.
+
+
+def fill_crop(image: QImage, width: int, height: int) -> QImage:
+    # fill width x height (cut the sides)
+    if image.width() != width or image.height() != height:
+        image = image.scaled(width, height, Qt.KeepAspectRatioByExpanding, Qt.SmoothTransformation)
+
+    x = (image.width() - width) // 2
+    y = (image.height() - height) // 2
+    return image.copy(x, y, width, height)
+
+
+def decode_image(source, width: int = 0, height: int = 0) -> QImage:
+    """
+    source -> file path or image bytes (memoryview -> read in place, cover_store.py)
+    Decoded at about width x height and cropped to it (0 -> full size), any thread.
+    """
+    if isinstance(source, (bytes, bytearray, memoryview)):
+        buffer = QBuffer()
+        # no copy, `source` outlives the reader
+        buffer.setData(QByteArray.fromRawData(source) if isinstance(source, memoryview) else QByteArray(bytes(source)))
+        buffer.open(QIODevice.ReadOnly)
+        reader = QImageReader(buffer)
+    else:
+        reader = QImageReader(source)
+
+    reader.setAutoTransform(True)
+
+    if width and height:
+        size = reader.size()
+        if size.isValid() and size.width() > width and size.height() > height:
+            # jpeg is decoded directly at the smaller size (libjpeg dct scaling),
+            # a 3000px cover never exists at full size in memory
+            scale = max(width / size.width(), height / size.height())
+            reader.setScaledSize(QSize(
+                max(width, round(size.width() * scale)),
+                max(height, round(size.height() * scale))
+            ))
+
+    image = reader.read()
+    if image.isNull() or not (width and height):
+        return image
+
+    return fill_crop(image, width, height)
+
+
+def round_image(image: QImage, width: int, height: int, radius: int = 8) -> QImage:
+    # rounded corners (QPainter on a QImage is fine outside the GUI thread)
+    if image.isNull():
+        return image
+
+    rounded = QImage(width, height, QImage.Format_ARGB32_Premultiplied)
+    rounded.fill(Qt.transparent)
+
+    painter = QPainter(rounded)
+    painter.setRenderHint(QPainter.Antialiasing)
+
+    path = QPainterPath()
+    path.addRoundedRect(0, 0, width, height, radius, radius)
+    painter.setClipPath(path)
+
+    painter.drawImage(0, 0, fill_crop(image, width, height))
+    painter.end()
+
+    return rounded
+
+
+def load_image(source, width: int, height: int, radius: int = 0) -> QImage:
+    image = decode_image(source, width, height)
+    return round_image(image, width, height, radius) if radius else image
+
+
+def load_url_image(url: str, width: int, height: int, radius: int = 0) -> QImage:
+    resp = requests.get(url, timeout=10)
+    resp.raise_for_status()
+    return load_image(resp.content, width, height, radius)
+
+
+class _Job(QRunnable):
+    def __init__(self, loader: "ImageLoader", job_id: int, func, args: tuple):
+        super().__init__()
+        self.loader = loader
+        self.job_id = job_id
+        self.func = func
+        self.args = args
+
+    def run(self):
+        try:
+            result = self.func(*self.args)
+        except Exception as e:
+            print(f"Error[ImageLoader] {e}")
+            result = None
+
+        self.loader._finished(self.job_id, result)
+
+
+class ImageLoader(QObject):
+    """
+    Pool of image workers.
+        submit(func, *args, callback) -> func runs in the pool, callback(result) on the GUI thread
+        load / load_url -> QImage of width x height (rounded if radius), None/null on error
+    """
+    _ready = pyqtSignal()
+
+    def __init__(self, max_threads: int = None, parent = None):
+        super().__init__(parent)
+
+        self.pool = QThreadPool(self)
+        # leave a core for the GUI / player
+        self.pool.setMaxThreadCount(max_threads or max(2, min(4, QThread.idealThreadCount() - 1)))
+
+        self._next_id = 0
+        self._callbacks = {}
+        self._results = deque()
+        self._lock = threading.Lock()
+
+        self._ready.connect(self._deliver, Qt.QueuedConnection)
+
+    def submit(self, func, *args, callback = None) -> int:
+        self._next_id += 1
+        job_id = self._next_id
+
+        if callback is not None:
+            self._callbacks[job_id] = callback
+
+        self.pool.start(_Job(self, job_id, func, args))
+        return job_id
+
+    def load(self, source, width: int, height: int, radius: int = 0, callback = None) -> int:
+        return self.submit(load_image, source, width, height, radius, callback=callback)
+
+    def load_url(self, url: str, width: int, height: int, radius: int = 0, callback = None) -> int:
+        return self.submit(load_url_image, url, width, height, radius, callback=callback)
+
+    def cancel(self, job_id: int):
+        # result is dropped (the job itself can't be stopped once it runs)
+        self._callbacks.pop(job_id, None)
+
+    def _finished(self, job_id: int, result):
+        # worker thread
+        with self._lock:
+            first = not self._results
+            self._results.append((job_id, result))
+
+        if first:
+            # one signal for the whole batch
+            self._ready.emit()
+
+    def _deliver(self):
+        # GUI thread
+        with self._lock:
+            batch = self._results
+            self._results = deque()
+
+        for job_id, result in batch:
+            callback = self._callbacks.pop(job_id, None)
+            if callback is None:
+                continue
+
+            try:
+                callback(result)
+            except RuntimeError:
+                # widget deleted while its image was loading
+                pass
+
+    def wait(self, msecs: int = -1) -> bool:
+        return self.pool.waitForDone(msecs)
+
+
+# created on first use (needs the QApplication)
+IMAGES = LazyObject(ImageLoader)
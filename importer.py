@@ -0,0 +1,78 @@
+import os
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+from typing import List
+from metadata import read_track, audio_hash
+
+# This module runs inside the pool processes, keep it's imports light
+# (no Qt widgets, no helper.py -> it creates YTMusic on import).
+
+
+def parse_song_file(path: str) -> dict | None:
+    """
+    Row for add_songs_bulk + "cover_data" (bytes or None) from a single parse of the file.
+    None if it's not a valid song.
+    """
+    track = read_track(path)
+    if track is None or track["vid"] is None:
+        # if song has to tags
+        print(f"InvalidSong : {path}")
+        return
+
+    return {
+        "title": track["title"],
+        "subtitle": track["subtitle"],
+        "artist": ",".join(track["artists"]),
+        "vid": track["vid"],
+        "duration": track["duration"],
+        "sample_rate": track["sample_rate"],
+        "channels": track["channels"],
+        "bitrate": track["bitrate"],
+        "audio_hash": audio_hash(path),
+        "path": path,
+        "cover_data": track["cover_data"],
+    }
+
+
+def parse_song_files(paths: List[str]) -> List[tuple]:
+    # one pool task = one chunk of files, so the ipc cost is paid per chunk
+    return [(path, parse_song_file(path)) for path in paths]
+
+
+def iter_parsed_songs(paths: List[str], workers: int = None, chunk_size: int = 16, min_pool_size: int = 64):
+    """
+    Yields (path, song | None) for every path, in the order they are parsed.
+
+    Files are parsed in a process pool, `workers * 2` chunks are in flight at most,
+    so a consumer that stops pulling (ScanThread waiting for the db writes) holds the
+    pool back instead of piling up results.
+    Few files are parsed here, starting the pool would cost more.
+    """
+    if len(paths) < min_pool_size:
+        for path in paths:
+            yield path, parse_song_file(path)
+        return
+
+    workers = workers or os.cpu_count() or 2
+    chunks = (paths[start : start + chunk_size] for start in range(0, len(paths), chunk_size))
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        pending = set()
+
+        try:
+            for chunk in chunks:
+                pending.add(pool.submit(parse_song_files, chunk))
+                if len(pending) < workers * 2:
+                    continue
+
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    yield from future.result()
+
+            while pending:
+                yield from pending.pop().result()
+
+        except GeneratorExit:
+            # consumer stopped (app closing), don't parse the chunks still queued
+            for future in pending:
+                future.cancel()
+            raise
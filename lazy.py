@@ -0,0 +1,61 @@
+import importlib
+import threading
+
+# Deferred imports / objects, so the window shows before the heavy libraries are loaded.
+# Kept light, it's imported by the modules of the first screen (and pool processes).
+
+
+class LazyModule():
+    """
+    Stands for a module until an attribute is used, then imports it.
+        requests = LazyModule("requests")
+        requests.get(url) # imported here
+    """
+    def __init__(self, name: str):
+        self._name = name
+        self._module = None
+
+    def _load(self):
+        if self._module is None:
+            # import lock of python makes this thread safe
+            self._module = importlib.import_module(self._name)
+        return self._module
+
+    @property
+    def is_loaded(self) -> bool:
+        return self._module is not None
+
+    def __getattr__(self, attr: str):
+        # only called for attributes not found on the proxy itself
+        return getattr(self._load(), attr)
+
+    def __repr__(self):
+        state = "loaded" if self._module is not None else "not loaded"
+        return f"<LazyModule {self._name} ({state})>"
+
+
+class LazyObject():
+    """ Object created by `factory` on the first attribute access (thread safe) """
+
+    def __init__(self, factory):
+        self._factory = factory
+        self._object = None
+        self._lock = threading.Lock()
+
+    def _load(self):
+        if self._object is None:
+            with self._lock:
+                if self._object is None:
+                    self._object = self._factory()
+        return self._object
+
+    @property
+    def is_loaded(self) -> bool:
+        return self._object is not None
+
+    def __getattr__(self, attr: str):
+        return getattr(self._load(), attr)
+
+
+def lazy_import(name: str) -> LazyModule:
+    return LazyModule(name)
@@ -0,0 +1,178 @@
+import os
+import time
+from typing import Dict, List
+from PyQt5.QtCore import QObject, QThread, QTimer, QEvent, pyqtSignal
+from PyQt5.QtWidgets import QApplication
+from databse import DataBase
+from util import COVER_DIR_PATH, original_name
+from cover_store import STORE, cover_exists, migrate_loose_covers
+
+
+class IdleTimer(QObject):
+    """ Emits `idle` after `idle_sec` without any mouse / keyboard input in the app """
+    idle = pyqtSignal()
+
+    INPUT_EVENTS = {
+        QEvent.MouseButtonPress, QEvent.MouseMove, QEvent.Wheel,
+        QEvent.KeyPress, QEvent.TouchBegin,
+    }
+
+    def __init__(self, idle_sec: float = 120, parent = None):
+        super().__init__(parent)
+
+        self.timer = QTimer(self)
+        self.timer.setSingleShot(True)
+        self.timer.setInterval(int(idle_sec * 1000))
+        self.timer.timeout.connect(self.idle.emit)
+
+    def start(self):
+        QApplication.instance().installEventFilter(self)
+        self.timer.start()
+
+    def stop(self):
+        QApplication.instance().removeEventFilter(self)
+        self.timer.stop()
+
+    def eventFilter(self, obj, event):
+        if event.type() in self.INPUT_EVENTS:
+            # restart the countdown
+            self.timer.start()
+        return False
+
+
+def _is_under(path: str, roots: List[str]) -> bool:
+    return any(path == root or path.startswith(root + os.sep) for root in roots)
+
+
+class LibraryGC(QThread):
+    """
+    Removes what the library doesn't use anymore:
+        - files of the cover dir that no song / playlist points to (old covers, old playlist collages, temp files)
+        - cover_path of songs whose cover file is gone (the loader extracts it again)
+        - scan index rows of missing files outside the library roots (the scanner never visits them)
+
+    Orphans = files of the cover dir - covers in the db (one set difference).
+    Files newer than `grace_sec` are kept, they may be written but not saved in the db yet.
+    Files are removed in batches of `batch_size`, the db rows are emitted with `pruneReady`
+    (written by the db worker) and `gcFinished(report)` is emitted at the end.
+    """
+    pruneReady = pyqtSignal(object)
+    gcFinished = pyqtSignal(object)
+
+    def __init__(self, parent = None):
+        super().__init__(parent)
+
+        self.grace_sec = 3600
+        self.batch_size = 100
+
+    def stop(self):
+        self.requestInterruption()
+        self.wait()
+
+    def _list_cover_dir(self) -> Dict[str, tuple]:
+        # name -> (size, mtime)
+        files = {}
+        try:
+            with os.scandir(COVER_DIR_PATH) as entries:
+                for entry in entries:
+                    if entry.is_file(follow_symlinks=False):
+                        stat = entry.stat()
+                        files[entry.name] = (stat.st_size, stat.st_mtime)
+
+        except OSError as e:
+            print(f"Error[GC] {COVER_DIR_PATH} : {e}")
+
+        return files
+
+    def _list_pack(self) -> Dict[str, tuple]:
+        # name -> (size, mtime) of the packed covers (cover_store.py)
+        if not STORE.enabled or not STORE.open():
+            return {}
+        return {name: (entry[1], entry[4]) for name, entry in list(STORE.index.items())}
+
+    def run(self):
+        report = {
+            "files": 0, "orphans": 0, "deleted": 0, "bytes": 0, "missing_covers": 0, "stale_scan_rows": 0,
+            "packed": 0, "compacted": 0,
+        }
+
+        # list the files before reading the db, so a cover saved in between is never an orphan
+        # (missing covers are checked again below, the listing is older than the db read)
+        packed = self._list_pack()
+        files = self._list_cover_dir()
+        loose = set(files)
+        files.update(packed)
+        report["files"] = len(files)
+
+        dataBase = DataBase(read_only=True)
+        song_covers, playlist_covers = dataBase.get_cover_references()
+        roots = [os.path.abspath(path) for path, _ in dataBase.get_library_roots()]
+        scan_paths = list(dataBase.get_scan_index())
+        dataBase.close()
+
+        # scaled variants (cover_cache.py) live as long as their cover
+        used = song_covers | playlist_covers
+        orphans = [name for name in files if original_name(name) not in used]
+        report["orphans"] = len(orphans)
+
+        deadline = time.time() - self.grace_sec
+        orphans = [name for name in orphans if files[name][1] < deadline]
+
+        for start in range(0, len(orphans), self.batch_size):
+            if self.isInterruptionRequested():
+                break
+
+            batch = orphans[start : start + self.batch_size]
+            packed_batch = [name for name in batch if name in packed]
+            if packed_batch:
+                # tombstones in the pack, the space comes back with compact()
+                STORE.remove(packed_batch)
+                report["deleted"] += len(packed_batch)
+                report["bytes"] += sum(files[name][0] for name in packed_batch)
+
+            for name in batch:
+                if name not in loose:
+                    continue
+                try:
+                    os.remove(os.path.join(COVER_DIR_PATH, name))
+                except OSError as e:
+                    print(f"Error[GC] {name} : {e}")
+                    continue
+
+                report["deleted"] += 1
+                report["bytes"] += files[name][0]
+
+            # let the ui / player threads breathe between batches
+            self.msleep(10)
+
+        if self.isInterruptionRequested():
+            return
+
+        if STORE.enabled:
+            # pack on -> new loose covers join it, the pack is rewritten when a quarter is dead
+            deleted = set(orphans)
+            report["packed"] = migrate_loose_covers(
+                names=[name for name in loose if name not in deleted], min_age=self.grace_sec
+            )
+            if STORE.dead_bytes > STORE.size // 4:
+                report["compacted"] = STORE.compact()
+
+        # playlist covers can be in the res folder, only song covers are checked.
+        # a cover saved after the listing is referenced by the db but not in `files`
+        missing_covers = [
+            name for name in song_covers - files.keys()
+            if not cover_exists(os.path.join(COVER_DIR_PATH, name))
+        ]
+
+        stale_scan_paths = [
+            path for path in scan_paths
+            if not _is_under(path, roots) and not os.path.exists(path)
+        ]
+
+        report["missing_covers"] = len(missing_covers)
+        report["stale_scan_rows"] = len(stale_scan_paths)
+
+        if missing_covers or stale_scan_paths:
+            self.pruneReady.emit({"missing_covers": missing_covers, "stale_scan_paths": stale_scan_paths})
+
+        self.gcFinished.emit(report)
@@ -1,5 +1,6 @@
 import os
 import sys
+import multiprocessing
 from PyQt5.QtWidgets import QMainWindow, QWidget, QHBoxLayout, QVBoxLayout, QApplication, QStackedWidget
 from PyQt5.QtCore import QTimer
 from sidebar import Sidebar
@@ -7,14 +8,21 @@ from topbar import Topbar
 from bottom_bar import BottomBar
 from content import ContentArea
 from util import dark_title_bar, get_music_path, MediaKeys, format_duration, COVER_DIR_PATH, resource_path
-from yt_music import YtScreen
 from player import PlayerEngine
-from databse import DataBase
+from db_worker import DataBaseWorker
 from playlist_win import PlaylistPlayerWindow
 from menu import CardMenu, PlaylistPickerMenu
-from helper import LoadFiles, create_playlist_cover, extract_cover_save, get_mp3_metadata
-from tube import get_mp3_tags
-from util import gen_thumbnail_path, is_mp3
+from helper import LoadFiles
+from collage import CollageService, collage_name
+from cover_store import cover_exists
+from image_loader import IMAGES
+from palette import PALETTES, compute_palettes
+from scanner import ScanThread
+from watcher import WatchThread
+from library_gc import IdleTimer, LibraryGC
+from snapshot import read_snapshot, write_snapshot
+import tracing
+import time
 from random import randint
 
 class MusicMainWindow(QMainWindow):
@@ -26,12 +34,18 @@ class MusicMainWindow(QMainWindow):
 
         music_dirs = get_music_path()
 
-        # DataBase
-        self.dataBase = DataBase()
+        # DataBase -> all sqlite calls run on the worker thread
+        self.dataBase = DataBaseWorker(parent=self)
+        self.dataBase.start()
 
         # init player engine
         self.playerEngine = PlayerEngine(parent=self)
 
+        # --trace-startup -> file of the chrome trace (dumped once interactive)
+        self.trace_path: str = None
+        self.trace_exit = False
+        self._first_paint = False
+
         self.playlist_paths = []
 
         # Media Keys
@@ -51,7 +65,9 @@ class MusicMainWindow(QMainWindow):
         outer.setSpacing(0)
 
         # Topbar - logo and searchbox
-        self.top_bar = Topbar(parent=self, search_callback=self.search_call)
+        self.top_bar = Topbar(parent=self, search_callback=self.search_call, query_callback=self.local_search)
+        self.top_bar.search_box.suggestionActivated.connect(self._play_requested_from_search)
+        self.top_bar.search_box.playRequested.connect(self._play_requested_from_search)
         outer.addWidget(self.top_bar)
 
         # MIDDLE (sidebar + main content)
@@ -80,35 +96,18 @@ class MusicMainWindow(QMainWindow):
         self.home_screen.showMenuRequested.connect(self.show_song_card_menu)
 
 
-        #LIBRARAY SCREEN
-        self.library_screen = ContentArea()
-
-        # TY SCREEN
-        self.yt_screen = YtScreen(parent=self)
-        # call when yt want to all item to home screen and play
-        self.yt_screen.playRequested.connect(self._play_requested_from_explorer)
-        self.yt_screen.addSongToDBandHome.connect(self.add_song_to_db_and_home)
-        self.yt_screen.checkForExistance.connect(self.check_for_song_existance)
-        self.yt_screen.playToggleRequested.connect(self.playerEngine.play_toggled)
-
-        # playlist player window...
-        self.playlistPlayerWin = PlaylistPlayerWindow(parent=self)
-        self.playlistPlayerWin.playRequested.connect(self._play_requested_from_playlist_win)
-        self.playlistPlayerWin.playPlaylistRequested.connect(self.play_playlist_requested)
-        self.playlistPlayerWin.playToggleRequested.connect(self.playerEngine.play_toggled)
-        self.playlistPlayerWin.navbarPlaylistBroadcast.connect(self.sidebar.set_navbar_playlist_status)
-        self.playlistPlayerWin.menuActionCall.connect(self.handle_playlist_menu_action)
+        # library / yt / playlist screens are built on first use (see the properties below)
+        self._library_screen: ContentArea = None
+        self._yt_screen = None
+        self._playlist_win: PlaylistPlayerWindow = None
 
         outer.addWidget(middle_frame, 1)
 
         self.content_area = QStackedWidget()
-        self.content_area.addWidget(self.home_screen)      # index 0
-        self.content_area.addWidget(self.library_screen)   # index 1
-        self.content_area.addWidget(self.yt_screen)   # index 2
-        self.content_area.addWidget(self.playlistPlayerWin) # index 3
+        self.content_area.addWidget(self.home_screen)
 
         middle_layout.addWidget(self.content_area, 1)
-        self.content_area.setCurrentIndex(0)
+        self.content_area.setCurrentWidget(self.home_screen)
 
         # bottombar
         self.bottom_bar = BottomBar(parent=self)
@@ -131,6 +130,8 @@ class MusicMainWindow(QMainWindow):
         self.playerEngine.setRepeatMode.connect(self.set_repeat_mode)
         self.playerEngine.broadcastMsg.connect(self.broadcast_msg)
         self.playerEngine.infoPlayingStatus.connect(self.commit_song_info_status)
+        self.playerEngine.infoPlayEvent.connect(self.commit_play_event)
+        self.playerEngine.infoStreamInfo.connect(self.commit_stream_info)
 
         # -> play track signals
         self.playerEngine.askForNext.connect(self.play_next_track)
@@ -148,9 +149,31 @@ class MusicMainWindow(QMainWindow):
         # Thread to add files...
         self.loader = LoadFiles(dataBase=self.dataBase, parent=self)
         self.loader.addOneSong.connect(self.home_screen.add_item)
+        self.loader.updateSong.connect(self.home_screen.update_item)
+        self.loader.removeSong.connect(self.home_screen.remove_song)
         self.loader.finished.connect(self.on_finish_loader)
         # self.loader.start()
 
+        # home screen of the last session, painted before the db is read
+        self.snapshot = read_snapshot()
+        self.snapshot_thumbs = 24 # cards with a pre-scaled thumbnail in the snapshot
+        self.snapshot_first = 8 # cards built before the first frame (first screen at 1520x880)
+        # the loader reads its pages meanwhile, they're applied once every snapshot card is built
+        self.snapshot_painting = False
+        self.snapshot_next: int = None # first card not built yet, None -> chunks running / done
+        if self.snapshot is not None:
+            self.paint_snapshot()
+
+        # playlist covers, drawn in the background
+        self.collages = CollageService(parent=self)
+
+        # cover colours (palette.py), read once, computed for the new covers of scans,
+        # watcher batches and downloads
+        self.palette_batch = 50
+        self.palette_running = False
+        self.palette_again = False # covers added while a batch was computed
+        self.dataBase.read("get_cover_palettes", callback=PALETTES.update)
+
         # Queues --->
         self.context_queue: list = []
         self.priority_queue: list = []
@@ -162,60 +185,189 @@ class MusicMainWindow(QMainWindow):
         self.is_playlist_playing = False # when playlist is playing
 
         # all song_id list for playing song....
-        self.all_song_list = self.dataBase.get_all_song_id()
+        self.all_song_list = []
+
+        # incremental scan of the music folders (only new/changed files are parsed)
+        self.scanner: ScanThread = None
+        # live updates after the first scan
+        self.watcher: WatchThread = None
+
+        # cleanup of unused covers / stale rows, only when the user is idle (never on startup)
+        self.gc: LibraryGC = None
+        self.gc_idle: IdleTimer = None
+        self.gc_interval = 24 * 3600 # sec between two runs
+
+        # set in closeEvent, db callbacks still arriving must not start threads
+        self.closing = False
+
+        # results come back in the same order
+        self.dataBase.read("get_all_song_id", callback=self._on_all_song_id)
+        self.dataBase.read("get_basic", callback=self.load_basic_settings)
+
+    def _on_all_song_id(self, all_song_id: list):
+        self.all_song_list = all_song_id
         self.context_queue = self.all_song_list.copy()
 
-        # load song.. if db is deleted
-        # song_dir = "C:\\Users\\admin\\Music"
-        # self.__init_song_dir(song_dir)
-        
-        QTimer.singleShot(10, self.load_basic_settings)
+    def scan_library(self, roots: list):
+        """Sync the DataBase with the library roots [(path, exclude globs)]"""
+        if self.closing:
+            return
+        if self.scanner is not None and self.scanner.isRunning():
+            return
+
+        self.scanner = ScanThread(roots, parent=self)
+        self.scanner.batchReady.connect(self._on_scan_batch)
+        self.scanner.hashesReady.connect(lambda hashes: self.dataBase.write("set_audio_hashes", hashes))
+        self.scanner.progress.connect(self._on_scan_progress)
+        self.scanner.scanFinished.connect(self._on_scan_finished)
+        self.scanner.start()
+
+    def _on_scan_batch(self, batch):
+        # scanner or watcher, it waits for the write before sending more batches
+        source = self.sender()
+        future = self.dataBase.write("apply_scan", batch, callback=self._on_scan_applied)
+        # done after the commit (or the error), on the db worker thread
+        future.add_done_callback(lambda _: source.batch_written())
+
+    def _on_scan_progress(self, done: int, total: int):
+        if done < total:
+            self.setWindowTitle(f"Aurix - Music Player  •  Importing {done}/{total}")
+        else:
+            self.setWindowTitle("Aurix - Music Player")
 
-    def __init_song_dir(self, path: str):
-        """Add new folder to DataBase"""
-        if not os.path.isdir(path):
-            print(f"FolderNotFound : {path}")
+    def _on_scan_finished(self, result):
+        print(f"[Scanner] {result}")
+        if self.closing:
             return
-        
-        basename = path
 
-        filename_list = list(os.listdir(path))
-        filename_list.reverse()
-        
-        for filename in filename_list:
-            file_path = os.path.join(basename, filename)
+        self.dataBase.read("get_duplicate_report", callback=self._on_duplicate_report)
+        # colours of the new covers
+        self.update_palettes()
+
+        if self.watcher is None:
+            self.watcher = WatchThread(self.scanner.roots, parent=self)
+            self.watcher.batchReady.connect(self._on_scan_batch)
+            self.watcher.progress.connect(self._on_scan_progress)
+            self.watcher.start()
 
-            if not is_mp3(file_path):
-                continue
+        if self.gc_idle is None:
+            self.gc_idle = IdleTimer(idle_sec=120, parent=self)
+            self.gc_idle.idle.connect(self._on_idle)
+            self.gc_idle.start()
 
-            # get metadata from song file
-            tags = get_mp3_tags(file_path)
+    def update_palettes(self):
+        if self.closing:
+            return
+        if self.palette_running:
+            self.palette_again = True
+            return
 
-            if tags["id"] == None:
-                # if song has to tags
-                print(f"InvalidSong : {file_path}")
-                continue
+        self.palette_running = True
+        self.dataBase.read("get_covers_without_palette", limit=self.palette_batch, callback=self._compute_palettes)
 
-            artist = ",".join(tags['artists']) # to store in database
+    def _compute_palettes(self, names: list):
+        if not names:
+            self._palettes_done(more=False)
+            return
 
-            meta = get_mp3_metadata(file_path)
+        # in the image pool, never on the ui thread
+        IMAGES.submit(compute_palettes, names, callback=self._on_palettes)
 
-            thumbnail_path = gen_thumbnail_path()
-            cover_path = extract_cover_save(file_path, thumbnail_path)
+    def _on_palettes(self, palettes: list | None):
+        if palettes:
+            self.dataBase.write("set_cover_palettes", palettes)
+            PALETTES.update({name: (dominant, accent) for name, dominant, accent in palettes if dominant >= 0})
 
+        # full batch -> more covers waiting
+        self._palettes_done(more=bool(palettes) and len(palettes) == self.palette_batch)
 
-            self.dataBase.add_song(
-                tags["title"], tags["subtitle"], artist, 
-                tags["id"], meta["duration"], 0, 0, 0, file_path, cover_path
-            )
+    def _palettes_done(self, more: bool):
+        self.palette_running = False
+        if more or self.palette_again:
+            self.palette_again = False
+            self.update_palettes()
+
+    def _on_idle(self):
+        if self.scanner is not None and self.scanner.isRunning():
+            return
+        if self.gc is not None and self.gc.isRunning():
+            return
+
+        self.dataBase.read("get_basic", "last_gc", callback=self._start_gc)
+
+    def _start_gc(self, last_gc: str | None):
+        if self.closing:
+            return
+        if last_gc and time.time() - float(last_gc) < self.gc_interval:
+            return
+
+        self.gc = LibraryGC(parent=self)
+        self.gc.pruneReady.connect(lambda stale: self.dataBase.write("prune_stale_rows", **stale))
+        self.gc.gcFinished.connect(self._on_gc_finished)
+        self.gc.start()
+
+    def _on_gc_finished(self, report: dict):
+        self.dataBase.write("add_basic", "last_gc", int(time.time()))
+        print(
+            f"[GC] Removed {report['deleted']}/{report['orphans']} unused covers "
+            f"({report['bytes'] / (1024 * 1024):.1f} MB reclaimed), "
+            f"{report['missing_covers']} missing covers, {report['stale_scan_rows']} stale scan rows"
+        )
+        if report["packed"] or report["compacted"]:
+            print(f"[GC] Cover pack : {report['packed']} covers added, {report['compacted'] / (1024 * 1024):.1f} MB compacted")
+
+    def _on_duplicate_report(self, report: list):
+        # same audio, different files -> only reported, nothing is deleted
+        for group in report:
+            keep_id, keep_path = group["keep"]
+            print(f"[Dedupe] {keep_path} (id={keep_id}) has copies :")
+            for song_id, path in group["redundant"]:
+                print(f"    {path} (id={song_id})")
+
+        if report:
+            redundant = sum(len(group["redundant"]) for group in report)
+            print(f"[Dedupe] Redundant audio files : {redundant}")
+
+    def _on_scan_applied(self, changes: dict):
+        for song in changes["added"]:
+            self.all_song_list.append(song["id"])
+            index = len(self.all_song_list) - 1
+            cover_path = os.path.join(COVER_DIR_PATH, song["cover_path"])
+            self.home_screen.add_item(index, song["id"], song["title"], song["subtitle"], song["path"], cover_path)
+
+        for song in changes["modified"]:
+            # tags / cover changed, same song id
+            cover_path = os.path.join(COVER_DIR_PATH, song["cover_path"])
+            self.home_screen.update_item(song["id"], song["title"], song["subtitle"], song["path"], cover_path)
+            if self._playlist_win is not None:
+                self._playlist_win.update_song_row(song["id"], song["title"], song["subtitle"], cover_path)
+
+        for song_id, path in changes["moved"]:
+            # renamed / moved file, the card plays the song by id but keeps the path (snapshot)
+            self.home_screen.update_item_path(song_id, path)
+
+        for song_id in changes["deleted"]:
+            self.home_screen.remove_song(song_id)
+            # open playlist (count/duration are updated by the db)
+            if self._playlist_win is not None:
+                self._playlist_win.remove_song_row(song_id)
+
+        if (changes["added"] or changes["modified"]) and not (self.scanner is not None and self.scanner.isRunning()):
+            # watcher batch (a full scan does it when it's finished)
+            self.update_palettes()
 
 
     def handle_playlist_menu_action(self, action: str, playlist_id: int, song_id: int, song_index: int):
         # remove song from playlist
-        self.dataBase.remove_playlist_song(playlist_id, song_id)
+        self.dataBase.write("remove_playlist_song", playlist_id, song_id)
 
         # get updated info and updated
-        info = self.dataBase.get_playlist(playlist_id=playlist_id)
+        self.dataBase.read(
+            "get_playlist", playlist_id=playlist_id,
+            callback=lambda info: self._on_playlist_song_removed(info, playlist_id, song_index)
+        )
+
+    def _on_playlist_song_removed(self, info, playlist_id: int, song_index: int):
         meta = f"Playlist • Private • 2025\n{info['count']} tracks • {format_duration(info['duration'])}"
         self.playlistPlayerWin.update_meta(meta)
 
@@ -223,31 +375,35 @@ class MusicMainWindow(QMainWindow):
         if song_index > 3:
             return
             
-        prev_cover_path = os.path.join(COVER_DIR_PATH, info['cover_path'])
-
         # create new one and save
-        cover_path = self.create_playlist_cover(playlist_id)
+        # (the old collage is removed by the library gc)
+        self.create_playlist_cover(
+            playlist_id, 
+            callback=lambda cover_path: self._on_playlist_cover_changed(playlist_id, cover_path)
+        )
+
+    def _on_playlist_cover_changed(self, playlist_id: int, cover_path: str):
         if cover_path:
             self.playlistPlayerWin.update_cover(cover_path)
 
         else:
             print(f"Error[0093] => Not bale to create playlist cover.. for : {playlist_id}")
 
-        # remove prev cover
-        try:
-            os.remove(prev_cover_path)
-        except:
-            pass
-
 
 
     def play_playlist_requested(self, playlist_id: int, play: bool):
         self.is_playlist_playing = True
 
         # change context_queue
-        self.context_queue = self.dataBase.get_playlist_song(playlist_id=playlist_id)
+        self.dataBase.read(
+            "get_playlist_song", playlist_id=playlist_id,
+            callback=lambda song_ids: self._on_playlist_queue(song_ids, play)
+        )
+
+    def _on_playlist_queue(self, song_ids: list, play: bool):
+        self.context_queue = song_ids
 
-        if play:
+        if play and self.context_queue:
             # play the first song from list
             self._play_requested(self.context_queue[0], 0)
 
@@ -273,26 +429,44 @@ class MusicMainWindow(QMainWindow):
             self.show_picker_menu(song_id=song_id)
 
         elif btn == "delete":
-            song_info = self.dataBase.get_song(song_id=song_id)
-            song_path = song_info["path"]
-            song_cover_path = song_info["cover_path"]
+            self.dataBase.read("get_song", song_id=song_id, callback=self._delete_song)
 
-            self.dataBase.delete_song(song_id)
-            self.home_screen.remove_song(song_id)
+    def _delete_song(self, song_info):
+        if song_info is None:
+            return
 
-            if self.current_song == song_id:
-                # need to stop the player
-                self.play_next_track()
+        song_id = song_info["id"]
+        song_path = song_info["path"]
+        song_cover_path = song_info["cover_path"]
 
-            try:
-                os.remove(os.path.join(COVER_DIR_PATH, song_cover_path))
-            except:
-                pass
-            try:
-                os.remove(song_path)
-            except:
-                pass
-            
+        self.dataBase.write("delete_song", song_id)
+        self.home_screen.remove_song(song_id)
+
+        if self.current_song == song_id:
+            # need to stop the player
+            self.play_next_track()
+
+        if song_cover_path:
+            # cover file can be shared with other songs, remove it with the last one
+            self.dataBase.read(
+                "get_cover_refs", song_cover_path,
+                callback=lambda refs: self._remove_cover_file(song_cover_path, refs)
+            )
+
+        try:
+            os.remove(song_path)
+        except:
+            pass
+
+
+    def _remove_cover_file(self, cover_path: str, refs: int):
+        if refs > 0:
+            return
+
+        try:
+            os.remove(os.path.join(COVER_DIR_PATH, cover_path))
+        except OSError as e:
+            print(f"Error[Cover] {cover_path} : {e}")
 
     def show_picker_menu(self, song_id: int):
         if self.picker_menu:
@@ -305,7 +479,12 @@ class MusicMainWindow(QMainWindow):
         )
 
         # fetch the list from db
-        playlists = self.dataBase.get_playlist()
+        self.dataBase.read("get_playlist", callback=self._fill_picker_menu)
+
+    def _fill_picker_menu(self, playlists: list):
+        if not self.picker_menu:
+            return
+
         for playlist in playlists:
             # init the playlist
             cover_path = playlist['cover_path']
@@ -323,25 +502,33 @@ class MusicMainWindow(QMainWindow):
     def on_playlist_selected(self, playlist_id: int, song_id: int):
         self.picker_menu.close()
         # add song to playlist in database
-        self.dataBase.add_playlist_song(playlist_id, song_id)
+        self.dataBase.write("add_playlist_song", playlist_id, song_id)
         self.create_playlist_cover(playlist_id) # create cover
 
-    def create_playlist_cover(self, playlist_id: int, cover_path: str = None):
+    def create_playlist_cover(self, playlist_id: int, cover_path: str = None, callback = None):
         # skip liked playlist.. 
         if playlist_id == 1:
             return
-        # song_id of top 4 songs
-        song_id_list =[str(song_id) for song_id in self.dataBase.get_playlist_song(playlist_id)[:4]]
 
-        if not cover_path:
-            # create cover for playlist
-            playlist = self.dataBase.get_playlist(playlist_id=playlist_id)
+        self.dataBase.read(
+            "get_playlist", playlist_id=playlist_id,
+            callback=lambda playlist: self.dataBase.read(
+                "get_playlist_song", playlist_id, detailed=True, limit=4,
+                callback=lambda songs: self._create_playlist_cover(playlist, songs, cover_path, callback)
+            )
+        )
+
+    def _create_playlist_cover(self, playlist, songs: list, cover_path: str = None, callback = None):
+        playlist_id = playlist["id"]
 
-            # expected playlist cover
+        if not cover_path:
+            # expected playlist cover (named after the top 4 songs)
             # it gonna change if a song is deleted or song position is changed....
-            excepted_cover_path = "playlist_" + "".join(song_id_list) + ".jpg"
+            excepted_cover_path = collage_name([song["id"] for song in songs])
 
             if playlist['cover_path'] == excepted_cover_path:
+                if callback:
+                    callback(None)
                 return # cover already exists acc. to the current song in playlist
             
             # absolute path
@@ -351,21 +538,24 @@ class MusicMainWindow(QMainWindow):
             
         # get the cover image of the top 4 songs
         song_cover_list = []
-        for song_id in song_id_list:
-            song_cover_path = self.dataBase.get_song(song_id= int(song_id))["cover_path"]
-            if song_cover_path:
-                song_cover_list.append(os.path.join(COVER_DIR_PATH, song_cover_path))
-
-        # create a new cover
-        playlist_cover_path = create_playlist_cover(song_cover_list, excepted_cover_path, size=712)
-        if not playlist_cover_path:
-            return
-        
-        if not cover_path:
+        for song in songs:
+            if song["cover_path"]:
+                song_cover_list.append(os.path.join(COVER_DIR_PATH, song["cover_path"]))
+
+        # create a new cover (in the background, skipped if it exists)
+        self.collages.request(
+            song_cover_list, excepted_cover_path,
+            callback=lambda path: self._on_playlist_cover_created(playlist_id, path, cover_path, callback)
+        )
+
+    def _on_playlist_cover_created(self, playlist_id: int, playlist_cover_path: str, cover_path: str = None, callback = None):
+        if playlist_cover_path and not cover_path:
             # update playlist cover in db
             cover_base_path = os.path.basename(playlist_cover_path)
-            self.dataBase.update_playlist(playlist_id=playlist_id, cover_path = cover_base_path)
-            return playlist_cover_path
+            self.dataBase.write("update_playlist", playlist_id=playlist_id, cover_path = cover_base_path)
+
+        if callback:
+            callback(playlist_cover_path)
 
     def on_new_playlist(self):
         print("[TEST] New playlist requested")
@@ -374,10 +564,23 @@ class MusicMainWindow(QMainWindow):
         if type == "finished":
             # song is finished...
             # increasing play count.. in db
-            self.dataBase.increament_play_count(song_id=song_id)
+            self.dataBase.write("increament_play_count", song_id=song_id)
+
+    def commit_play_event(self, song_id: int, started_at: int, listened_ms: int, skipped: bool):
+        # batched by the db worker
+        self.dataBase.write(
+            "add_play_event", song_id=song_id, started_at=started_at,
+            listened_ms=listened_ms, skipped=skipped
+        )
+
+    def commit_stream_info(self, song_id: int, info: dict):
+        self.dataBase.write("update_song", song_id, **info)
 
     def open_playlist(self, playlist_id: int):
-        info = self.dataBase.get_playlist(playlist_id=playlist_id)
+        self.dataBase.read("get_playlist", playlist_id=playlist_id, callback=self._open_playlist)
+
+    def _open_playlist(self, info):
+        playlist_id = info['id']
         meta = f"Playlist • Private • 2025\n{info['count']} tracks • {format_duration(info['duration'])}"
 
         if playlist_id == 1:
@@ -386,32 +589,41 @@ class MusicMainWindow(QMainWindow):
         else:
             cover_path = os.path.join(COVER_DIR_PATH, info['cover_path'])
 
-        if not os.path.isfile(cover_path):
-            self.create_playlist_cover(playlist_id=playlist_id, cover_path=cover_path) 
-
         self.playlistPlayerWin.init_playlist(playlist_id, info['title'], info['subtitle'], meta, cover_path)
+
+        if not cover_exists(cover_path):
+            self.create_playlist_cover(
+                playlist_id=playlist_id, cover_path=cover_path, 
+                callback=lambda path: path and self.playlistPlayerWin.update_cover(path)
+            )
+
         # add songs in the playlist UI
-        song_list = self.dataBase.get_playlist_song(playlist_id, detailed=True)
-        self.playlistPlayerWin.add_in_batch(song_list, playlist_id)
+        self.load_playlist_page(playlist_id)
+
+    def load_playlist_page(self, playlist_id: int, after_position: int = None, song_index: int = -1):
+        self.dataBase.read(
+            "get_playlist_song_page", playlist_id, after_position=after_position, 
+            limit=self.playlistPlayerWin.batch_size,
+            callback=lambda song_list: self.playlistPlayerWin.add_in_batch(song_list, playlist_id, song_index)
+        )
 
     def save_playlist(self, title: str, desc: str, privacy: str):
-        playlist_id = self.dataBase.add_playlist(
+        self.dataBase.write(
+            "add_playlist",
             title=title,
             subtitle=desc,
             author= "Aditya Mukhiya",
             count=0,
             duration=0,
             plays = 0,
-            cover_path=""
+            cover_path="",
+            callback=lambda playlist_id: self._on_playlist_saved(playlist_id, title, desc)
         )
 
+    def _on_playlist_saved(self, playlist_id: int, title: str, desc: str):
         if playlist_id is None:
             # playlist is not create
             # maybe it already exists..
-            playlist_id = self.dataBase.get_playlist_id_by_title(title=title)
-            if playlist_id is None: # not found
-                return
-                
             # found... then open that playlist.....
             # logic will be added later
             return
@@ -420,14 +632,14 @@ class MusicMainWindow(QMainWindow):
         self.sidebar.create_playlist(playlist_id, title, desc)
 
     def save_like_dislike_song(self, song_id: int, value: int):
-        self.dataBase.update_song(song_id, liked = value)
+        self.dataBase.write("update_song", song_id, liked = value)
         if value == 1:
             # add into liked playlist
             # liked_playlist id = 1
-            self.dataBase.add_playlist_song(1, song_id)
+            self.dataBase.write("add_playlist_song", 1, song_id)
         else:
             # remove song from liked playlist
-            self.dataBase.remove_playlist_song(1, song_id)
+            self.dataBase.write("remove_playlist_song", 1, song_id)
     
         if value == 2:
             # this means user dislike the song.. 
@@ -435,7 +647,12 @@ class MusicMainWindow(QMainWindow):
             self.play_next_track(song_id=song_id)
 
     def check_for_song_existance(self, item_id: int, vid: str):
-        song_id = self.dataBase.get_songid_by_vid(vid)
+        self.dataBase.read(
+            "get_songid_by_vid", vid, 
+            callback=lambda song_id: self._on_song_existance(item_id, song_id)
+        )
+
+    def _on_song_existance(self, item_id: int, song_id: int):
         if song_id is None:
             return
         
@@ -479,6 +696,20 @@ class MusicMainWindow(QMainWindow):
 
         self.loader.deleteLater()
 
+        # every card is on the screen and in sync with the db
+        tracing.instant("interactive")
+        if self.trace_path:
+            tracing.dump(self.trace_path)
+            if self.trace_exit:
+                QTimer.singleShot(0, self.close)
+
+    def paintEvent(self, event):
+        super().paintEvent(event)
+        if not self._first_paint:
+            self._first_paint = True
+            tracing.instant("first_paint")
+            self._start_snapshot_chunks()
+
 
     def add_song_to_db_and_home(
             self, title: str, subtitle: str, artist: str, 
@@ -486,9 +717,17 @@ class MusicMainWindow(QMainWindow):
             track_id: int = None
     ):
         # add song to database
-        self.dataBase.add_song(title, subtitle, artist, vid, duration, 0, 0, 0, path, cover_path)
+        # only the filename of the cover is saved (same as the scanned songs)
+        self.dataBase.write("add_song", title, subtitle, artist, vid, duration, 0, 0, 0, path, os.path.basename(cover_path))
         # get song_id
-        song_id = self.dataBase.get_song_id(path=path)
+        self.dataBase.read(
+            "get_song_id", path=path,
+            callback=lambda song_id: self._on_song_added(song_id, title, subtitle, path, cover_path, track_id)
+        )
+
+    def _on_song_added(self, song_id: int, title: str, subtitle: str, path: str, cover_path: str, track_id: int = None):
+        if song_id is None:
+            return
 
         # add this to all_song_list at 0
         self.all_song_list.append(song_id)
@@ -501,9 +740,11 @@ class MusicMainWindow(QMainWindow):
 
         self.home_screen.add_item(index, song_id, title, subtitle, path, cover_path, play=True)
         self.play_song(song_id=song_id) # play song
+        # colours of the downloaded cover
+        self.update_palettes()
 
-    def load_basic_settings(self):
-        basic_info = self.dataBase.get_basic()
+    @tracing.traced()
+    def load_basic_settings(self, basic_info: dict):
         self.is_setting = True
         prev_song_id = None
 
@@ -525,7 +766,7 @@ class MusicMainWindow(QMainWindow):
                     prev_song_id = None
 
         # loading the last played song
-        if prev_song_id is not None:
+        if prev_song_id is not None and self.all_song_list:
             # get the song index 
             self.current_song = prev_song_id
             try:
@@ -534,18 +775,94 @@ class MusicMainWindow(QMainWindow):
                 self.current_index = 0
                 self.current_song = self.all_song_list[0]
 
-            song_info = self.dataBase.get_song(song_id=self.current_song)
-            QTimer.singleShot(10, lambda info = song_info: self.playerEngine.init_play(info))
+            self.dataBase.read("get_song", song_id=self.current_song, callback=self._init_prev_song)
 
         self.is_setting = False
 
         # load playlist. on sidebar...
-        playlists = self.dataBase.get_playlist()
-        for playlist in playlists:
-            self.sidebar.create_playlist(playlist['id'], playlist['title'], playlist['subtitle'])
+        self.dataBase.read("get_playlist", callback=self._load_sidebar_playlists)
 
         # loading data.......
-        self.loader.run()
+        self.run_loader()
+        self.dataBase.read("get_library_roots", callback=self.scan_library)
+
+    @tracing.traced()
+    def paint_snapshot(self):
+        # only the cards of the first screen before the first frame,
+        # the rest in short chunks from the event loop
+        songs = self.snapshot.songs
+        first = min(self.snapshot_first, len(songs))
+
+        for index in range(first):
+            self._add_snapshot_card(index)
+        print(f"[Snapshot] Painted {first}/{len(songs)} songs")
+
+        # started by the first paintEvent, or after a while if the window is not painted (minimized)
+        self.snapshot_painting = True
+        self.snapshot_next = first
+        QTimer.singleShot(500, self._start_snapshot_chunks)
+
+    def _start_snapshot_chunks(self):
+        if self.snapshot_next is None:
+            return
+
+        start, self.snapshot_next = self.snapshot_next, None
+        QTimer.singleShot(0, lambda: self._paint_snapshot_chunk(start))
+
+    def _add_snapshot_card(self, index: int):
+        song_id, title, subtitle, path, cover_path = self.snapshot.songs[index]
+        # None after the atlas thumbnails -> cover from the cache
+        thumb = self.snapshot.thumb(index)
+        self.home_screen.add_item(index, song_id, title, subtitle, path, cover_path, thumb=thumb)
+
+    def _paint_snapshot_chunk(self, start: int, budget: float = 0.016):
+        # as many cards as fit in `budget` sec, input and painting run between two chunks
+        songs = self.snapshot.songs
+        deadline = time.perf_counter() + budget
+        index = start
+        while index < len(songs):
+            self._add_snapshot_card(index)
+            index += 1
+            if time.perf_counter() >= deadline:
+                break
+
+        if index < len(songs):
+            QTimer.singleShot(0, lambda: self._paint_snapshot_chunk(index))
+            return
+
+        # thumbnails are copied, the atlas is not needed anymore
+        self.snapshot.close()
+        self.snapshot_painting = False
+        self.loader.release()
+
+    def run_loader(self):
+        # with a snapshot only the differences with the db are applied,
+        # the first page is read now (ahead of the scan) and held until the snapshot cards are built
+        self.loader.run(known=self.snapshot.known_songs() if self.snapshot else None, hold=self.snapshot_painting)
+
+    def save_snapshot(self):
+        if self.snapshot is not None:
+            # atlas can still be mapped (closed while the cards were built)
+            self.snapshot.close()
+        cards = self.home_screen.cards()
+        songs = [(card.song_id, card.title_text, card.subtitle_text, card.mp3_path, card.cover_path) for card in cards]
+        # a card still on its placeholder ends the atlas
+        pixmaps = [card.thumb_label.pixmap() if card.has_thumb else None for card in cards[:self.snapshot_thumbs]]
+        thumb_size = (cards[0].thumb_width, cards[0].thumb_height) if cards else (0, 0)
+
+        write_snapshot(songs, pixmaps, thumb_size)
+
+    def _init_prev_song(self, song_info):
+        if song_info is None:
+            return
+
+        self.is_setting = True
+        self.playerEngine.init_play(song_info)
+        self.is_setting = False
+
+    def _load_sidebar_playlists(self, playlists: list):
+        for playlist in playlists:
+            self.sidebar.create_playlist(playlist['id'], playlist['title'], playlist['subtitle'])
 
 
     def set_shuffle(self, value: bool):
@@ -554,32 +871,37 @@ class MusicMainWindow(QMainWindow):
 
         if not self.is_setting:
             value = 1 if value else 0
-            self.dataBase.add_basic(key="suffle", value=value)
+            self.dataBase.write("add_basic", key="suffle", value=value)
 
     def set_repeat_mode(self, value: int):
         self.bottom_bar.set_repeat_mode(value)
         if not self.is_setting:
-            self.dataBase.add_basic(key="repeat", value=value)
+            self.dataBase.write("add_basic", key="repeat", value=value)
 
 
     def broadcast_msg(self, type: str, song_id: int, value: bool):
         # print(f"Boradcast[main] => {type} | {item_id} | {value}")
+        # screens that are not built yet have nothing to update
         if self.is_playlist_playing:
             # only to plylist window....
-            self.playlistPlayerWin.set_broadcast(type, song_id, value)
+            if self._playlist_win is not None:
+                self._playlist_win.set_broadcast(type, song_id, value)
 
         else:
-            self.yt_screen.set_broadcast(type, song_id, value)
+            if self._yt_screen is not None:
+                self._yt_screen.set_broadcast(type, song_id, value)
             self.home_screen.set_broadcast(type, song_id, value)
 
         if type == "active" and value == True and not self.is_setting:
             # saving the current playing song path
             # if type is active and value is True -> means it's playing broadcast
             # is not self.is_setting -> means it's not called at the time of loading settings
-            self.dataBase.add_basic("current_song", song_id)
+            self.dataBase.write("add_basic", "current_song", song_id)
 
     def play_song(self, song_id: int):
-        song_info = self.dataBase.get_song(song_id=song_id)
+        self.dataBase.read("get_song", song_id=song_id, callback=self._play_song_info)
+
+    def _play_song_info(self, song_info):
         if song_info is None:
             return
             
@@ -605,42 +927,190 @@ class MusicMainWindow(QMainWindow):
 
 
     def search_call(self, query: str):
+        self.top_bar.search_box.hide_suggestions()
         self.yt_screen.search_call(query)
 
+    def local_search(self, query: str):
+        query = query.strip()
+        if not query:
+            self.top_bar.search_box.hide_suggestions()
+            return
+
+        self.dataBase.read(
+            "search_songs", query, 
+            callback=lambda songs: self._show_local_suggestions(songs, query)
+        )
+
+    def _show_local_suggestions(self, songs: list, query: str):
+        if query != self.top_bar.search_box.input.text().strip():
+            # user already typed more.. old result
+            return
+
+        suggestions = []
+        for song in songs:
+            suggestions.append({
+                "id": song["id"],
+                "title": song["title"],
+                "subtitle": song["subtitle"],
+                "thumbnail": os.path.join(COVER_DIR_PATH, song["cover_path"]) if song["cover_path"] else "",
+            })
+
+        self.top_bar.search_box.set_suggestions(suggestions, query)
+
+    def _play_requested_from_search(self, info: dict):
+        self.top_bar.search_box.hide_suggestions()
+        self.is_playlist_playing = False
+        self.context_queue = self.all_song_list.copy()
+
+        song_index = None
+        if info["id"] in self.all_song_list:
+            song_index = self.all_song_list.index(info["id"])
+
+        self._play_requested(info["id"], song_index)
+
     # call this fun when nav button clicked...
     def _nav_call(self, name: str):
+        # screens are built here the first time (properties)
         if name == "home":
-            self.content_area.setCurrentIndex(0)
+            self.content_area.setCurrentWidget(self.home_screen)
             self.context_queue = self.all_song_list.copy()
 
         elif name == "library":
-            self.content_area.setCurrentIndex(1)
+            self.content_area.setCurrentWidget(self.library_screen)
 
         elif name == "yt":
-            self.content_area.setCurrentIndex(2)
+            self.content_area.setCurrentWidget(self.yt_screen)
 
         elif name == "playlist":
-            self.content_area.setCurrentIndex(3)
+            self.content_area.setCurrentWidget(self.playlistPlayerWin)
+
+    @property
+    def library_screen(self) -> ContentArea:
+        if self._library_screen is None:
+            self._library_screen = ContentArea()
+            self.content_area.addWidget(self._library_screen)
+
+        return self._library_screen
+
+    @property
+    def yt_screen(self):
+        if self._yt_screen is None:
+            # yt_music -> tube -> yt_dlp, not imported before the screen is needed
+            from yt_music import YtScreen
+
+            self._yt_screen = YtScreen(parent=self)
+            # call when yt want to all item to home screen and play
+            self._yt_screen.playRequested.connect(self._play_requested_from_explorer)
+            self._yt_screen.addSongToDBandHome.connect(self.add_song_to_db_and_home)
+            self._yt_screen.checkForExistance.connect(self.check_for_song_existance)
+            self._yt_screen.playToggleRequested.connect(self.playerEngine.play_toggled)
+            self.content_area.addWidget(self._yt_screen)
+
+        return self._yt_screen
+
+    @property
+    def playlistPlayerWin(self) -> PlaylistPlayerWindow:
+        if self._playlist_win is None:
+            self._playlist_win = PlaylistPlayerWindow(parent=self)
+            self._playlist_win.playRequested.connect(self._play_requested_from_playlist_win)
+            self._playlist_win.playPlaylistRequested.connect(self.play_playlist_requested)
+            self._playlist_win.playToggleRequested.connect(self.playerEngine.play_toggled)
+            self._playlist_win.navbarPlaylistBroadcast.connect(self.sidebar.set_navbar_playlist_status)
+            self._playlist_win.menuActionCall.connect(self.handle_playlist_menu_action)
+            self._playlist_win.requestSongPage.connect(self.load_playlist_page)
+            self.content_area.addWidget(self._playlist_win)
+
+        return self._playlist_win
 
     def nativeEvent(self, eventType, message):
         return self.media_keys.nativeEvent(eventType, message)
     
     def closeEvent(self, event):
+        self.closing = True
         self.media_keys.unregister()
+        self.save_snapshot()
+        # current listen is a skip
+        self.playerEngine.flush_play_event()
+        # an import can be running, its batches need the db worker
+        if self.scanner is not None:
+            self.scanner.stop()
+        if self.watcher is not None:
+            self.watcher.stop()
+        if self.gc is not None:
+            self.gc.stop()
+        if self.gc_idle is not None:
+            self.gc_idle.stop()
+        if IMAGES.is_loaded:
+            # queued decodes are dropped, running ones finish (they post to the loader)
+            IMAGES.pool.clear()
+            IMAGES.wait()
+        # flush pending writes
+        self.dataBase.stop()
         super().closeEvent(event)
 
 
+def parse_trace_args(argv: list) -> tuple:
+    """
+    --trace-startup [path] -> chrome trace of the startup (default startup_trace.json)
+    --trace-exit           -> close the app once the trace is written (CI, with QT_QPA_PLATFORM=offscreen)
+    -> (trace path or None, exit, argv without these args)
+    """
+    trace_path = None
+    trace_exit = False
+    rest = []
+
+    args = iter(argv)
+    for arg in args:
+        if arg == "--trace-startup":
+            trace_path = "startup_trace.json"
+            # optional path after the flag
+            next_arg = next(args, None)
+            if next_arg is not None and not next_arg.startswith("-"):
+                trace_path = next_arg
+            elif next_arg is not None:
+                rest.append(next_arg)
+
+        elif arg.startswith("--trace-startup="):
+            trace_path = arg.split("=", 1)[1]
+
+        elif arg == "--trace-exit":
+            trace_exit = True
+
+        else:
+            rest.append(arg)
+
+    return trace_path, trace_exit, rest
+
+
 if __name__ == "__main__":
+    # importer uses a process pool (needed for the frozen exe)
+    multiprocessing.freeze_support()
+
+    trace_path, trace_exit, argv = parse_trace_args(sys.argv)
+    if trace_path:
+        # before the cwd changes below
+        trace_path = os.path.abspath(trace_path)
+        tracing.enable()
+        tracing.set_thread_name("main")
+
     # use to create shortcut...../..........
     project_path = sys.argv[0] if len(sys.argv) > 0 else None
     if project_path:
-        project_dir = os.path.dirname(project_path)
+        # "python main.py" -> dirname is ""
+        project_dir = os.path.dirname(os.path.abspath(project_path))
         print(f"Changing Working Directory : {project_dir}")
         os.chdir(project_dir)
 
 
-    app = QApplication(sys.argv)
-    win = MusicMainWindow()
-    win.show()
+    with tracing.span("QApplication"):
+        app = QApplication(argv)
+
+    with tracing.span("MusicMainWindow()"):
+        win = MusicMainWindow()
+        win.trace_path = trace_path
+        win.trace_exit = trace_exit
+
+    with tracing.span("show"):
+        win.show()
     dark_title_bar(win) # make Windows title_bar dark
     sys.exit(app.exec())
@@ -3,7 +3,7 @@ from PyQt5.QtCore import Qt, QPoint, pyqtSignal, QSize
 from PyQt5.QtGui import QColor, QFont, QCursor, QIcon
 from PyQt5.QtWidgets import QWidget
 from PyQt5.QtWidgets import QWidget, QLabel, QHBoxLayout, QScrollArea, QFrame, QPushButton
-from helper import round_pix_form_path
+from cover_cache import set_cover
 from util import resource_path
 
 
@@ -162,7 +162,7 @@ class PlaylistItemWidget(QWidget):
         cover_lbl.setStyleSheet("background: #444; border-radius: 6px;")
 
         if cover_path:
-            cover_lbl.setPixmap(round_pix_form_path(cover_path, 56, 56, 6))
+            set_cover(cover_lbl, cover_path, 56, 56, 6)
 
         # Text
         text_layout = QVBoxLayout()
@@ -0,0 +1,127 @@
+import os
+import hashlib
+from lazy import lazy_import
+
+# Used by the importer's pool processes too, keep the imports light.
+# (mutagen is imported by the first read_track, not at app start)
+mutagen_mp3 = lazy_import("mutagen.mp3")
+
+
+def _text(tags, key: str):
+    frame = tags.get(key)
+    if frame and frame.text:
+        return str(frame.text[0])
+    return None
+
+
+def read_track(path: str, with_cover: bool = True) -> dict | None:
+    """
+    Everything the app needs from a music file, with one open and one parse.
+
+    -> {
+        title, subtitle, artists (list), album, publisher, vid,
+        duration (sec), sample_rate, channels, bitrate,
+        cover_data (bytes or None, only if `with_cover`), has_cover
+    }
+    None if the file can't be parsed.
+    """
+    try:
+        audio = mutagen_mp3.MP3(path)
+    except Exception as e:
+        print(f"Error[Metadata] {path} : {e}")
+        return
+
+    info = audio.info
+    track = {
+        "title": None,
+        "subtitle": None,
+        "artists": [],
+        "album": None,
+        "publisher": None,
+        "vid": None,
+        "duration": int(info.length),
+        "sample_rate": info.sample_rate,
+        "channels": info.channels,
+        "bitrate": info.bitrate,
+        "cover_data": None,
+        "has_cover": False,
+    }
+
+    tags = audio.tags
+    if tags is None:
+        return track
+
+    track["title"] = _text(tags, "TIT2")
+    track["subtitle"] = _text(tags, "TIT3")
+    track["album"] = _text(tags, "TALB")
+    track["publisher"] = _text(tags, "TPUB")
+
+    artists = tags.get("TPE1")
+    if artists:
+        track["artists"] = list(artists.text)
+
+    for frame in tags.getall("TXXX"):
+        if frame.desc == "YT_ID":
+            track["vid"] = frame.text[0]
+            break
+
+    covers = tags.getall("APIC")
+    if covers:
+        track["has_cover"] = True
+        if with_cover:
+            track["cover_data"] = covers[0].data
+
+    return track
+
+
+def _syncsafe(data: bytes) -> int:
+    return (data[0] << 21) | (data[1] << 14) | (data[2] << 7) | data[3]
+
+
+def audio_hash(path: str, chunk_size: int = 1024 * 1024) -> str | None:
+    """
+    Hash of the audio data only, the ID3v2 tags at the start and the ID3v1 / APEv2
+    tags at the end are skipped -> same recording with other tags, same hash.
+    None if the file can't be read.
+    """
+    try:
+        with open(path, "rb") as f:
+            start = 0
+            header = f.read(10)
+            # a file can have more than one ID3v2 tag
+            while len(header) == 10 and header[:3] == b"ID3":
+                footer = 10 if header[5] & 0x10 else 0
+                start += 10 + _syncsafe(header[6:10]) + footer
+                f.seek(start)
+                header = f.read(10)
+
+            end = os.fstat(f.fileno()).st_size
+            if end - start >= 128:
+                f.seek(end - 128)
+                if f.read(3) == b"TAG":
+                    end -= 128
+
+            if end - start >= 32:
+                f.seek(end - 32)
+                ape_footer = f.read(32)
+                if ape_footer[:8] == b"APETAGEX":
+                    # size includes the footer, not the header (flag bit 31 -> there is one)
+                    flags = int.from_bytes(ape_footer[20:24], "little")
+                    header_size = 32 if flags & (1 << 31) else 0
+                    end -= int.from_bytes(ape_footer[12:16], "little") + header_size
+
+            digest = hashlib.blake2b(digest_size=16)
+            f.seek(start)
+            remaining = max(0, end - start)
+            while remaining:
+                data = f.read(min(chunk_size, remaining))
+                if not data:
+                    break
+                digest.update(data)
+                remaining -= len(data)
+
+    except OSError as e:
+        print(f"Error[Metadata] {path} : {e}")
+        return
+
+    return digest.hexdigest()
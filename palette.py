@@ -0,0 +1,147 @@
+import os
+from typing import List
+from PyQt5.QtGui import QImage, QColor
+from cover_cache import COVERS
+from cover_store import read_cover
+from image_loader import decode_image
+from lazy import lazy_import
+from util import COVER_DIR_PATH, backdrop_name
+
+np = lazy_import("numpy")
+
+# Colours and a blurred backdrop of every cover, computed once in the background
+# (main.py -> update_palettes, after a scan) so theming from the artwork never
+# touches the pixels while painting.
+#
+#   colours  -> covers.dominant / covers.accent in the db (0xRRGGBB), PALETTES in memory
+#   backdrop -> "<cover>@backdrop.jpg" next to the cover (kept / removed with it by the gc)
+SAMPLE_SIZE = 64
+BACKDROP_SIZE = 48
+BLUR_RADIUS = 4
+
+# cover name -> (dominant, accent), filled from the db and by update_palettes
+PALETTES = {}
+
+
+def _pixels(image: QImage):
+    # -> (h, w, 3) uint8 RGB view of the image
+    image = image.convertToFormat(QImage.Format_RGB32)
+    ptr = image.constBits()
+    ptr.setsize(image.sizeInBytes())
+    # rows can be padded, BGRA in memory (little endian)
+    data = np.frombuffer(ptr, np.uint8).reshape(image.height(), image.bytesPerLine() // 4, 4)
+    return data[:, :image.width(), 2::-1].copy()
+
+
+def _to_int(rgb) -> int:
+    r, g, b = (int(round(c)) for c in rgb)
+    return (r << 16) | (g << 8) | b
+
+
+def dominant_accent(rgb) -> tuple:
+    """
+    rgb -> (h, w, 3) uint8
+    Pixels are put in 4096 bins (4 bits per channel), dominant -> mean of the biggest bin,
+    accent -> most common saturated colour far enough from the dominant one.
+    """
+    rgb = rgb.reshape(-1, 3).astype(np.int32)
+    bins = ((rgb[:, 0] >> 4) << 8) | ((rgb[:, 1] >> 4) << 4) | (rgb[:, 2] >> 4)
+
+    counts = np.bincount(bins, minlength=4096)
+    used = np.nonzero(counts)[0]
+    counts = counts[used]
+    means = np.stack(
+        [np.bincount(bins, weights=rgb[:, c], minlength=4096)[used] for c in range(3)], axis=1
+    ) / counts[:, None]
+
+    dominant = means[np.argmax(counts)]
+
+    high = means.max(axis=1)
+    low = means.min(axis=1)
+    saturation = (high - low) / np.maximum(high, 1)
+    distance = np.linalg.norm(means - dominant, axis=1)
+
+    score = counts * saturation ** 2 * (high > 64) * (distance > 60)
+    if score.max() > 0:
+        accent = means[np.argmax(score)]
+    else:
+        # flat cover, lighter dominant
+        accent = dominant + (255 - dominant) * 0.5
+
+    return _to_int(dominant), _to_int(accent)
+
+
+def _box_blur(rgb, radius: int):
+    # separable box blur with cumulative sums (edges repeated), 3 passes ~ gaussian
+    out = rgb.astype(np.float32)
+    size = 2 * radius + 1
+    for _ in range(3):
+        for axis in (0, 1):
+            pad = [(0, 0)] * 3
+            pad[axis] = (radius + 1, radius)
+            summed = np.cumsum(np.pad(out, pad, mode="edge"), axis=axis)
+            out = (np.take(summed, range(size, summed.shape[axis]), axis=axis)
+                   - np.take(summed, range(0, summed.shape[axis] - size), axis=axis)) / size
+    return out
+
+
+def _blurred_image(rgb) -> QImage:
+    blurred = _box_blur(rgb, BLUR_RADIUS)
+    data = np.ascontiguousarray(np.clip(blurred, 0, 255).astype(np.uint8))
+    height, width = data.shape[:2]
+    # copy() -> the image owns its pixels (`data` is freed)
+    return QImage(data.data, width, height, width * 3, QImage.Format_RGB888).copy()
+
+
+def compute_palette(path: str) -> tuple | None:
+    """ cover file -> (dominant, accent, backdrop QImage), any thread """
+    data = read_cover(path)
+    if data is None:
+        return
+
+    image = decode_image(data, SAMPLE_SIZE, SAMPLE_SIZE)
+    if image.isNull():
+        return
+
+    dominant, accent = dominant_accent(_pixels(image))
+    small = image.scaled(BACKDROP_SIZE, BACKDROP_SIZE)
+    return dominant, accent, _blurred_image(_pixels(small))
+
+
+def compute_palettes(names: List[str]) -> List[tuple]:
+    """
+    Batch job of the image pool -> [(cover name, dominant, accent)]
+    The backdrops are saved next to the covers. Covers that can't be read get -1, -1
+    (not computed again).
+    """
+    palettes = []
+    for name in names:
+        try:
+            result = compute_palette(os.path.join(COVER_DIR_PATH, name))
+        except Exception as e:
+            print(f"Error[Palette] {name} : {e}")
+            result = None
+
+        if result is None:
+            palettes.append((name, -1, -1))
+            continue
+
+        dominant, accent, backdrop = result
+        COVERS.save_variant(backdrop, os.path.join(COVER_DIR_PATH, backdrop_name(name)))
+        palettes.append((name, dominant, accent))
+
+    return palettes
+
+
+def palette_for(cover_path: str) -> tuple | None:
+    """ (dominant, accent) QColors of a cover, None if not computed yet """
+    colours = PALETTES.get(os.path.basename(cover_path or ""))
+    if colours is None:
+        return
+    return QColor(colours[0]), QColor(colours[1])
+
+
+def load_backdrop(cover_path: str) -> QImage:
+    """ Blurred BACKDROP_SIZE image of a cover (null if not computed yet), scale it to the widget """
+    data = read_cover(os.path.join(COVER_DIR_PATH, backdrop_name(os.path.basename(cover_path or ""))))
+    return decode_image(data) if data is not None else QImage()
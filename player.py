@@ -1,7 +1,9 @@
 import os
+import time
 from PyQt5.QtCore import QTimer, pyqtSignal, QObject
 from PyQt5.QtGui import QPixmap
-from helper import get_mp3_metadata
+from metadata import read_track
+import tracing
 from util import is_mp3, MUSIC_DIR_PATH, COVER_DIR_PATH
 
 MIXER = None #
@@ -45,6 +47,8 @@ class PlayerEngine(QObject):
     askForNext = pyqtSignal(int)
     askForPreviuos = pyqtSignal(int)
     infoPlayingStatus = pyqtSignal(int, str)
+    infoPlayEvent = pyqtSignal(int, int, int, bool) # song_id, started_at, listened_ms, skipped
+    infoStreamInfo = pyqtSignal(int, dict) # song_id, {sample_rate, channels, bitrate, duration} -> to save in db
 
     def __init__(self, parent = None):
         super().__init__(parent)
@@ -62,6 +66,10 @@ class PlayerEngine(QObject):
         self._repeat_mode = 0 # 0=off,1=all,2=one
         self._is_skip = False # check if song skipped.. to emit finished status
 
+        # current listen.. for the play history
+        self._started_at: int = None
+        self._listened_ms = 0
+
         # time
         self._timer = QTimer(self)
         self._timer.setInterval(100)   # ~60 FPS (16 ms)
@@ -69,6 +77,7 @@ class PlayerEngine(QObject):
         self.elapsed_sec = 0
         self.duration = 0
 
+    @tracing.traced("mixer init")
     def init(self):
         global MIXER
         if MIXER is not None:
@@ -114,10 +123,27 @@ class PlayerEngine(QObject):
 
         # stop prevoius timer..
         self._timer.stop()
-        meta = get_mp3_metadata(path)
-        channels = meta["channels"]
-        freq = meta["sample_rate"]
-        duration = meta["duration"]
+
+        channels = song_info["channels"]
+        freq = song_info["sample_rate"]
+        duration = song_info["duration"]
+
+        if not channels or not freq or not duration:
+            # not in the db yet.. parse once and save it
+            track = read_track(path, with_cover=False)
+            if track is None:
+                raise ValueError(f"Can't read the file.\nPath : {path}")
+
+            channels = track["channels"]
+            freq = track["sample_rate"]
+            duration = track["duration"]
+
+            self.infoStreamInfo.emit(song_info["id"], {
+                "sample_rate": freq,
+                "channels": channels,
+                "bitrate": track["bitrate"],
+                "duration": duration,
+            })
 
         title = song_info["title"] 
         subtitle = song_info["subtitle"]
@@ -131,6 +157,9 @@ class PlayerEngine(QObject):
 
         self._init_mixer(freq=freq, channels=channels, out_dev=out_dev)
 
+        # previous song changed before it's end -> skipped
+        self.flush_play_event()
+
         # load music
         prev_song_id = self.song_id # to broadcast de-active status
         self.song_id = self.song_info['id'] # current song id
@@ -145,6 +174,9 @@ class PlayerEngine(QObject):
         MIXER.music.play()
         self.elapsed_sec = 0
         self._timer.start()
+
+        self._started_at = int(time.time())
+        self._listened_ms = 0
         
         self._is_paused = False
         self._is_skip = False
@@ -240,6 +272,17 @@ class PlayerEngine(QObject):
         self.broadcastMsg.emit("playing", self.song_id, self.is_playing())
 
 
+    def flush_play_event(self, skipped: bool = True):
+        # emit the current listen, if any
+        if self._started_at is None or not self.song_id:
+            return
+
+        if self._listened_ms > 0:
+            self.infoPlayEvent.emit(self.song_id, self._started_at, self._listened_ms, skipped)
+
+        self._started_at = None
+        self._listened_ms = 0
+
     def set_volume(self, vol: float):
         vol = max(0.0, min(1.0, float(vol)))
         MIXER.music.set_volume(vol)
@@ -265,9 +308,11 @@ class PlayerEngine(QObject):
                     self.infoPlayingStatus.emit(self.song_id, "finished")
                 else:
                     print(f"Song is skipped.. so not increasing the play count")
-                    
+
+            self.flush_play_event(skipped=self._is_skip)
             self.stop()
             return
 
+        self._listened_ms += 100
         self.elapsed_sec = min(self.elapsed_sec + 100, self.duration)
         self.setSeekPos.emit(self.elapsed_sec)
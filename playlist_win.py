@@ -9,7 +9,7 @@ from PyQt5.QtWidgets import (
     QHBoxLayout, QVBoxLayout, QFrame,
     QMenu
 )
-from helper import round_pix_form_path
+from cover_cache import cover_pixmap, set_cover
 from common import ScrollArea
 from typing import Dict
 from util import trim_text, COVER_DIR_PATH, resource_path
@@ -25,6 +25,7 @@ class HoverThumb(QWidget):
         super().__init__(parent)
 
         size = 78
+        self.thumb_size = size
         self.setFixedSize(size, size)
 
         main_layout = QVBoxLayout(self)
@@ -32,7 +33,7 @@ class HoverThumb(QWidget):
 
         self.image_label = QLabel(self)
         self.image_label.setAlignment(Qt.AlignCenter)
-        self.image_label.setPixmap(round_pix_form_path(cover_path, size, size, 5))
+        set_cover(self.image_label, cover_path, size, size, 5)
 
         self.image_label.setStyleSheet(f"""
             QLabel {{
@@ -80,6 +81,9 @@ class HoverThumb(QWidget):
         # internal mode
         self.mode = "idle"
 
+    def update_cover(self, cover_path: str):
+        set_cover(self.image_label, cover_path, self.thumb_size, self.thumb_size, 5)
+
     def set_mode(self, mode: str):
         self.mode = mode
 
@@ -311,6 +315,16 @@ class SongRow(QWidget):
         self.setStyleSheet(self._base_style)
 
 
+    def set_info(self, title: str, subtitle: str, cover_path: str):
+        self.title_txt = title
+        self.subtitle_txt = subtitle
+        self.title_lbl.setText(trim_text(title, 62))
+        self.subtitle_lbl.setText(trim_text(subtitle, 80))
+
+        if cover_path != self.cover_path:
+            self.cover_path = cover_path
+            self.thumb.update_cover(cover_path)
+
     def set_broadcast(self, type: str, value: bool):
         if type == "active":
             self.thumb.set_active(value)
@@ -353,6 +367,7 @@ class PlaylistPlayerWindow(QWidget):
     playToggleRequested = pyqtSignal()
     navbarPlaylistBroadcast = pyqtSignal(str, int, bool)
     menuActionCall = pyqtSignal(str, int, int, int)
+    requestSongPage = pyqtSignal(int, int, int) # playlist_id, after_position, song_index
 
     def __init__(self, parent = None):
         super().__init__(parent=parent)
@@ -387,7 +402,7 @@ class PlaylistPlayerWindow(QWidget):
         self.cover_size = 290
         self.cover_radius = 18
 
-        self.default_playlist_cover = round_pix_form_path(
+        self.default_playlist_cover = cover_pixmap(
             path= resource_path("res/playlist.png"),
             width=self.cover_size, 
             height=self.cover_size, 
@@ -613,7 +628,7 @@ class PlaylistPlayerWindow(QWidget):
 
         else:
             song_cover_path = item_obj.cover_path
-            self.song_big_pix = round_pix_form_path(
+            self.song_big_pix = cover_pixmap(
                 path=song_cover_path, 
                 width=self.cover_size, 
                 height=self.cover_size, 
@@ -636,7 +651,7 @@ class PlaylistPlayerWindow(QWidget):
 
     def update_cover(self, cover_path):
         # set playlist cover img
-        self.big_pix = round_pix_form_path(
+        self.big_pix = cover_pixmap(
             path=cover_path, 
             width=self.cover_size, 
             height=self.cover_size, 
@@ -709,7 +724,7 @@ class PlaylistPlayerWindow(QWidget):
         if playlist_id != self.playlist_id:
             return
 
-        for song in song_list[ :self.batch_size]:
+        for song in song_list:
             song_index += 1 # this song song_index
 
             if not os.path.exists(song['path']):
@@ -726,9 +741,10 @@ class PlaylistPlayerWindow(QWidget):
             self.add_song(song_index, song['id'], song['title'], song['subtitle'], song['duration'], cover_path)
 
 
-        if len(song_list[self.batch_size: ]) != 0:
+        if len(song_list) == self.batch_size:
+            # full page -> ask for the next one
             QTimer.singleShot(300, 
-                lambda song=song_list[self.batch_size :], pl_id = playlist_id, index = song_index : self.add_in_batch(song, pl_id, index)
+                lambda pl_id = playlist_id, position = song_list[-1]['position'], index = song_index : self.requestSongPage.emit(pl_id, position, index)
             )
         else:
             print("Done Adding into playlist...")
@@ -789,6 +805,12 @@ class PlaylistPlayerWindow(QWidget):
         if action == "remove":
             self.remove_song_row(song_id)
 
+    def update_song_row(self, song_id: int, title: str, subtitle: str, cover_path: str):
+        # tags / cover of the file changed
+        row_widget: SongRow = self.song_widgets.get(song_id)
+        if row_widget is not None:
+            row_widget.set_info(title, subtitle, cover_path)
+
     def remove_song_row(self, song_id):
         if song_id not in self.song_widgets:
             return False
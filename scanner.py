@@ -0,0 +1,407 @@
+import os
+import time
+import threading
+from fnmatch import fnmatch
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from typing import Dict, List
+from PyQt5.QtCore import QThread, pyqtSignal
+from databse import DataBase
+from importer import iter_parsed_songs
+from metadata import audio_hash
+import tracing
+from util import save_cover
+
+
+class ScanResult():
+    """
+    Difference between the music folders and the scan index of the db.
+
+    added / modified -> [(path, size, mtime_ns, inode)]
+    moved            -> [(old_path, new_path, size, mtime_ns, inode, s_id)]
+    deleted          -> [(path, s_id)]
+    songs            -> parsed tags of the added/modified files (for add_songs_bulk)
+    """
+    def __init__(self):
+        self.added: List[tuple] = []
+        self.modified: List[tuple] = []
+        self.moved: List[tuple] = []
+        self.deleted: List[tuple] = []
+        self.songs: List[dict] = []
+        self.unchanged = 0
+
+    def has_changes(self) -> bool:
+        return bool(self.added or self.modified or self.moved or self.deleted)
+
+    def __repr__(self):
+        return (
+            f"ScanResult(added={len(self.added)}, modified={len(self.modified)}, "
+            f"moved={len(self.moved)}, deleted={len(self.deleted)}, unchanged={self.unchanged})"
+        )
+
+
+def _dir_key(path: str) -> tuple:
+    # identity of a folder, same for every symlink pointing to it
+    stat = os.stat(path)
+    return (stat.st_dev, stat.st_ino)
+
+
+def is_excluded(path: str, root: str, excludes: List[str]) -> bool:
+    if not excludes:
+        return False
+
+    name = os.path.basename(path)
+    relative = os.path.relpath(path, root).replace(os.sep, "/")
+    return any(fnmatch(name, glob) or fnmatch(relative, glob) for glob in excludes)
+
+
+def _scan_one_dir(directory: str, root: str, excludes: List[str]):
+    """
+    Runs on a pool thread -> (files, sub_dirs, ok)
+    files    -> [(path, size, mtime_ns, inode)]
+    sub_dirs -> [(path, dir_key)]
+    """
+    files = []
+    sub_dirs = []
+
+    try:
+        with os.scandir(directory) as entries:
+            for entry in entries:
+                if excludes and is_excluded(entry.path, root, excludes):
+                    continue
+
+                if entry.is_dir():
+                    sub_dirs.append((entry.path, _dir_key(entry.path)))
+
+                # same check as util.is_mp3, without splitext (hot loop)
+                elif entry.name[-4:].lower() == ".mp3" and entry.is_file():
+                    stat = entry.stat()
+                    # on windows st_ino of a scandir stat is 0, inode() asks for it
+                    files.append((entry.path, stat.st_size, stat.st_mtime_ns, stat.st_ino or entry.inode()))
+
+    except OSError as e:
+        print(f"Error[Scanner] {directory} : {e}")
+        return files, sub_dirs, False
+
+    return files, sub_dirs, True
+
+
+def walk_music_files(roots: List[tuple], workers: int = 8):
+    """
+    Recursive walk of `roots` [(path, exclude globs)] with a pool of scandir workers,
+    so the stat calls of many folders are waiting at the same time (slow / network disks).
+
+    Yields ("file", (path, size, mtime_ns, inode)) and ("failed", folder) for folders
+    that could not be read. A folder reached twice (symlink loop) is walked once.
+    """
+    visited = set()
+    # future -> (folder, root, excludes)
+    pending = {}
+
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="scan") as pool:
+        def submit(directory: str, root: str, excludes: List[str]):
+            pending[pool.submit(_scan_one_dir, directory, root, excludes)] = (directory, root, excludes)
+
+        for root, excludes in roots:
+            key = _dir_key(root)
+            if key not in visited:
+                visited.add(key)
+                submit(root, root, excludes)
+
+        while pending:
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+
+            for future in done:
+                directory, root, excludes = pending.pop(future)
+                files, sub_dirs, ok = future.result()
+
+                if not ok:
+                    yield "failed", directory
+
+                for file in files:
+                    yield "file", file
+
+                for path, key in sub_dirs:
+                    if key in visited:
+                        print(f"[Scanner] Skipping already walked folder (symlink loop?) : {path}")
+                        continue
+
+                    visited.add(key)
+                    submit(path, root, excludes)
+
+
+def _is_under(path: str, roots: List[str]) -> bool:
+    return any(path.startswith(root + os.sep) for root in roots)
+
+
+def scan_dirs(roots: List[tuple], index: Dict[str, tuple], workers: int = 8) -> ScanResult:
+    """
+    One pass over `roots` [(path, exclude globs)] compared with `index` (path -> (size, mtime_ns, inode, s_id)).
+    Only stat() is called, no file is opened.
+    Folders that don't exist or can't be read are skipped, so their songs are not reported as deleted.
+    """
+    result = ScanResult()
+
+    existing_roots = []
+    for root, excludes in roots:
+        root = os.path.abspath(root)
+        if not os.path.isdir(root):
+            print(f"FolderNotFound : {root}")
+            continue
+
+        existing_roots.append((root, excludes))
+
+    seen = set()
+    failed = []
+    new_files = []
+
+    for kind, item in walk_music_files(existing_roots, workers=workers):
+        if kind == "failed":
+            failed.append(item)
+            continue
+
+        path, size, mtime_ns, inode = item
+        if path in seen:
+            continue
+        seen.add(path)
+
+        old = index.get(path)
+        if old is None:
+            new_files.append(item)
+
+        elif old[0] != size or old[1] != mtime_ns:
+            result.modified.append(item)
+
+        else:
+            result.unchanged += 1
+
+    # files of the index that are gone
+    scanned = [root for root, _ in existing_roots]
+    gone = [
+        (path, *entry) for path, entry in index.items()
+        if path not in seen and _is_under(path, scanned) and not _is_under(path, failed)
+    ]
+
+    _match_moves(result, new_files, gone)
+    return result
+
+
+def diff_paths(paths: List[str], index: Dict[str, tuple]) -> ScanResult:
+    """
+    Same as scan_dirs, but only for `paths` (files or folders) that changed.
+    `index` only needs the entries of these paths (DataBase.get_scan_entries).
+    """
+    result = ScanResult()
+    new_files = []
+    gone = []
+    seen = set()
+
+    def check(path: str, fingerprint: tuple | None):
+        if path in seen:
+            return
+        seen.add(path)
+
+        old = index.get(path)
+        if fingerprint is None:
+            if old is not None:
+                gone.append((path, *old))
+
+        elif old is None:
+            new_files.append((path, *fingerprint))
+
+        elif old[0] != fingerprint[0] or old[1] != fingerprint[1]:
+            result.modified.append((path, *fingerprint))
+
+        else:
+            result.unchanged += 1
+
+    for path in paths:
+        if os.path.isdir(path):
+            # new / moved in folder
+            for kind, item in walk_music_files([(path, [])]):
+                if kind == "file":
+                    check(item[0], item[1:])
+            continue
+
+        if path[-4:].lower() == ".mp3":
+            try:
+                stat = os.stat(path)
+                check(path, (stat.st_size, stat.st_mtime_ns, stat.st_ino))
+            except OSError:
+                check(path, None)
+
+    # files of removed / moved away folders
+    for path in index:
+        if path not in seen and not os.path.exists(path):
+            check(path, None)
+
+    _match_moves(result, new_files, gone)
+    return result
+
+
+def _match_moves(result: ScanResult, new_files: List[tuple], gone: List[tuple]):
+    """
+    new_files -> [(path, size, mtime_ns, inode)]
+    gone      -> [(path, size, mtime_ns, inode, s_id)]
+    A new file with the fingerprint of a gone file is a move / rename, the rest are added / deleted.
+    """
+    gone_by_key = {}
+    for path, size, mtime_ns, inode, s_id in gone:
+        key = (inode, size) if inode else (size, mtime_ns)
+        gone_by_key[key] = (path, mtime_ns, s_id)
+
+    for path, size, mtime_ns, inode in new_files:
+        key = (inode, size) if inode else (size, mtime_ns)
+        old = gone_by_key.get(key)
+
+        if old is not None and old[1] == mtime_ns:
+            del gone_by_key[key]
+            result.moved.append((old[0], path, size, mtime_ns, inode, old[2]))
+        else:
+            result.added.append((path, size, mtime_ns, inode))
+
+    result.deleted = [(path, s_id) for path, _, s_id in gone_by_key.values()]
+
+
+class ScanThread(QThread):
+    """
+    Import pipeline of the library roots:
+        discover (scan_dirs) -> parse new/changed files (process pool, importer.py) -> batches for the db
+
+    Every `batchReady` result is written with `DataBase.apply_scan` on the db worker,
+    the receiver calls `batch_written()` once it's committed (or failed). At most
+    `max_pending_batches` are waiting for the db, then the import (and the process
+    pool behind it) waits for the writes.
+    The first batch carries the moved/deleted files, the others only parsed songs.
+    `progress(done, total)` is emitted at most every `progress_interval` sec.
+    After the import, songs added before audio hashing are hashed (`hashesReady` -> [(id, audio_hash)]).
+    """
+    batchReady = pyqtSignal(object)
+    hashesReady = pyqtSignal(object)
+    progress = pyqtSignal(int, int)
+    scanFinished = pyqtSignal(object)
+
+    def __init__(self, roots: List[tuple], parent = None):
+        super().__init__(parent)
+        self.roots = list(roots)
+
+        self.batch_size = 200 # songs per db transaction
+        self.progress_interval = 0.2
+
+        self.max_pending_batches = 4
+        self._batch_slots = threading.Semaphore(self.max_pending_batches)
+
+    def run(self):
+        tracing.set_thread_name("scanner")
+
+        with tracing.span("scan_dirs"):
+            dataBase = DataBase(read_only=True)
+            index = dataBase.get_scan_index()
+            dataBase.close()
+
+            result = scan_dirs(self.roots, index)
+
+        with tracing.span("import", files=len(result.added) + len(result.modified)):
+            self._import(result)
+
+        if self.isInterruptionRequested():
+            # app is closing, the rest is done by the next scan
+            return
+
+        with tracing.span("hash_missing"):
+            self._hash_missing()
+
+        self.scanFinished.emit(result)
+
+    def stop(self):
+        self.requestInterruption()
+        self.wait()
+
+    def _hash_missing(self):
+        dataBase = DataBase(read_only=True)
+        songs = dataBase.get_songs_without_audio_hash()
+        dataBase.close()
+
+        hashes = []
+        for song_id, path in songs:
+            if self.isInterruptionRequested():
+                break
+
+            # None -> file missing, tried again on the next scan
+            value = audio_hash(path)
+            if value is not None:
+                hashes.append((song_id, value))
+
+            if len(hashes) >= self.batch_size:
+                self.hashesReady.emit(hashes)
+                hashes = []
+
+        if hashes:
+            self.hashesReady.emit(hashes)
+
+    def _import(self, result: ScanResult):
+        # parse the new/changed files of `result` and emit them in batches
+        files = {path: (path, size, mtime_ns, inode) for path, size, mtime_ns, inode in result.added}
+        modified = {path: (path, size, mtime_ns, inode) for path, size, mtime_ns, inode in result.modified}
+        files.update(modified)
+
+        batch = ScanResult()
+        batch.moved = result.moved
+        batch.deleted = result.deleted
+        batch.unchanged = result.unchanged
+
+        total = len(files)
+        done = 0
+        last_progress = 0
+
+        songs = iter_parsed_songs(list(files))
+        for path, song in songs:
+            if self.isInterruptionRequested():
+                # files not written yet are still new for the next scan
+                songs.close()
+                return
+
+            if path in modified:
+                batch.modified.append(files[path])
+            else:
+                batch.added.append(files[path])
+
+            if song is not None:
+                song["cover_path"] = self._save_cover(song.pop("cover_data"))
+                batch.songs.append(song)
+
+            done += 1
+            if len(batch.added) + len(batch.modified) >= self.batch_size:
+                if not self._emit_batch(batch):
+                    songs.close()
+                    return
+                batch = ScanResult()
+
+            now = time.monotonic()
+            if now - last_progress >= self.progress_interval:
+                last_progress = now
+                self.progress.emit(done, total)
+
+        if batch.has_changes() and not self._emit_batch(batch):
+            return
+
+        self.progress.emit(done, total)
+
+    def _emit_batch(self, batch: ScanResult) -> bool:
+        # waits for a free slot (a batch written by the db) -> False if interrupted meanwhile
+        while not self._batch_slots.acquire(timeout=0.1):
+            if self.isInterruptionRequested():
+                return False
+
+        self.batchReady.emit(batch)
+        return True
+
+    def batch_written(self):
+        # any thread, once per batchReady result
+        self._batch_slots.release()
+
+    def _save_cover(self, cover_data: bytes | None) -> str:
+        if not cover_data:
+            return ""
+
+        # same artwork -> same file, songs of an album share one cover
+        return os.path.basename(save_cover(cover_data))
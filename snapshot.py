@@ -0,0 +1,181 @@
+import os
+import mmap
+import secrets
+import struct
+from typing import List
+from PyQt5.QtGui import QImage, QPixmap
+from util import AURIX_DIR_PATH
+
+# Home screen of the last session, written on exit and painted on the next launch
+# before the db is read (LoadFiles reconciles it with the db after that).
+#
+# home.snap  -> header + one entry per card, in screen order
+# home.atlas -> token of the snap file + pre-scaled (rounded) thumbnails of the
+#               first `thumbs` cards, raw ARGB32 premultiplied pixels, read with mmap
+SNAPSHOT_PATH = os.path.join(AURIX_DIR_PATH, "home.snap")
+ATLAS_PATH = os.path.join(AURIX_DIR_PATH, "home.atlas")
+
+_MAGIC = b"AXSN"
+_VERSION = 1
+_HEADER = struct.Struct("<4sHIHHI8s") # magic, version, count, thumb width, thumb height, thumbs, token
+_ENTRY = struct.Struct("<qHHHH") # song_id, len of title, subtitle, path, cover_path (utf-8)
+_IMAGE_FORMAT = QImage.Format_ARGB32_Premultiplied
+
+
+class HomeSnapshot():
+    """
+    songs -> [(song_id, title, subtitle, path, cover_path)] in screen order
+    thumb(index) -> QPixmap of the card at `index` (None if it's not in the atlas)
+    """
+    def __init__(self, songs: List[tuple], thumb_size: tuple, thumbs: int, token: bytes):
+        self.songs = songs
+        self.thumb_width, self.thumb_height = thumb_size
+        self.thumbs = thumbs
+        self.token = token
+
+        self._atlas_file = None
+        self._atlas: mmap.mmap = None
+
+    @property
+    def thumb_bytes(self) -> int:
+        return self.thumb_width * self.thumb_height * 4
+
+    def _open_atlas(self) -> bool:
+        if self._atlas is not None:
+            return True
+
+        try:
+            self._atlas_file = open(ATLAS_PATH, "rb")
+            size = os.fstat(self._atlas_file.fileno()).st_size
+            if size != len(self.token) + self.thumbs * self.thumb_bytes or self._atlas_file.read(len(self.token)) != self.token:
+                # written by an other session (crash between the two files)
+                print(f"[Snapshot] Atlas doesn't match the snapshot, ignored")
+                self.close()
+                self.thumbs = 0
+                return False
+
+            self._atlas = mmap.mmap(self._atlas_file.fileno(), 0, access=mmap.ACCESS_READ)
+            return True
+
+        except (OSError, ValueError) as e:
+            print(f"Error[Snapshot] atlas : {e}")
+            self.close()
+            self.thumbs = 0
+            return False
+
+    def thumb(self, index: int) -> QPixmap | None:
+        if index >= self.thumbs or not self._open_atlas():
+            return
+
+        start = len(self.token) + index * self.thumb_bytes
+        # only the pages of this thumbnail are read from the disk
+        data = self._atlas[start : start + self.thumb_bytes]
+        image = QImage(data, self.thumb_width, self.thumb_height, self.thumb_width * 4, _IMAGE_FORMAT)
+        # fromImage copies the pixels, so `data` can go
+        return QPixmap.fromImage(image)
+
+    def known_songs(self) -> dict:
+        # song_id -> (title, subtitle, path, cover filename), what LoadFiles compares with the db
+        return {
+            song_id: (title, subtitle, path, os.path.basename(cover_path))
+            for song_id, title, subtitle, path, cover_path in self.songs
+        }
+
+    def close(self):
+        if self._atlas is not None:
+            self._atlas.close()
+            self._atlas = None
+
+        if self._atlas_file is not None:
+            self._atlas_file.close()
+            self._atlas_file = None
+
+
+def _pack_str(value: str) -> bytes:
+    # 65535 bytes max, longer values are cut (titles/paths never get close)
+    data = (value or "").encode("utf-8", "surrogatepass")
+    if len(data) <= 0xFFFF:
+        return data
+
+    # cut before the character the limit falls in (continuation bytes are 0b10xxxxxx)
+    end = 0xFFFF
+    while data[end] & 0xC0 == 0x80:
+        end -= 1
+    return data[:end]
+
+
+def read_snapshot() -> HomeSnapshot | None:
+    try:
+        with open(SNAPSHOT_PATH, "rb") as f:
+            data = f.read()
+    except OSError:
+        return
+
+    try:
+        magic, version, count, width, height, thumbs, token = _HEADER.unpack_from(data, 0)
+        if magic != _MAGIC or version != _VERSION:
+            print(f"[Snapshot] Unknown snapshot format, ignored")
+            return
+
+        offset = _HEADER.size
+        songs = []
+        for _ in range(count):
+            song_id, *lengths = _ENTRY.unpack_from(data, offset)
+            offset += _ENTRY.size
+
+            values = []
+            for length in lengths:
+                values.append(data[offset : offset + length].decode("utf-8", "surrogatepass"))
+                offset += length
+
+            songs.append((song_id, *values))
+
+    except (struct.error, UnicodeDecodeError) as e:
+        print(f"Error[Snapshot] {SNAPSHOT_PATH} : {e}")
+        return
+
+    return HomeSnapshot(songs, (width, height), thumbs, token)
+
+
+def _write_file(path: str, chunks):
+    # write + rename, a crash never leaves a half written file
+    temp_path = path + ".tmp"
+    with open(temp_path, "wb") as f:
+        for chunk in chunks:
+            f.write(chunk)
+    os.replace(temp_path, path)
+
+
+def write_snapshot(songs: List[tuple], pixmaps: List[QPixmap], thumb_size: tuple):
+    """
+    songs   -> [(song_id, title, subtitle, path, cover_path)] in screen order
+    pixmaps -> thumbnails of the first cards (same order), all of `thumb_size`
+    """
+    width, height = thumb_size
+
+    thumbs = []
+    for pixmap in pixmaps:
+        if pixmap is None or pixmap.isNull() or (pixmap.width(), pixmap.height()) != (width, height):
+            # atlas is only for the first cards, it stops at the first one missing
+            break
+
+        image = pixmap.toImage().convertToFormat(_IMAGE_FORMAT)
+        thumbs.append(image.constBits().asstring(image.sizeInBytes()))
+
+    token = secrets.token_bytes(8)
+    entries = [_HEADER.pack(_MAGIC, _VERSION, len(songs), width, height, len(thumbs), token)]
+    for song_id, *values in songs:
+        values = [_pack_str(value) for value in values]
+        entries.append(_ENTRY.pack(song_id, *(len(value) for value in values)))
+        entries.extend(values)
+
+    try:
+        # atlas first, it's only used if it has the token of the snap file
+        _write_file(ATLAS_PATH, [token, *thumbs])
+        _write_file(SNAPSHOT_PATH, entries)
+
+    except OSError as e:
+        print(f"Error[Snapshot] can't write the snapshot : {e}")
+        return
+
+    print(f"[Snapshot] Saved {len(songs)} songs, {len(thumbs)} thumbnails")
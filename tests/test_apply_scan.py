@@ -0,0 +1,63 @@
+from databse import DataBase
+from scanner import ScanResult
+
+
+def _song(path: str, title: str = "t") -> dict:
+    return {
+        "title": title, "subtitle": "s", "artist": "a", "vid": path,
+        "duration": 100, "path": path, "cover_path": "",
+    }
+
+
+def _added(db: DataBase, *paths) -> list:
+    result = ScanResult()
+    result.added = [(path, 1, 1, 1) for path in paths]
+    result.songs = [_song(path) for path in paths]
+    return [song["id"] for song in db.apply_scan(result)["added"]]
+
+
+def test_moved_song_keeps_its_id(tmp_path):
+    db = DataBase(path=str(tmp_path / "aurix.db"))
+    song_id, = _added(db, "/m/a.mp3")
+
+    result = ScanResult()
+    result.moved = [("/m/a.mp3", "/m/b.mp3", 1, 1, 1, song_id)]
+    changes = db.apply_scan(result)
+
+    assert changes["moved"] == [(song_id, "/m/b.mp3")]
+    assert db.get_song(song_id)["path"] == "/m/b.mp3"
+    db.close()
+
+
+def test_move_over_an_existing_song_replaces_it(tmp_path):
+    db = DataBase(path=str(tmp_path / "aurix.db"))
+    moved_id, other_id = _added(db, "/m/a.mp3", "/m/b.mp3")
+    db.add_playlist_song(1, moved_id)
+
+    result = ScanResult()
+    result.moved = [("/m/a.mp3", "/m/b.mp3", 1, 1, 1, moved_id)]
+    result.added = [("/m/c.mp3", 1, 1, 3)]
+    result.songs = [_song("/m/c.mp3")]
+    changes = db.apply_scan(result)
+
+    # no IntegrityError, the rest of the batch is written
+    assert changes["moved"] == [(moved_id, "/m/b.mp3")]
+    assert changes["deleted"] == [other_id]
+    assert [song["path"] for song in changes["added"]] == ["/m/c.mp3"]
+    assert db.get_song(moved_id)["path"] == "/m/b.mp3"
+    assert db.get_playlist_song(1) == [moved_id]
+    db.close()
+
+
+def test_modified_song_is_reported(tmp_path):
+    db = DataBase(path=str(tmp_path / "aurix.db"))
+    song_id, = _added(db, "/m/a.mp3")
+
+    result = ScanResult()
+    result.modified = [("/m/a.mp3", 2, 2, 1)]
+    result.songs = [_song("/m/a.mp3", title="new title")]
+    changes = db.apply_scan(result)
+
+    assert changes["added"] == []
+    assert [(song["id"], song["title"]) for song in changes["modified"]] == [(song_id, "new title")]
+    db.close()
@@ -0,0 +1,31 @@
+import struct
+
+from metadata import audio_hash
+
+AUDIO = bytes(range(256)) * 64
+HAS_HEADER = 1 << 31
+IS_HEADER = 1 << 29
+
+
+def _ape_tag(with_header: bool) -> bytes:
+    item = struct.pack("<II", 5, 0) + b"Title\x00" + b"hello"
+    size = len(item) + 32 # items + footer
+    flags = HAS_HEADER if with_header else 0
+
+    footer = b"APETAGEX" + struct.pack("<IIII", 2000, size, 1, flags) + bytes(8)
+    header = b"APETAGEX" + struct.pack("<IIII", 2000, size, 1, flags | IS_HEADER) + bytes(8)
+    return (header if with_header else b"") + item + footer
+
+
+def _hash(tmp_path, name: str, data: bytes) -> str:
+    path = tmp_path / name
+    path.write_bytes(data)
+    return audio_hash(str(path))
+
+
+def test_ape_tag_is_skipped(tmp_path):
+    plain = _hash(tmp_path, "plain.mp3", AUDIO)
+
+    assert _hash(tmp_path, "header.mp3", AUDIO + _ape_tag(with_header=True)) == plain
+    # footer only -> no 32 bytes of audio cut
+    assert _hash(tmp_path, "footer.mp3", AUDIO + _ape_tag(with_header=False)) == plain
@@ -0,0 +1,32 @@
+import pytest
+from PyQt5.QtGui import QGuiApplication, QPixmap
+
+from cover_cache import CoverCache
+
+
+@pytest.fixture
+def app():
+    return QGuiApplication.instance() or QGuiApplication([])
+
+
+def test_same_key_twice_is_counted_once(app):
+    cache = CoverCache(budget_bytes=10 * 1024 * 1024)
+    key = ("a.jpg", 80, 80, 8)
+
+    cache._put(key, QPixmap(80, 80))
+    cache._put(key, QPixmap(80, 80))
+
+    assert cache.stats()["pixmaps"] == 1
+    assert cache.stats()["bytes"] == cache._cost(QPixmap(80, 80))
+
+
+def test_lru_keeps_the_budget(app):
+    one = CoverCache()._cost(QPixmap(80, 80))
+    cache = CoverCache(budget_bytes=2 * one)
+
+    for name in ["a", "b", "a", "c"]:
+        cache._put((name, 80, 80, 8), QPixmap(80, 80))
+
+    # "a" put again -> replaced, not counted twice, "b" is the oldest
+    assert [key[0] for key in cache._pixmaps] == ["a", "c"]
+    assert cache.stats()["bytes"] == 2 * one
@@ -0,0 +1,48 @@
+from PyQt5.QtCore import QBuffer, QIODevice
+from PyQt5.QtGui import QImage
+
+from cover_store import CoverStore
+from image_loader import decode_image
+
+
+def _jpeg(width: int, height: int) -> bytes:
+    image = QImage(width, height, QImage.Format_RGB32)
+    image.fill(0xff3366)
+    buffer = QBuffer()
+    buffer.open(QIODevice.WriteOnly)
+    image.save(buffer, "JPEG")
+    return bytes(buffer.data())
+
+
+def _store(tmp_path) -> CoverStore:
+    pack_path = tmp_path / "covers.pack"
+    pack_path.write_bytes(b"")
+    return CoverStore(str(pack_path), str(tmp_path / "covers.idx"))
+
+
+def test_read_is_a_view_of_the_pack(tmp_path):
+    store = _store(tmp_path)
+    data = _jpeg(40, 30)
+    store.put("a.jpg", data)
+
+    view = store.read("a.jpg")
+    assert isinstance(view, memoryview)
+    assert view == data
+    assert decode_image(view).size().width() == 40
+    store.close()
+
+
+def test_compact_with_a_view_still_alive(tmp_path):
+    store = _store(tmp_path)
+    store.put("a.jpg", _jpeg(40, 30))
+    store.put("b.jpg", _jpeg(20, 10))
+    store.remove(["a.jpg"])
+
+    view = store.read("b.jpg")
+    store.compact()
+
+    # old map stays readable for the view, the new one has the same record
+    assert view == store.read("b.jpg")
+    assert list(store.index) == ["b.jpg"]
+    del view
+    store.close()
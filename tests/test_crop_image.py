@@ -0,0 +1,18 @@
+from PyQt5.QtCore import QBuffer, QIODevice
+from PyQt5.QtGui import QImage
+
+from helper import crop_image
+
+
+def test_thumbnail_is_cropped_in_memory():
+    image = QImage(1280, 720, QImage.Format_RGB32)
+    image.fill(0x336699)
+    buffer = QBuffer()
+    buffer.open(QIODevice.WriteOnly)
+    image.save(buffer, "JPEG")
+
+    data = crop_image(bytes(buffer.data()), from_left=284, from_right=284)
+
+    cropped = QImage.fromData(data)
+    assert data[:2] == b"\xff\xd8"
+    assert (cropped.width(), cropped.height()) == (712, 720)
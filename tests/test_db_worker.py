@@ -0,0 +1,62 @@
+import time
+
+import pytest
+from PyQt5.QtCore import QCoreApplication
+from databse import DataBase
+from db_worker import DataBaseWorker
+
+
+@pytest.fixture
+def app():
+    return QCoreApplication.instance() or QCoreApplication([])
+
+
+@pytest.fixture
+def worker(app, tmp_path):
+    path = str(tmp_path / "aurix.db")
+    DataBase(path=path).close()
+
+    worker = DataBaseWorker(path=path)
+    worker.start()
+    yield worker
+    worker.stop()
+
+
+def _wait_for(app, check, timeout: float = 5):
+    deadline = time.monotonic() + timeout
+    while not check() and time.monotonic() < deadline:
+        app.processEvents()
+        time.sleep(0.005)
+    assert check()
+
+
+def _songs_then_error():
+    yield {"title": "t", "subtitle": "s", "artist": "a", "vid": "v", "duration": 1, "path": "/x/0.mp3", "cover_path": ""}
+    raise ValueError("broken tags")
+
+
+def test_failed_write_is_rolled_back_alone(app, worker):
+    calls = []
+    # first song is written before the error
+    failed = worker.write("add_songs_bulk", _songs_then_error(), chunk_size=1)
+    worker.write("add_basic", "key", "value", callback=lambda _: calls.append("write"))
+    worker.read("get_all_song_id", callback=lambda song_ids: calls.append(("read", song_ids)))
+
+    _wait_for(app, lambda: len(calls) == 2)
+    assert isinstance(failed.exception(timeout=1), ValueError)
+    # queue order, the partial insert is gone
+    assert calls == ["write", ("read", [])]
+
+
+def test_write_callback_after_commit(app, worker):
+    seen = []
+
+    def on_written(_):
+        # other connection -> sees committed rows only
+        db = DataBase(path=worker.path, read_only=True)
+        seen.append(db.get_basic("key"))
+        db.close()
+
+    worker.write("add_basic", "key", "value", callback=on_written)
+    _wait_for(app, lambda: seen)
+    assert seen == ["value"]
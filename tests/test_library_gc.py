@@ -0,0 +1,35 @@
+import library_gc
+from databse import DataBase
+from library_gc import LibraryGC
+
+
+def test_cover_saved_during_the_run_is_not_pruned(tmp_path, monkeypatch):
+    cover_dir = tmp_path / "cvr"
+    cover_dir.mkdir()
+    db_path = str(tmp_path / "aurix.db")
+
+    db = DataBase(path=db_path)
+    db.add_songs_bulk([
+        {"title": "new", "subtitle": "s", "artist": "a", "vid": "v1", "duration": 1, "path": "/x/1.mp3", "cover_path": "new.jpg"},
+        {"title": "gone", "subtitle": "s", "artist": "a", "vid": "v2", "duration": 1, "path": "/x/2.mp3", "cover_path": "gone.jpg"},
+    ])
+    db.close()
+
+    monkeypatch.setattr(library_gc, "COVER_DIR_PATH", str(cover_dir))
+    monkeypatch.setattr(library_gc, "DataBase", lambda **kwargs: DataBase(path=db_path, **kwargs))
+
+    gc = LibraryGC()
+
+    def list_then_save():
+        # the scanner saves new.jpg right after the listing
+        files = {}
+        (cover_dir / "new.jpg").write_bytes(b"jpeg")
+        return files
+
+    monkeypatch.setattr(gc, "_list_cover_dir", list_then_save)
+
+    pruned = []
+    gc.pruneReady.connect(pruned.append)
+    gc.run()
+
+    assert pruned == [{"missing_covers": ["gone.jpg"], "stale_scan_paths": []}]
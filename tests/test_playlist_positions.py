@@ -0,0 +1,48 @@
+from databse import DataBase
+
+
+def _playlist_with_songs(tmp_path, count: int):
+    db = DataBase(path=str(tmp_path / "aurix.db"))
+    song_ids = db.add_songs_bulk(
+        {
+            "title": f"t{i}", "subtitle": "s", "artist": "a", "vid": f"v{i}",
+            "duration": 100, "path": f"/x/{i}.mp3", "cover_path": "",
+        }
+        for i in range(count)
+    )
+    db.add_playlist("test", "", "me", 0, 0, 0, "")
+    playlist_id = db.get_playlist_id_by_title("test")
+    return db, playlist_id, song_ids
+
+
+def _order(db, playlist_id):
+    return db.get_playlist_song(playlist_id)
+
+
+def test_insert_block_bigger_than_gap(tmp_path):
+    block = DataBase.POSITION_GAP + 500
+    db, playlist_id, song_ids = _playlist_with_songs(tmp_path, block + 3)
+    first, middle, last = song_ids[:3]
+
+    assert db.add_playlist_songs_at(playlist_id, [first, middle, last]) == 3
+    # no room for `block` songs between first and middle -> rebalanced once
+    assert db.add_playlist_songs_at(playlist_id, song_ids[3:], before_id=middle) == block
+
+    assert _order(db, playlist_id) == [first, *song_ids[3:], middle, last]
+    db.close()
+
+
+def test_move_after_gap_used_up(tmp_path):
+    db, playlist_id, song_ids = _playlist_with_songs(tmp_path, 4)
+    a, b, c, d = song_ids
+    db.add_playlist_songs_at(playlist_id, [a, b, c, d])
+
+    # every move halves the gap before b, it's used up after ~10
+    expected = [a, b, c, d]
+    for song_id in [c, d] * 8:
+        assert db.move_playlist_song(playlist_id, song_id, before_id=b)
+        expected.remove(song_id)
+        expected.insert(expected.index(b), song_id)
+
+    assert _order(db, playlist_id) == expected
+    db.close()
@@ -0,0 +1,29 @@
+from databse import DataBase
+
+
+def test_hot_queries_use_indexes(tmp_path):
+    db = DataBase(path=str(tmp_path / "aurix.db"))
+    # no full table scan / temp b-tree sort on the play/open path
+    assert db.check_query_plans() == []
+    db.close()
+
+
+def test_bad_plan_is_reported(tmp_path, monkeypatch):
+    db = DataBase(path=str(tmp_path / "aurix.db"))
+    monkeypatch.setattr(DataBase, "HOT_QUERIES", [
+        ("by_title", "SELECT id FROM songs WHERE title = ?", ("",)),
+        ("by_plays", "SELECT id FROM songs WHERE id > ? ORDER BY plays", (0,)),
+    ])
+
+    names = {name for name, _ in db.check_query_plans()}
+    assert names == {"by_title", "by_plays"}
+    db.close()
+
+
+def test_missing_index_is_reported(tmp_path):
+    db = DataBase(path=str(tmp_path / "aurix.db"))
+    db.cursor.execute("DROP INDEX idx_songs_liked")
+
+    bad_plans = db.check_query_plans()
+    assert [name for name, _ in bad_plans] == ["get_liked_song_id"]
+    db.close()
@@ -0,0 +1,59 @@
+import pytest
+from PyQt5.QtCore import QCoreApplication
+
+import snapshot
+from helper import LoadFiles
+
+
+@pytest.fixture
+def app():
+    return QCoreApplication.instance() or QCoreApplication([])
+
+
+def test_long_value_is_cut_on_a_character(tmp_path, monkeypatch):
+    monkeypatch.setattr(snapshot, "SNAPSHOT_PATH", str(tmp_path / "home.snap"))
+    monkeypatch.setattr(snapshot, "ATLAS_PATH", str(tmp_path / "home.atlas"))
+
+    # 2 bytes per character, the limit falls in the middle of one
+    title = "é" * 40000
+    snapshot.write_snapshot([(1, title, "s", "/m/a.mp3", "a.jpg")], [], (10, 10))
+
+    songs = snapshot.read_snapshot().songs
+    assert songs[0][1] == "é" * (0xFFFF // 2)
+    assert songs[0][2:] == ("s", "/m/a.mp3", "a.jpg")
+
+
+class _PagedDataBase():
+    def __init__(self, song_count: int):
+        self.songs = [
+            {"id": song_id, "title": "t", "subtitle": "s", "path": f"/m/{song_id}.mp3", "cover_path": "c.jpg"}
+            for song_id in range(song_count, 0, -1)
+        ]
+        self.pages_read = 0
+
+    def read(self, name, after_id, limit, callback):
+        self.pages_read += 1
+        rows = [song for song in self.songs if after_id is None or song["id"] < after_id]
+        callback(rows[:limit])
+
+
+def test_hold_keeps_one_page(app, monkeypatch):
+    monkeypatch.setattr("helper.cover_exists", lambda path: True)
+    dataBase = _PagedDataBase(1200)
+    loader = LoadFiles(dataBase)
+    known = {song["id"]: ("t", "s", song["path"], "c.jpg") for song in dataBase.songs}
+    finished = []
+    loader.finished.connect(finished.append)
+
+    loader.run(known=known, hold=True)
+    QCoreApplication.processEvents()
+    # first page read before the cards are done, nothing more
+    assert dataBase.pages_read == 1
+
+    loader.release()
+    for _ in range(10):
+        QCoreApplication.processEvents()
+
+    assert dataBase.pages_read == 3
+    assert finished == [True]
+    assert loader.seen == set(known)
@@ -0,0 +1,54 @@
+import os
+import re
+import sys
+import subprocess
+
+# Startup import budget of the app: imports main.py in a fresh python with `-X importtime`
+# (no window is opened), fails if the imports take longer than the budget or a deferred
+# module is imported.
+#     AURIX_STARTUP_BUDGET_MS=300 python -m pytest tests/test_startup_budget.py
+BUDGET_MS = float(os.environ.get("AURIX_STARTUP_BUDGET_MS", 300))
+RUNS = 3 # best of n runs (first one fills the disk cache)
+
+# loaded on first use (lazy.py / screens built in main._nav_call)
+DEFERRED_MODULES = ["yt_dlp", "ytmusicapi", "requests", "mutagen", "numpy", "yt_music", "tube"]
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+_LINE = re.compile(r"import time:\s+(\d+) \|\s+(\d+) \|(\s*)(\S+)")
+
+
+def measure_imports(module: str = "main") -> dict:
+    """ -> {module name: cumulative import time in us} of a fresh `import module` """
+    env = dict(os.environ, QT_QPA_PLATFORM="offscreen")
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=ROOT, env=env, capture_output=True, text=True
+    )
+    assert proc.returncode == 0, f"import {module} failed :\n{proc.stderr[-2000:]}"
+
+    times = {}
+    for line in proc.stderr.splitlines():
+        match = _LINE.match(line)
+        if match:
+            times[match.group(4)] = int(match.group(2))
+
+    return times
+
+
+def _best_run() -> dict:
+    return min((measure_imports() for _ in range(RUNS)), key=lambda times: times["main"])
+
+
+def test_startup_imports_fit_the_budget():
+    times = _best_run()
+    total_ms = times["main"] / 1000
+
+    slowest = sorted(times.items(), key=lambda item: item[1], reverse=True)[1:11]
+    report = "\n".join(f"    {us / 1000:7.1f} ms  {name}" for name, us in slowest)
+    assert total_ms <= BUDGET_MS, f"import main : {total_ms:.0f} ms (budget {BUDGET_MS:.0f} ms)\n{report}"
+
+
+def test_deferred_modules_are_not_imported_at_startup():
+    times = measure_imports()
+    imported = [name for name in DEFERRED_MODULES if name in times]
+    assert imported == [], f"imported at startup, they should be lazy : {imported}"
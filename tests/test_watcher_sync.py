@@ -0,0 +1,31 @@
+import os
+
+from databse import DataBase
+from scanner import ScanResult, diff_paths
+
+
+def test_renamed_file_reaches_the_db_as_a_move(tmp_path):
+    db = DataBase(path=str(tmp_path / "aurix.db"))
+    old_path = str(tmp_path / "a.mp3")
+    new_path = str(tmp_path / "b.mp3")
+    with open(old_path, "wb") as f:
+        f.write(b"\xff" * 64)
+
+    stat = os.stat(old_path)
+    result = ScanResult()
+    result.added = [(old_path, stat.st_size, stat.st_mtime_ns, stat.st_ino)]
+    result.songs = [{
+        "title": "t", "subtitle": "s", "artist": "a", "vid": "v",
+        "duration": 100, "path": old_path, "cover_path": "",
+    }]
+    song_id = db.apply_scan(result)["added"][0]["id"]
+
+    # what the watcher does with the two paths of the rename event
+    os.rename(old_path, new_path)
+    paths = [old_path, new_path]
+    result = diff_paths(paths, db.get_scan_entries(paths))
+    changes = db.apply_scan(result)
+
+    assert changes["moved"] == [(song_id, new_path)]
+    assert changes["added"] == changes["deleted"] == []
+    db.close()
@@ -5,6 +5,7 @@ from PyQt5.QtWidgets import (
     QLineEdit, QSizePolicy, QToolButton
 )
 from PyQt5.QtGui import QIcon, QFont, QPixmap, QColor, QPalette
+from cover_cache import COVERS, set_cover
 from util import resource_path
 
 class SearchSuggestionItem(QWidget):
@@ -22,17 +23,11 @@ class SearchSuggestionItem(QWidget):
         # Thumbnail / Icon
         thumb = QLabel()
         thumb.setFixedSize(56, 56)
-        pix = None
         if info.get("thumbnail"):
-            try:
-                pix = QPixmap(info["thumbnail"]).scaled(56, 56, Qt.KeepAspectRatio, Qt.SmoothTransformation)
-            except Exception:
-                pix = None
-        if pix is None:
-            # placeholder square
-            pix = QPixmap(56, 56)
-            pix.fill(QColor("#333333"))
-        thumb.setPixmap(pix)
+            # decoded in the image pool (80px variant of the cover), placeholder until then
+            set_cover(thumb, info["thumbnail"], 56, 56, radius=6)
+        else:
+            thumb.setPixmap(COVERS.placeholder(56, 56, radius=6))
         thumb.setStyleSheet("border-radius:6px;")
         h.addWidget(thumb)
 
@@ -320,10 +315,11 @@ class SearchBox(QWidget):
 
 
 class Topbar(QFrame):
-    def __init__(self, parent = None, search_callback = None):
+    def __init__(self, parent = None, search_callback = None, query_callback = None):
         super().__init__(parent)
 
         self.search_callback = search_callback
+        self.query_callback = query_callback
         self.setFixedHeight(90)
         self.setStyleSheet("background-color: #000000; border-bottom: 1px solid #262626;")
 
@@ -390,6 +386,10 @@ class Topbar(QFrame):
         if self.search_callback != None:
             self.search_box.searchTriggered.connect(self.search_callback)
 
+        # live typing -> local suggestions
+        if self.query_callback != None:
+            self.search_box.queryChanged.connect(self.query_callback)
+
         # Add spacer before the profile button
         layout.addSpacerItem(QSpacerItem(1, 1, QSizePolicy.Expanding, QSizePolicy.Minimum))
 
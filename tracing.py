@@ -0,0 +1,126 @@
+import os
+import json
+import time
+import threading
+import functools
+from contextlib import contextmanager
+
+# Startup timeline, written as a Chrome trace (open it in chrome://tracing or ui.perfetto.dev).
+#
+#   with tracing.span("DataBase()"):
+#       ...
+#   tracing.instant("first_paint")
+#
+# Off by default, span() / instant() cost nothing until enable() is called
+# (main.py --trace-startup).
+
+_enabled = False
+_start_ns = 0
+_events = []
+_thread_names = {}
+
+
+def enable():
+    global _enabled, _start_ns
+    _start_ns = time.perf_counter_ns()
+    _events.clear()
+    _enabled = True
+
+
+def is_enabled() -> bool:
+    return _enabled
+
+
+def _now_us() -> float:
+    return (time.perf_counter_ns() - _start_ns) / 1000
+
+
+def _tid() -> int:
+    thread = threading.current_thread()
+    tid = threading.get_ident()
+    if tid not in _thread_names:
+        # QThreads show up as Dummy-N, set_thread_name() gives them a real name
+        _thread_names[tid] = thread.name
+    return tid
+
+
+def set_thread_name(name: str):
+    if _enabled:
+        _thread_names[threading.get_ident()] = name
+
+
+class _NoSpan():
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+_NO_SPAN = _NoSpan()
+
+
+@contextmanager
+def _span(name: str, args: dict):
+    start = _now_us()
+    try:
+        yield
+    finally:
+        # list.append is atomic, spans of many threads can end at the same time
+        _events.append({
+            "name": name, "ph": "X", "ts": start, "dur": _now_us() - start,
+            "pid": os.getpid(), "tid": _tid(), "args": args,
+        })
+
+
+def span(name: str, **args):
+    """ Timed block on the calling thread """
+    if not _enabled:
+        return _NO_SPAN
+    return _span(name, args)
+
+
+def traced(name: str = None):
+    """ Decorator, every call of the function is a span (named after it by default) """
+    def decorator(func):
+        label = name or func.__qualname__
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not _enabled:
+                return func(*args, **kwargs)
+            with _span(label, {}):
+                return func(*args, **kwargs)
+
+        return wrapper
+    return decorator
+
+
+def instant(name: str, **args):
+    """ Point in time (milestones like first_paint / interactive) """
+    if not _enabled:
+        return
+
+    _events.append({
+        "name": name, "ph": "i", "s": "g", "ts": _now_us(),
+        "pid": os.getpid(), "tid": _tid(), "args": args,
+    })
+
+
+def milestones() -> dict:
+    # name -> ms since enable() of every instant event
+    return {event["name"]: event["ts"] / 1000 for event in _events if event["ph"] == "i"}
+
+
+def dump(path: str):
+    pid = os.getpid()
+    meta = [
+        {"name": "thread_name", "ph": "M", "pid": pid, "tid": tid, "args": {"name": name}}
+        for tid, name in list(_thread_names.items())
+    ]
+
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump({"traceEvents": meta + list(_events), "displayTimeUnit": "ms"}, f)
+
+    print(f"[Trace] {len(_events)} events -> {path}")
+    for name, ms in milestones().items():
+        print(f"[Trace] {name} : {ms:.0f} ms")
@@ -1,12 +1,15 @@
 import os
 from datetime import datetime
-import yt_dlp
+from lazy import lazy_import
 from PyQt5.QtCore import pyqtSignal, QThread
 from mutagen.id3 import ID3, TIT2, TIT3, TPE1, TALB, APIC, COMM, TDRC, TXXX
 from mutagen.mp3 import MP3
 from requests  import get as get_request
-from util import make_title_path, gen_thumbnail_path, MUSIC_DIR_PATH, FFMPEG_DIR, format_views
-from helper import crop_and_save_img
+from util import make_title_path, save_cover, MUSIC_DIR_PATH, FFMPEG_DIR, format_views
+from helper import crop_image
+
+# slowest import of the app, only needed when a download starts
+yt_dlp = lazy_import("yt_dlp")
 
 class NoLogger:
     def debug(self, msg): pass
@@ -482,7 +485,8 @@ class Dtube(QThread): # download tube
         audio.save()
 
     def save_thumnail(self, url: str):
-        path = gen_thumbnail_path()
         response = get_request(url)
-        path = crop_and_save_img(img_data=response.content, out_path=path, from_left=284, from_right=284)
-        return path
+        data = crop_image(img_data=response.content, from_left=284, from_right=284)
+
+        # stored by content, same thumbnail -> same file
+        return save_cover(data)
@@ -6,6 +6,7 @@ from ctypes import wintypes
 from PyQt5.QtCore import QObject, pyqtSignal
 from PyQt5.QtWidgets import QMainWindow
 import secrets
+import hashlib
 
 MUSIC_DIR_PATH = os.path.join(Path.home(), "Music")
 
@@ -31,15 +32,40 @@ def gen_unique_id(length=12) -> str:
     new_id = ''.join(secrets.choice(chars) for _ in range(length))
     return new_id
     
-def gen_thumbnail_path():
-    ''' gen filename for thumbnail'''
-    while True:
-        unique_name = gen_unique_id(30)
-        filename = f"{unique_name}.jpg"
-        path = os.path.join(COVER_DIR_PATH, filename)
-
-        if not os.path.exists(path):
-            return path
+def cover_name(data: bytes) -> str:
+    ''' filename of a cover from it's content -> same image, same file '''
+    ext = ".png" if data[:8] == b"\x89PNG\r\n\x1a\n" else ".jpg"
+    return hashlib.blake2b(data, digest_size=16).hexdigest() + ext
+
+def save_cover(data: bytes) -> str:
+    ''' save cover image in the cover dir (only once per image) -> path '''
+    path = os.path.join(COVER_DIR_PATH, cover_name(data))
+    if os.path.exists(path):
+        # used again -> not an orphan for the gc (library_gc.py)
+        os.utime(path)
+        return path
+
+    # write + rename, so an other thread/process never reads a half written file
+    temp_path = f"{path}.{gen_unique_id(6)}.tmp"
+    with open(temp_path, "wb") as tf:
+        tf.write(data)
+    os.replace(temp_path, path)
+
+    return path
+
+def variant_name(name: str, width: int, height: int) -> str:
+    ''' filename of a scaled copy of a cover (cover_cache.py) '''
+    ext = os.path.splitext(name)[1]
+    return f"{name}@{width}x{height}{ext}"
+
+def backdrop_name(name: str) -> str:
+    ''' filename of the blurred backdrop of a cover (palette.py) '''
+    ext = os.path.splitext(name)[1]
+    return f"{name}@backdrop{ext}"
+
+def original_name(name: str) -> str:
+    ''' "<cover>@80x80.jpg" -> "<cover>", name of the cover a variant was made from '''
+    return name.split("@", 1)[0]
         
 class MSG(ctypes.Structure):
     _fields_ = [
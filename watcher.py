@@ -0,0 +1,302 @@
+import os
+import sys
+import time
+import ctypes
+import ctypes.util
+import select
+import struct
+from typing import Dict, List, Set
+from databse import DataBase
+from scanner import ScanThread, diff_paths, scan_dirs, is_excluded
+
+# inotify(7)
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_DELETE_SELF = 0x00000400
+IN_MOVE_SELF = 0x00000800
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ISDIR = 0x40000000
+IN_NONBLOCK = 0o4000
+IN_CLOEXEC = 0o2000000
+
+WATCH_MASK = (
+    IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE |
+    IN_DELETE | IN_DELETE_SELF | IN_MOVE_SELF
+)
+
+_EVENT = struct.Struct("iIII") # wd, mask, cookie, len
+
+
+def _iter_dirs(start: str, root: str, excludes: List[str]):
+    # every folder under start (start included), symlinked folders are not followed
+    stack = [start]
+    while stack:
+        directory = stack.pop()
+        yield directory
+
+        try:
+            with os.scandir(directory) as entries:
+                for entry in entries:
+                    if entry.is_dir(follow_symlinks=False) and not is_excluded(entry.path, root, excludes):
+                        stack.append(entry.path)
+        except OSError:
+            pass
+
+
+class _Inotify():
+    """ Linux backend, one inotify watch per folder """
+
+    def __init__(self):
+        libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+        self._libc = libc
+
+        self.fd = libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+
+        self._paths: Dict[int, str] = {} # wd -> folder
+        self._roots: Dict[str, List[str]] = {}
+
+    def add_tree(self, root: str, excludes: List[str]):
+        self._roots[root] = excludes
+        self._add_tree(root, root, excludes)
+
+    def _add_tree(self, directory: str, root: str, excludes: List[str]):
+        for folder in _iter_dirs(directory, root, excludes):
+            wd = self._libc.inotify_add_watch(self.fd, os.fsencode(folder), WATCH_MASK)
+            if wd < 0:
+                # ENOSPC -> max_user_watches reached
+                print(f"Error[Watcher] can't watch {folder} : {os.strerror(ctypes.get_errno())}")
+                continue
+
+            self._paths[wd] = folder
+
+    def _root_of(self, path: str):
+        for root, excludes in self._roots.items():
+            if path == root or path.startswith(root + os.sep):
+                return root, excludes
+        return None, []
+
+    def read(self, timeout: float) -> tuple:
+        """ -> (changed paths, overflow) """
+        ready, _, _ = select.select([self.fd], [], [], timeout)
+        if not ready:
+            return set(), False
+
+        try:
+            data = os.read(self.fd, 64 * 1024)
+        except BlockingIOError:
+            return set(), False
+
+        changed = set()
+        overflow = False
+        offset = 0
+
+        while offset + _EVENT.size <= len(data):
+            wd, mask, _, length = _EVENT.unpack_from(data, offset)
+            name = data[offset + _EVENT.size : offset + _EVENT.size + length].rstrip(b"\0")
+            offset += _EVENT.size + length
+
+            if mask & IN_Q_OVERFLOW:
+                overflow = True
+                continue
+
+            if mask & IN_IGNORED:
+                # folder is gone
+                self._paths.pop(wd, None)
+                continue
+
+            folder = self._paths.get(wd)
+            if folder is None:
+                continue
+
+            if mask & (IN_DELETE_SELF | IN_MOVE_SELF):
+                changed.add(folder)
+                continue
+
+            path = os.path.join(folder, os.fsdecode(name))
+            changed.add(path)
+
+            if mask & IN_ISDIR and mask & (IN_CREATE | IN_MOVED_TO):
+                root, excludes = self._root_of(path)
+                if root is not None and not is_excluded(path, root, excludes):
+                    self._add_tree(path, root, excludes)
+
+        return changed, overflow
+
+    def close(self):
+        os.close(self.fd)
+
+
+class _Poller():
+    """
+    Fallback backend, compares the mtime of every folder every `interval` sec.
+    (adding/removing/renaming a file changes it's folder mtime, editing a file doesn't)
+    """
+
+    def __init__(self, interval: float = 5.0):
+        self.interval = interval
+        self._next_poll = time.monotonic() + interval
+
+        # folder -> (mtime_ns, names of it's entries)
+        self._dirs: Dict[str, tuple] = {}
+        self._roots: Dict[str, List[str]] = {}
+
+    def add_tree(self, root: str, excludes: List[str]):
+        self._roots[root] = excludes
+        for folder in _iter_dirs(root, root, excludes):
+            self._snapshot(folder)
+
+    def _snapshot(self, folder: str) -> Set[str] | None:
+        try:
+            mtime_ns = os.stat(folder).st_mtime_ns
+            names = set(os.listdir(folder))
+        except OSError:
+            self._dirs.pop(folder, None)
+            return
+
+        self._dirs[folder] = (mtime_ns, names)
+        return names
+
+    def read(self, timeout: float) -> tuple:
+        wait = self._next_poll - time.monotonic()
+        if wait > timeout:
+            time.sleep(timeout)
+            return set(), False
+
+        time.sleep(max(0, wait))
+        self._next_poll = time.monotonic() + self.interval
+
+        changed = set()
+        for folder, (mtime_ns, names) in list(self._dirs.items()):
+            try:
+                if os.stat(folder).st_mtime_ns == mtime_ns:
+                    continue
+            except OSError:
+                # folder is gone
+                changed.add(folder)
+                self._dirs.pop(folder, None)
+                continue
+
+            new_names = self._snapshot(folder) or set()
+            for name in names ^ new_names:
+                path = os.path.join(folder, name)
+                changed.add(path)
+
+                if name in new_names and os.path.isdir(path):
+                    self._add_folder(path)
+
+        return changed, False
+
+    def _add_folder(self, folder: str):
+        # new folder -> watch it and it's sub folders
+        for root, excludes in self._roots.items():
+            if folder.startswith(root + os.sep):
+                if not is_excluded(folder, root, excludes):
+                    for sub_folder in _iter_dirs(folder, root, excludes):
+                        self._snapshot(sub_folder)
+                return
+
+    def close(self):
+        self._dirs.clear()
+
+
+class WatchThread(ScanThread):
+    """
+    Keeps the library in sync while the app runs, without rescans.
+
+    Filesystem events (inotify on linux, folder polling elsewhere) are collected
+    until nothing changed for `debounce` sec (or `max_delay` sec passed), then only the
+    changed paths are diffed with the scan index and imported like a scan
+    (same batchReady / progress signals as ScanThread).
+    """
+
+    def __init__(self, roots: List[tuple], parent = None):
+        super().__init__(roots, parent)
+
+        self.debounce = 1.0
+        self.max_delay = 10.0
+
+    def _backend(self):
+        if sys.platform.startswith("linux"):
+            try:
+                return _Inotify()
+            except (OSError, AttributeError) as e:
+                print(f"Error[Watcher] inotify not available, polling : {e}")
+
+        return _Poller()
+
+    def run(self):
+        backend = self._backend()
+        roots = []
+
+        for root, excludes in self.roots:
+            root = os.path.abspath(root)
+            if os.path.isdir(root):
+                backend.add_tree(root, excludes)
+                roots.append((root, excludes))
+
+        pending = set()
+        first_event = last_event = 0
+        full_scan = False
+
+        while not self.isInterruptionRequested():
+            changed, overflow = backend.read(timeout=0.5)
+            now = time.monotonic()
+
+            if changed or overflow:
+                if not pending and not full_scan:
+                    first_event = now
+                last_event = now
+                pending |= changed
+                full_scan = full_scan or overflow
+
+            if not (pending or full_scan):
+                continue
+
+            if now - last_event < self.debounce and now - first_event < self.max_delay:
+                continue
+
+            if full_scan:
+                # events were lost
+                self._full_sync(roots)
+            else:
+                self._sync(pending, roots)
+
+            pending = set()
+            full_scan = False
+
+        backend.close()
+
+    def _sync(self, paths: Set[str], roots: List[tuple]):
+        paths = [
+            path for path in paths
+            if any(
+                (path == root or path.startswith(root + os.sep)) and not is_excluded(path, root, excludes)
+                for root, excludes in roots
+            )
+        ]
+        if not paths:
+            return
+
+        dataBase = DataBase(read_only=True)
+        result = diff_paths(paths, dataBase.get_scan_entries(paths))
+        dataBase.close()
+
+        self._apply(result)
+
+    def _full_sync(self, roots: List[tuple]):
+        dataBase = DataBase(read_only=True)
+        result = scan_dirs(roots, dataBase.get_scan_index())
+        dataBase.close()
+
+        self._apply(result)
+
+    def _apply(self, result):
+        if result.has_changes():
+            print(f"[Watcher] {result}")
+            self._import(result)
@@ -1,13 +1,14 @@
 import os
-from PyQt5.QtGui import QFont, QPixmap, QIcon
+from PyQt5.QtGui import QFont, QPixmap, QImage, QIcon
 from PyQt5.QtCore import Qt, QSize, pyqtSignal, QTimer, QPropertyAnimation, QEasingCurve
 from PyQt5.QtWidgets import (
     QWidget, QHBoxLayout, QVBoxLayout, QFrame, 
     QLabel, QPushButton, QMenu, QGraphicsOpacityEffect
 )
-from helper import CircularProgress, LoadingSpinner, YTSearchThread, ConfigResult, ConvertingSpinner
+from helper import CircularProgress, LoadingSpinner, YTSearchThread, ConvertingSpinner
 from tube import Dtube
-from helper import get_pixmap, round_pix
+from image_loader import IMAGES
+from cover_cache import COVERS
 from common import ScrollArea
 from typing import List, Dict
 from util import trim_text, MUSIC_DIR_PATH, make_title_path, resource_path
@@ -19,7 +20,7 @@ class HoverThumb(QWidget):
     playToggleRequested = pyqtSignal()
 
 
-    def __init__(self, pix: QPixmap, parent=None):
+    def __init__(self, thumbnail_url: str, parent=None):
         super().__init__(parent)
 
         size = 86
@@ -30,7 +31,10 @@ class HoverThumb(QWidget):
 
         self.image_label = QLabel(self)
         self.image_label.setAlignment(Qt.AlignCenter)
-        self.image_label.setPixmap(round_pix(pix, size, size, 6))
+        # placeholder until the thumbnail is downloaded and decoded (image pool)
+        self.image_label.setPixmap(COVERS.placeholder(size, size, 6))
+        if thumbnail_url:
+            IMAGES.load_url(thumbnail_url, size, size, 6, callback=self._set_thumbnail)
 
         self.image_label.setStyleSheet(f"""
             QLabel {{
@@ -248,6 +252,11 @@ class HoverThumb(QWidget):
         self.overlay.setGeometry(self.rect())
 
     # show overlay only on hover if in loading/downloading/done modes
+    def _set_thumbnail(self, image: QImage):
+        if image is None or image.isNull():
+            return # download failed, keep the placeholder
+        self.image_label.setPixmap(QPixmap.fromImage(image))
+
     def enterEvent(self, event):
         if self.mode in ("idle", "play"):
             self.overlay.show()
@@ -268,7 +277,7 @@ class TrackRow(QWidget):
     playRequested = pyqtSignal(int)
     playToggleRequested = pyqtSignal()
 
-    def __init__(self, title: str, subtitle: str, artists: list, vid: str, pix: QPixmap, track_id: int, parent=None):
+    def __init__(self, title: str, subtitle: str, artists: list, vid: str, thumbnail_url: str, track_id: int, parent=None):
         super().__init__(parent)
         self.title_txt = title
         self.subtitle_txt = subtitle
@@ -286,7 +295,7 @@ class TrackRow(QWidget):
         main.setSpacing(16)
 
         # cover
-        self.thumb = HoverThumb(pix=pix, parent=self)
+        self.thumb = HoverThumb(thumbnail_url=thumbnail_url, parent=self)
         self.thumb.downloadRequested.connect(self._download_requested)
         self.thumb.playRequested.connect(self._play_requested)
         self.thumb.playToggleRequested.connect(self.playToggleRequested.emit)
@@ -567,10 +576,10 @@ class YtScreen(QFrame):
             item_obj.set_mode("play")
 
 
-    def config_one(self, title: str, subtitle: str, artists: list, vid: str, pix: QPixmap):
+    def config_one(self, title: str, subtitle: str, artists: list, vid: str, thumbnail_url: str):
         track_id = len(self.items_list)
         
-        row = TrackRow(title, subtitle, artists, vid, pix, track_id, parent=self)
+        row = TrackRow(title, subtitle, artists, vid, thumbnail_url, track_id, parent=self)
         row.downloadRequested.connect(self._download_requested)
         row.playRequested.connect(self._play_requested)
         row.playToggleRequested.connect(self.playToggleRequested.emit)
@@ -595,23 +604,11 @@ class YtScreen(QFrame):
     def config_search(self, result1: list, result2: list):
         self.clear_results()
         
-        config_result = ConfigResult(result=result1, parent=self)
-        config_result.add_one.connect(self.config_one)
-        config_result.finished.connect(self.config_finished)
-
-        config_result2 = ConfigResult(result=result2, parent=self)
-        config_result2.add_one.connect(self.config_one)
-        config_result2.finished.connect(self.config_finished)
-
-        # start both
-        config_result.start()
-        config_result2.start()
-
+        # rows are added at once, thumbnails come from the image pool
+        for item in result1 + result2:
+            self.config_one(item["title"], item["subtitle"], item["artists"], item["videoId"], item["thumbnail_url"])
 
-        if not hasattr(self, "_config_threads"):
-            self._config_threads = []
-        self._config_threads.append(config_result)
-        self._config_threads.append(config_result2)
+        self.config_finished(True)
 
     def search_call(self, query: str):
         thread = YTSearchThread(query=query, parent=self)